@@ -5,5 +5,17 @@ from ai_models.data_preprocessing.preprocessor import (
     LifestyleFeatureEncoder,
     GeneticFeatureEncoder,
     MedicalHistoryEncoder,
+    BiomarkerFeatureEngine,
+    FeaturePipeline,
     CancerDataPreprocessor,
 )
+from ai_models.data_preprocessing.imputation import (
+    IMPUTATION_STRATEGIES,
+    SampledNeighborImputer,
+    IterativeRegressionImputer,
+    make_imputer,
+)
+from ai_models.data_preprocessing.synthetic import (
+    CANCER_TYPES,
+    SyntheticCohortGenerator,
+)
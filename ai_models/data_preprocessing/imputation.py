@@ -0,0 +1,199 @@
+"""
+Imputation Strategies for Blood Biomarkers
+==========================================
+
+Selectable replacements for ``KNNImputer``. KNNImputer keeps the whole
+training matrix and compares every incomplete row against all of it, so
+fitting a pipeline on n rows costs O(n^2). The strategies here bound that
+cost:
+
+- ``knn``: sklearn KNNImputer (the original behaviour)
+- ``sampled_knn``: k nearest neighbours from a ball-tree index built over
+  a bounded random reference sample
+- ``iterative``: round-robin per-feature regressors (IterativeImputer)
+  fitted on a bounded sample
+- ``median``: column medians
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict
+
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+from sklearn.impute import IterativeImputer, KNNImputer, SimpleImputer
+from sklearn.neighbors import BallTree, KDTree
+
+logger = logging.getLogger(__name__)
+
+IMPUTATION_STRATEGIES = ("knn", "sampled_knn", "iterative", "median")
+
+# Rows transformed per step, bounding temporary memory on large batches
+TRANSFORM_CHUNK_ROWS = 10000
+
+
+class SampledNeighborImputer(TransformerMixin, BaseEstimator):
+    """
+    Nearest-neighbour imputation over a bounded reference sample.
+
+    At most ``max_reference_rows`` training rows are kept. Rows are
+    standardized (missing coordinates set to the column mean) and projected
+    onto their first ``n_components`` principal components, where a ball
+    tree (or KD tree) stays efficient; the blood block has ~100 strongly
+    correlated columns, too many for a tree index on the raw features. A
+    missing value is replaced by the mean of that feature over the k nearest
+    reference rows that observed it, falling back to the sample median.
+    Memory and per-row cost are independent of the training set size.
+    """
+
+    def __init__(
+        self,
+        n_neighbors: int = 5,
+        max_reference_rows: int = 20000,
+        n_components: int = 8,
+        algorithm: str = "ball_tree",
+        leaf_size: int = 40,
+        random_state: int = 42,
+    ):
+        self.n_neighbors = n_neighbors
+        self.max_reference_rows = max_reference_rows
+        self.n_components = n_components
+        self.algorithm = algorithm
+        self.leaf_size = leaf_size
+        self.random_state = random_state
+
+    def fit(self, X, y=None) -> "SampledNeighborImputer":
+        X = np.asarray(X, dtype=float)
+        self.n_features_in_ = X.shape[1]
+
+        rng = np.random.default_rng(self.random_state)
+        if len(X) > self.max_reference_rows:
+            X = X[np.sort(rng.choice(len(X), size=self.max_reference_rows, replace=False))]
+        self.reference_ = np.array(X)
+
+        observed = ~np.isnan(X)
+        counts = observed.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(observed, X, 0.0).sum(axis=0) / counts
+            var = np.where(observed, (X - mean) ** 2, 0.0).sum(axis=0) / counts
+        # All-missing columns impute to 0, like keep_empty_features=True
+        self.mean_ = np.where(counts > 0, mean, 0.0)
+        std = np.sqrt(var)
+        self.scale_ = np.where((counts > 0) & (std > 0), std, 1.0)
+        self.statistics_ = np.zeros(X.shape[1])
+        for j in np.flatnonzero(counts):
+            self.statistics_[j] = np.median(X[observed[:, j], j])
+
+        Z = self._standardize(self.reference_)
+        self.center_ = Z.mean(axis=0)
+        _, _, vt = np.linalg.svd(Z - self.center_, full_matrices=False)
+        self.components_ = vt[:min(self.n_components, len(vt))].T
+
+        tree_cls = KDTree if self.algorithm == "kd_tree" else BallTree
+        self.tree_ = tree_cls(self._project(self.reference_), leaf_size=self.leaf_size)
+        return self
+
+    def _standardize(self, X: np.ndarray) -> np.ndarray:
+        Z = (X - self.mean_) / self.scale_
+        Z[np.isnan(Z)] = 0.0
+        return Z
+
+    def _project(self, X: np.ndarray) -> np.ndarray:
+        return (self._standardize(X) - self.center_) @ self.components_
+
+    def transform(self, X) -> np.ndarray:
+        X = np.array(X, dtype=float, copy=True)
+        rows = np.flatnonzero(np.isnan(X).any(axis=1))
+        k = min(self.n_neighbors, len(self.reference_))
+        for start in range(0, len(rows), TRANSFORM_CHUNK_ROWS):
+            chunk = rows[start:start + TRANSFORM_CHUNK_ROWS]
+            block = X[chunk]
+            _, neighbors = self.tree_.query(self._project(block), k=k)
+            values = self.reference_[neighbors]          # (rows, k, features)
+            observed = ~np.isnan(values)
+            counts = observed.sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                estimates = np.where(observed, values, 0.0).sum(axis=1) / counts
+            estimates = np.where(counts > 0, estimates, self.statistics_)
+            X[chunk] = np.where(np.isnan(block), estimates, block)
+        return X
+
+
+class IterativeRegressionImputer(TransformerMixin, BaseEstimator):
+    """
+    Round-robin per-feature regression imputation (sklearn IterativeImputer).
+
+    The regressors are fitted on at most ``max_fit_rows`` training rows and
+    their estimates are clipped to the range observed in that sample.
+    All-missing columns are imputed to 0 by this wrapper rather than via
+    ``keep_empty_features``, which in sklearn < 1.4 marks every feature as
+    missing and skips the regression rounds entirely.
+    """
+
+    def __init__(
+        self,
+        max_iter: int = 5,
+        n_nearest_features: int = 15,
+        max_fit_rows: int = 50000,
+        random_state: int = 42,
+    ):
+        self.max_iter = max_iter
+        self.n_nearest_features = n_nearest_features
+        self.max_fit_rows = max_fit_rows
+        self.random_state = random_state
+
+    def fit(self, X, y=None) -> "IterativeRegressionImputer":
+        X = np.asarray(X, dtype=float)
+        self.n_features_in_ = X.shape[1]
+        self.observed_columns_ = np.flatnonzero((~np.isnan(X)).any(axis=0))
+
+        rng = np.random.default_rng(self.random_state)
+        if len(X) > self.max_fit_rows:
+            X = X[np.sort(rng.choice(len(X), size=self.max_fit_rows, replace=False))]
+
+        X = X[:, self.observed_columns_]
+        # Clip estimates to the observed range (constant columns stay
+        # unbounded); the linear regressors otherwise extrapolate far
+        # outside it on heavy-tailed rows
+        low, high = np.nanmin(X, axis=0), np.nanmax(X, axis=0)
+        varying = high > low
+        self.imputer_ = IterativeImputer(
+            max_iter=self.max_iter,
+            n_nearest_features=min(self.n_nearest_features, X.shape[1] - 1) or None,
+            skip_complete=True,
+            min_value=np.where(varying, low, -np.inf),
+            max_value=np.where(varying, high, np.inf),
+            random_state=self.random_state,
+        )
+        self.imputer_.fit(X)
+        return self
+
+    def transform(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        out = np.zeros_like(X)
+        columns = self.observed_columns_
+        for start in range(0, len(X), TRANSFORM_CHUNK_ROWS):
+            rows = slice(start, start + TRANSFORM_CHUNK_ROWS)
+            out[rows, columns] = self.imputer_.transform(X[rows][:, columns])
+        return out
+
+
+def make_imputer(strategy: str = "knn", **params: Any):
+    """Create an imputer for one of IMPUTATION_STRATEGIES."""
+    if strategy == "knn":
+        options: Dict[str, Any] = {"n_neighbors": 5, "keep_empty_features": True}
+        options.update(params)
+        return KNNImputer(**options)
+    if strategy == "sampled_knn":
+        return SampledNeighborImputer(**params)
+    if strategy == "iterative":
+        return IterativeRegressionImputer(**params)
+    if strategy == "median":
+        options = {"strategy": "median", "keep_empty_features": True}
+        options.update(params)
+        return SimpleImputer(**options)
+    raise ValueError(
+        f"Unknown imputation strategy {strategy!r}, expected one of {IMPUTATION_STRATEGIES}"
+    )
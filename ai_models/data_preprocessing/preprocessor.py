@@ -10,11 +10,14 @@ from __future__ import annotations
 import logging
 import numpy as np
 import pandas as pd
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 from sklearn.preprocessing import StandardScaler, MinMaxScaler, RobustScaler, LabelEncoder
 from sklearn.impute import SimpleImputer, KNNImputer
 from scipy import stats
 
+from ai_models.data_preprocessing.imputation import make_imputer
+from ai_models.data_preprocessing.synthetic import SyntheticCohortGenerator
+
 logger = logging.getLogger(__name__)
 
 
@@ -59,23 +62,30 @@ class BloodBiomarkerPreprocessor:
         "cyfra211", "nse", "scc", "ferritin", "ldh"
     ]
     
-    def __init__(self):
+    # Measurements only used to derive ratio features
+    DERIVATION_INPUTS = ["total_protein", "bun", "hdl"]
+    
+    def __init__(self, imputation: str = "knn", imputer_params: Optional[Dict[str, Any]] = None):
         self.scaler = RobustScaler()
-        self.imputer = KNNImputer(n_neighbors=5)
+        # See imputation.IMPUTATION_STRATEGIES; every strategy keeps
+        # all-missing columns so the output layout never changes
+        self.imputation = imputation
+        self.imputer = make_imputer(imputation, **(imputer_params or {}))
         self.is_fitted = False
     
+    @classmethod
+    def is_blood_column(cls, column: str) -> bool:
+        """Whether a raw input column is a blood measurement."""
+        return (
+            column in cls.REFERENCE_RANGES
+            or column in cls.TUMOR_MARKERS
+            or column in cls.DERIVATION_INPUTS
+        )
+    
     def fit_transform(self, df: pd.DataFrame) -> pd.DataFrame:
         """Fit and transform blood biomarker data."""
-        df_processed = df.copy()
-        
-        # Add derived features
-        df_processed = self._add_derived_features(df_processed)
-        
-        # Add deviation from normal
-        df_processed = self._add_deviation_features(df_processed)
-        
-        # Add tumor marker aggregates
-        df_processed = self._add_tumor_marker_features(df_processed)
+        # Add derived, deviation and tumor marker aggregate features
+        df_processed = self.engineer_features(df)
         
         # Impute missing values
         numeric_cols = df_processed.select_dtypes(include=[np.number]).columns
@@ -89,10 +99,7 @@ class BloodBiomarkerPreprocessor:
     
     def transform(self, df: pd.DataFrame) -> pd.DataFrame:
         """Transform blood biomarker data using fitted preprocessor."""
-        df_processed = df.copy()
-        df_processed = self._add_derived_features(df_processed)
-        df_processed = self._add_deviation_features(df_processed)
-        df_processed = self._add_tumor_marker_features(df_processed)
+        df_processed = self.engineer_features(df)
         
         numeric_cols = df_processed.select_dtypes(include=[np.number]).columns
         df_processed[numeric_cols] = self.imputer.transform(df_processed[numeric_cols])
@@ -100,66 +107,326 @@ class BloodBiomarkerPreprocessor:
         
         return df_processed
     
-    def _add_derived_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Add derived blood features."""
-        if "neutrophils" in df.columns and "lymphocytes" in df.columns:
-            df["nlr"] = df["neutrophils"] / df["lymphocytes"].clip(lower=0.1)
-        
-        if "platelets" in df.columns and "lymphocytes" in df.columns:
-            df["plr"] = df["platelets"] / df["lymphocytes"].clip(lower=0.1)
-        
-        if "alt" in df.columns and "ast" in df.columns:
-            df["ast_alt_ratio"] = df["ast"] / df["alt"].clip(lower=0.1)
-        
-        if "albumin" in df.columns and "total_protein" in df.columns:
-            df["ag_ratio"] = df["albumin"] / (df["total_protein"] - df["albumin"]).clip(lower=0.1)
-        
-        if "bun" in df.columns and "creatinine" in df.columns:
-            df["bun_creatinine_ratio"] = df["bun"] / df["creatinine"].clip(lower=0.1)
-        
-        if "total_cholesterol" in df.columns and "hdl" in df.columns:
-            df["cholesterol_hdl_ratio"] = df["total_cholesterol"] / df["hdl"].clip(lower=0.1)
-        
-        return df
+    def engineer_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Add ratio, deviation and tumor marker aggregate features."""
+        engine = BiomarkerFeatureEngine(
+            [c for c in df.columns if self.is_blood_column(c)],
+            reference_ranges=self.REFERENCE_RANGES,
+            tumor_markers=self.TUMOR_MARKERS,
+        )
+        return engine.transform_frame(df)
+
+
+class BiomarkerFeatureEngine:
+    """
+    Vectorized blood biomarker feature engineering.
     
-    def _add_deviation_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Add features measuring deviation from normal ranges."""
-        for marker, (low, high) in self.REFERENCE_RANGES.items():
-            if marker in df.columns:
-                mid = (low + high) / 2
-                range_width = (high - low) / 2
-                if range_width > 0:
-                    df[f"{marker}_deviation"] = (df[marker] - mid) / range_width
-                    df[f"{marker}_is_abnormal"] = (
-                        (df[marker] < low) | (df[marker] > high)
-                    ).astype(int)
-        
-        return df
+    Compiles the derived-feature rules for a fixed input column layout into
+    index vectors and precomputed low/high/mid/half-width vectors of the
+    reference ranges. ``transform`` then fills a preallocated output matrix
+    with whole-matrix operations: all ratios at once, all deviation scores
+    and abnormal flags at once, then the tumor marker aggregates.
+    
+    The output layout (``feature_names``) is the input columns followed by
+    the derived features in rule order: ratios, ``<marker>_deviation`` /
+    ``<marker>_is_abnormal`` pairs in REFERENCE_RANGES order, tumor marker
+    aggregates. Derived names that are already inputs are overwritten in
+    place.
+    """
+    
+    # (name, numerator, denominator); denominators are clipped at 0.1.
+    # ag_ratio divides albumin by (total_protein - albumin).
+    RATIO_FEATURES = [
+        ("nlr", "neutrophils", "lymphocytes"),
+        ("plr", "platelets", "lymphocytes"),
+        ("ast_alt_ratio", "ast", "alt"),
+        ("ag_ratio", "albumin", "total_protein"),
+        ("bun_creatinine_ratio", "bun", "creatinine"),
+        ("cholesterol_hdl_ratio", "total_cholesterol", "hdl"),
+    ]
+    
+    # Derived features holding counts, stored as integers in DataFrames
+    INTEGER_FEATURE_SUFFIXES = ("_is_abnormal", "_elevated_count")
     
-    def _add_tumor_marker_features(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Add aggregate tumor marker features."""
-        available_markers = [m for m in self.TUMOR_MARKERS if m in df.columns]
+    def __init__(
+        self,
+        input_columns: List[str],
+        reference_ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+        tumor_markers: Optional[List[str]] = None,
+    ):
+        if reference_ranges is None:
+            reference_ranges = BloodBiomarkerPreprocessor.REFERENCE_RANGES
+        if tumor_markers is None:
+            tumor_markers = BloodBiomarkerPreprocessor.TUMOR_MARKERS
+        
+        self.input_columns = list(input_columns)
+        self.feature_names = list(self.input_columns)
+        self.feature_index: Dict[str, int] = {}
+        for i, name in enumerate(self.feature_names):
+            self.feature_index.setdefault(name, i)
+        # Derived features in rule order, including ones overwriting inputs
+        self.derived_columns: List[str] = []
+        
+        present = set(self.input_columns)
+        index = self.feature_index
+        
+        ratio_rows, self._ag_ratio = [], None
+        for name, numerator, denominator in self.RATIO_FEATURES:
+            if numerator in present and denominator in present:
+                row = (self._target(name), index[numerator], index[denominator])
+                if name == "ag_ratio":
+                    self._ag_ratio = row
+                else:
+                    ratio_rows.append(row)
+        self._ratio_dest, self._ratio_num, self._ratio_den = self._index_vectors(ratio_rows, 3)
+        
+        deviation_rows, bounds = [], []
+        for marker, (low, high) in reference_ranges.items():
+            if marker in present and (high - low) / 2 > 0:
+                deviation_rows.append((
+                    index[marker],
+                    self._target(f"{marker}_deviation"),
+                    self._target(f"{marker}_is_abnormal"),
+                ))
+                bounds.append((low, high))
+        self._marker_idx, self._deviation_idx, self._abnormal_idx = self._index_vectors(deviation_rows, 3)
+        bounds = np.array(bounds, dtype=float).reshape(-1, 2)
+        self.low, self.high = bounds[:, 0], bounds[:, 1]
+        self.mid = (self.low + self.high) / 2
+        self.half_width = (self.high - self.low) / 2
+        
+        available = [m for m in tumor_markers if m in present]
+        self._elevated_idx = np.array(
+            [index[f"{m}_is_abnormal"] for m in available if f"{m}_is_abnormal" in index], dtype=np.intp
+        )
+        self._tumor_deviation_idx = np.array(
+            [index[f"{m}_deviation"] for m in available if f"{m}_deviation" in index], dtype=np.intp
+        )
+        self._count = self._ratio = self._mean = self._max = None
+        if available:
+            if len(self._elevated_idx):
+                self._count = self._target("tumor_markers_elevated_count")
+                self._ratio = self._target("tumor_markers_elevated_ratio")
+            self._mean = self._target("tumor_marker_mean_deviation")
+            self._max = self._target("tumor_marker_max_deviation")
+    
+    def _target(self, name: str) -> int:
+        if name not in self.feature_index:
+            self.feature_index[name] = len(self.feature_names)
+            self.feature_names.append(name)
+        self.derived_columns.append(name)
+        return self.feature_index[name]
+    
+    @staticmethod
+    def _index_vectors(rows: List[Tuple[int, ...]], width: int) -> Tuple[np.ndarray, ...]:
+        if not rows:
+            return tuple(np.empty(0, dtype=np.intp) for _ in range(width))
+        return tuple(np.array(column, dtype=np.intp) for column in zip(*rows))
+    
+    def transform(self, values: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Compute all derived features for rows in the input column order.
         
-        if available_markers:
-            elevated_cols = [f"{m}_is_abnormal" for m in available_markers if f"{m}_is_abnormal" in df.columns]
-            if elevated_cols:
-                df["tumor_markers_elevated_count"] = df[elevated_cols].sum(axis=1)
-                df["tumor_markers_elevated_ratio"] = df["tumor_markers_elevated_count"] / len(elevated_cols)
+        Returns an array laid out as ``feature_names``; pass ``out`` to
+        reuse a preallocated buffer of that shape.
+        """
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1:
+            values = values[np.newaxis, :]
+        if out is None:
+            out = np.empty((values.shape[0], len(self.feature_names)), dtype=float)
+        out[:, :values.shape[1]] = values
+        
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if len(self._ratio_dest):
+                out[:, self._ratio_dest] = out[:, self._ratio_num] / np.maximum(out[:, self._ratio_den], 0.1)
+            if self._ag_ratio is not None:
+                dest, albumin, total_protein = self._ag_ratio
+                out[:, dest] = out[:, albumin] / np.maximum(out[:, total_protein] - out[:, albumin], 0.1)
             
-            df["tumor_marker_mean_deviation"] = df[
-                [f"{m}_deviation" for m in available_markers if f"{m}_deviation" in df.columns]
-            ].mean(axis=1)
+            if len(self._marker_idx):
+                x = out[:, self._marker_idx]
+                out[:, self._deviation_idx] = (x - self.mid) / self.half_width
+                out[:, self._abnormal_idx] = (x < self.low) | (x > self.high)
             
-            df["tumor_marker_max_deviation"] = df[
-                [f"{m}_deviation" for m in available_markers if f"{m}_deviation" in df.columns]
-            ].max(axis=1)
+            if self._count is not None:
+                out[:, self._count] = out[:, self._elevated_idx].sum(axis=1)
+                out[:, self._ratio] = out[:, self._count] / len(self._elevated_idx)
+            if self._mean is not None:
+                if len(self._tumor_deviation_idx):
+                    # Row-major block: numpy then sums each row pairwise, the
+                    # same order (and rounding) as DataFrame.mean(axis=1)
+                    block = out.take(self._tumor_deviation_idx, axis=1)
+                    missing = np.isnan(block)
+                    np.putmask(block, missing, 0.0)
+                    out[:, self._mean] = block.sum(axis=1) / (block.shape[1] - missing.sum(axis=1))
+                    out[:, self._max] = np.fmax.reduce(out[:, self._tumor_deviation_idx], axis=1)
+                else:
+                    out[:, self._mean] = np.nan
+                    out[:, self._max] = np.nan
+        return out
+    
+    def transform_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add the derived features to a DataFrame holding the input columns.
         
-        return df
+        Derived columns already in ``df`` are replaced in place and the rest
+        are appended in a single concat.
+        """
+        out = self.transform(df[self.input_columns].to_numpy(dtype=float))
+        result = df.copy()
+        
+        new_columns = []
+        for name in dict.fromkeys(self.derived_columns):
+            if name in result.columns:
+                result[name] = self._column_values(name, out[:, self.feature_index[name]])
+            else:
+                new_columns.append(name)
+        if not new_columns:
+            return result
+        
+        derived = pd.DataFrame(
+            out[:, [self.feature_index[name] for name in new_columns]],
+            columns=new_columns,
+            index=df.index,
+        )
+        integer_columns = [c for c in new_columns if c.endswith(self.INTEGER_FEATURE_SUFFIXES)]
+        if integer_columns:
+            derived = derived.astype({c: np.int64 for c in integer_columns})
+        return pd.concat([result, derived], axis=1)
+    
+    def _column_values(self, name: str, values: np.ndarray) -> np.ndarray:
+        if name.endswith(self.INTEGER_FEATURE_SUFFIXES):
+            return values.astype(np.int64)
+        return values
+
+
+class _GroupedValues:
+    """
+    Values of many patients, contiguous per patient (codes non-decreasing).
+    
+    Grouped reductions for SmartwatchPreprocessor.extract_features_batch;
+    every result is an array with one entry per patient (NaN for patients
+    without values).
+    """
+    
+    def __init__(self, codes: np.ndarray, values: np.ndarray, n_groups: int):
+        self.codes = codes
+        self.values = values
+        self.n_groups = n_groups
+        self.counts = np.bincount(codes, minlength=n_groups)
+        self.starts = np.cumsum(self.counts) - self.counts
+    
+    def subset(self, mask: np.ndarray) -> "_GroupedValues":
+        return _GroupedValues(self.codes[mask], self.values[mask], self.n_groups)
+    
+    def positions(self) -> np.ndarray:
+        """Position of each value within its patient's series."""
+        return np.arange(len(self.values)) - self.starts[self.codes]
+    
+    def sum(self, values: Optional[np.ndarray] = None) -> np.ndarray:
+        return np.bincount(
+            self.codes, weights=self.values if values is None else values, minlength=self.n_groups
+        )
+    
+    def mean(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.sum() / self.counts
+    
+    def fraction(self, mask: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.bincount(self.codes[mask], minlength=self.n_groups) / self.counts
+    
+    def std(self) -> np.ndarray:
+        """Sample standard deviation (ddof=1), like Series.std."""
+        deviations = self.values - self.mean()[self.codes]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            variance = self.sum(deviations ** 2) / (self.counts - 1)
+        return np.where(self.counts > 1, np.sqrt(variance), np.nan)
+    
+    def _reduce(self, ufunc: np.ufunc) -> np.ndarray:
+        out = np.full(self.n_groups, np.nan)
+        present = self.counts > 0
+        if present.any():
+            out[present] = ufunc.reduceat(self.values, self.starts[present])
+        return out
+    
+    def min(self) -> np.ndarray:
+        return self._reduce(np.minimum)
+    
+    def max(self) -> np.ndarray:
+        return self._reduce(np.maximum)
+    
+    def quantile(self, q: float) -> np.ndarray:
+        """Linear-interpolation quantile, as Series.quantile."""
+        out = np.full(self.n_groups, np.nan)
+        present = np.flatnonzero(self.counts)
+        if len(present) == 0:
+            return out
+        ordered = self.values[np.lexsort((self.values, self.codes))]
+        counts, starts = self.counts[present], self.starts[present]
+        position = q * (counts - 1)
+        below = np.floor(position).astype(np.intp)
+        t = position - below
+        a = ordered[starts + below]
+        b = ordered[starts + np.minimum(below + 1, counts - 1)]
+        # numpy's lerp, so results match np.percentile bit for bit
+        diff = b - a
+        out[present] = np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+        return out
+    
+    def slope(self) -> np.ndarray:
+        """
+        Least-squares slope of each series against 0..n-1 (0.0 below two
+        points), the closed form of _compute_trend.
+        """
+        n = self.counts.astype(float)
+        centered = self.positions() - (n[self.codes] - 1) / 2
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = self.sum(centered * self.values) / (n * (n * n - 1) / 12)
+        return np.where(self.counts > 1, slope, 0.0)
+    
+    def rolling_std(self, window: int, chunk_size: int = 1_000_000) -> "_GroupedValues":
+        """
+        Standard deviation over each full window of consecutive values
+        within a patient, like Series.rolling(window).std() after dropna.
+        """
+        ends = np.flatnonzero(self.positions() >= window - 1)
+        out = np.empty(len(ends))
+        if len(ends):
+            windows = np.lib.stride_tricks.sliding_window_view(self.values, window)
+            for start in range(0, len(ends), chunk_size):
+                chunk = ends[start:start + chunk_size]
+                out[start:start + chunk_size] = windows[chunk - (window - 1)].std(axis=1, ddof=1)
+        return _GroupedValues(self.codes[ends], out, self.n_groups)
 
 
 class SmartwatchPreprocessor:
     """Preprocess smartwatch data for cancer detection."""
     
+    # Used for features the available data cannot provide
+    DEFAULT_FEATURE_VALUES = {
+        "heart_rate_resting_avg": 70, "heart_rate_resting_std": 5,
+        "heart_rate_variability_avg": 40, "heart_rate_variability_trend": 0,
+        "heart_rate_max_daily_avg": 100, "heart_rate_anomaly_count": 0,
+        "spo2_avg": 97, "spo2_min": 95, "spo2_below_95_pct": 0,
+        "spo2_variability": 1, "steps_daily_avg": 5000,
+        "steps_daily_trend": 0, "active_minutes_avg": 30,
+        "sedentary_minutes_avg": 600, "calories_burned_avg": 2000,
+        "sleep_duration_avg": 420, "sleep_quality_avg": 75,
+        "stress_level_avg": 40, "stress_level_max": 70,
+        "stress_high_pct": 0.1, "skin_temperature_avg": 33,
+        "skin_temperature_deviation": 0.5,
+        "respiratory_rate_avg": 16, "respiratory_rate_variability": 2,
+    }
+    
+    # Raw columns averaged as they are
+    MEAN_FEATURES = {
+        "active_minutes": "active_minutes_avg",
+        "sedentary_minutes": "sedentary_minutes_avg",
+        "calories": "calories_burned_avg",
+    }
+    
     def __init__(self, window_days: int = 30):
         self.window_days = window_days
         self.scaler = StandardScaler()
@@ -198,12 +465,9 @@ class SmartwatchPreprocessor:
                 "steps_daily_trend": float(self._compute_trend(steps)),
             })
         
-        if "active_minutes" in raw_data.columns:
-            features["active_minutes_avg"] = float(raw_data["active_minutes"].mean())
-        if "sedentary_minutes" in raw_data.columns:
-            features["sedentary_minutes_avg"] = float(raw_data["sedentary_minutes"].mean())
-        if "calories" in raw_data.columns:
-            features["calories_burned_avg"] = float(raw_data["calories"].mean())
+        for column, feature in self.MEAN_FEATURES.items():
+            if column in raw_data.columns:
+                features[feature] = float(raw_data[column].mean())
         
         # Sleep features
         if "sleep_duration" in raw_data.columns:
@@ -239,27 +503,113 @@ class SmartwatchPreprocessor:
             })
         
         # Fill any missing with defaults
-        default_values = {
-            "heart_rate_resting_avg": 70, "heart_rate_resting_std": 5,
-            "heart_rate_variability_avg": 40, "heart_rate_variability_trend": 0,
-            "heart_rate_max_daily_avg": 100, "heart_rate_anomaly_count": 0,
-            "spo2_avg": 97, "spo2_min": 95, "spo2_below_95_pct": 0,
-            "spo2_variability": 1, "steps_daily_avg": 5000,
-            "steps_daily_trend": 0, "active_minutes_avg": 30,
-            "sedentary_minutes_avg": 600, "calories_burned_avg": 2000,
-            "sleep_duration_avg": 420, "sleep_quality_avg": 75,
-            "stress_level_avg": 40, "stress_level_max": 70,
-            "stress_high_pct": 0.1, "skin_temperature_avg": 33,
-            "skin_temperature_deviation": 0.5,
-            "respiratory_rate_avg": 16, "respiratory_rate_variability": 2,
-        }
-        
-        for key, default in default_values.items():
+        for key, default in self.DEFAULT_FEATURE_VALUES.items():
             if key not in features or np.isnan(features.get(key, np.nan)):
                 features[key] = default
         
         return pd.DataFrame([features])
     
+    def extract_features_batch(
+        self, raw_data: pd.DataFrame, patient_column: str = "patient_id"
+    ) -> pd.DataFrame:
+        """
+        Extract features for many patients from one long-format frame.
+        
+        ``raw_data`` holds one row per reading keyed by ``patient_column``;
+        each patient's readings are taken in frame order, as extract_features
+        takes them. Returns one row per patient, indexed by patient id
+        (sorted), with the values extract_features gives for that patient's
+        rows. Everything is computed with grouped array operations over all
+        patients at once: bincount sums, one sort for the quantiles, a
+        sliding window for the rolling std and a closed-form least-squares
+        slope for the trends.
+        """
+        codes, patients = pd.factorize(raw_data[patient_column], sort=True)
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        n_patients = len(patients)
+        columns = raw_data.columns
+        features: Dict[str, np.ndarray] = {}
+        
+        def grouped(column: str) -> _GroupedValues:
+            values = raw_data[column].to_numpy(dtype=float)[order]
+            valid = ~np.isnan(values)
+            return _GroupedValues(codes[valid], values[valid], n_patients)
+        
+        if "heart_rate" in columns:
+            hr = grouped("heart_rate")
+            resting = hr.subset(hr.values < hr.quantile(0.25)[hr.codes])
+            variability = hr.rolling_std(10)
+            threshold = hr.mean() + 3 * hr.std()
+            features.update({
+                "heart_rate_resting_avg": resting.mean(),
+                "heart_rate_resting_std": resting.std(),
+                "heart_rate_variability_avg": variability.mean(),
+                "heart_rate_variability_trend": variability.slope(),
+                "heart_rate_max_daily_avg": hr.max(),
+                "heart_rate_anomaly_count": hr.sum(hr.values > threshold[hr.codes]),
+            })
+        
+        if "spo2" in columns:
+            spo2 = grouped("spo2")
+            features.update({
+                "spo2_avg": spo2.mean(),
+                "spo2_min": spo2.min(),
+                "spo2_below_95_pct": spo2.fraction(spo2.values < 95),
+                "spo2_variability": spo2.std(),
+            })
+        
+        if "steps" in columns:
+            steps = grouped("steps")
+            features.update({
+                "steps_daily_avg": steps.mean(),
+                "steps_daily_trend": steps.slope(),
+            })
+        
+        for column, feature in self.MEAN_FEATURES.items():
+            if column in columns:
+                features[feature] = grouped(column).mean()
+        
+        if "sleep_duration" in columns:
+            features["sleep_duration_avg"] = grouped("sleep_duration").mean()
+            features["sleep_quality_avg"] = (
+                grouped("sleep_quality").mean() if "sleep_quality" in columns
+                else np.full(n_patients, 50.0)
+            )
+        
+        if "stress_level" in columns:
+            stress = grouped("stress_level")
+            features.update({
+                "stress_level_avg": stress.mean(),
+                "stress_level_max": stress.max(),
+                "stress_high_pct": stress.fraction(stress.values > 70),
+            })
+        
+        if "skin_temperature" in columns:
+            temp = grouped("skin_temperature")
+            features.update({
+                "skin_temperature_avg": temp.mean(),
+                "skin_temperature_deviation": temp.std(),
+            })
+        
+        if "respiratory_rate" in columns:
+            rr = grouped("respiratory_rate")
+            features.update({
+                "respiratory_rate_avg": rr.mean(),
+                "respiratory_rate_variability": rr.std(),
+            })
+        
+        result = pd.DataFrame(
+            {
+                key: np.where(np.isnan(features[key]), default, features[key])
+                if key in features else np.full(n_patients, float(default))
+                for key, default in self.DEFAULT_FEATURE_VALUES.items()
+            },
+            index=pd.Index(patients, name=patient_column),
+        )
+        result["heart_rate_anomaly_count"] = result["heart_rate_anomaly_count"].astype(np.int64)
+        return result
+    
     @staticmethod
     def _compute_trend(series: pd.Series) -> float:
         """Compute linear trend of a series."""
@@ -362,12 +712,119 @@ class MedicalHistoryEncoder:
         return features
 
 
+class FeaturePipeline:
+    """
+    Fit-once feature pipeline from raw model inputs to the model's layout.
+    
+    Fitting fixes the input column order, compiles the blood-derived
+    features (ratios, deviations, tumor marker aggregates) into a
+    BiomarkerFeatureEngine for that layout, and fits the blood imputer and scaler once on the
+    training data. Transforming a batch or a single record is then a few
+    NumPy operations on a fixed column layout; the imputer is only called
+    for rows that actually have missing blood values.
+    """
+    
+    def __init__(self, blood_preprocessor: Optional[BloodBiomarkerPreprocessor] = None):
+        self.blood_preprocessor = blood_preprocessor or BloodBiomarkerPreprocessor()
+        self.input_columns_: List[str] = []
+        self.output_columns_: List[str] = []
+        self.blood_columns_: List[str] = []
+        self.is_fitted = False
+        self.engine_: Optional[BiomarkerFeatureEngine] = None
+        self._blood_idx: Optional[np.ndarray] = None
+        self._center: Optional[np.ndarray] = None
+        self._scale: Optional[np.ndarray] = None
+    
+    def fit(self, X: pd.DataFrame) -> "FeaturePipeline":
+        """Fix the column layout and fit the blood imputer/scaler on training data."""
+        self.input_columns_ = list(X.columns)
+        blood = self.blood_preprocessor
+        self.engine_ = BiomarkerFeatureEngine(
+            self.input_columns_,
+            reference_ranges=blood.REFERENCE_RANGES,
+            tumor_markers=blood.TUMOR_MARKERS,
+        )
+        self.output_columns_ = list(self.engine_.feature_names)
+        self.blood_columns_ = [
+            c for c in self.input_columns_ if blood.is_blood_column(c)
+        ] + self.output_columns_[len(self.input_columns_):]
+        
+        derived = self.engine_.transform(X.to_numpy(dtype=float))
+        self._blood_idx = np.array(
+            [self.output_columns_.index(c) for c in self.blood_columns_], dtype=np.intp
+        )
+        
+        imputed = blood.imputer.fit_transform(derived[:, self._blood_idx])
+        blood.scaler.fit(imputed)
+        blood.is_fitted = True
+        
+        self._center = blood.scaler.center_ if blood.scaler.with_centering else 0.0
+        self._scale = blood.scaler.scale_ if blood.scaler.with_scaling else 1.0
+        self.is_fitted = True
+        logger.info(
+            f"Feature pipeline fitted: {len(self.input_columns_)} inputs, "
+            f"{len(self.output_columns_)} outputs ({len(self.blood_columns_)} blood)"
+        )
+        return self
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        # Pipelines pickled before the feature engine existed
+        if state.get("is_fitted") and state.get("engine_") is None:
+            blood = self.blood_preprocessor
+            self.engine_ = BiomarkerFeatureEngine(
+                self.input_columns_,
+                reference_ranges=blood.REFERENCE_RANGES,
+                tumor_markers=blood.TUMOR_MARKERS,
+            )
+            self.__dict__.pop("_ops", None)
+    
+    def transform_array(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        Transform raw inputs to the model layout.
+        
+        DataFrames are aligned to the fitted input columns (missing columns
+        become NaN); arrays must already be in that column order.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("FeaturePipeline has not been fitted")
+        if isinstance(X, pd.DataFrame):
+            values = X.reindex(columns=self.input_columns_).to_numpy(dtype=float)
+        else:
+            values = np.asarray(X, dtype=float)
+            if values.ndim == 1:
+                values = values[np.newaxis, :]
+        
+        out = self.engine_.transform(values)
+        blood = out[:, self._blood_idx]
+        missing_rows = np.isnan(blood).any(axis=1)
+        if missing_rows.any():
+            blood[missing_rows] = self.blood_preprocessor.imputer.transform(blood[missing_rows])
+        out[:, self._blood_idx] = (blood - self._center) / self._scale
+        return out
+    
+    def transform(self, X: Union[pd.DataFrame, np.ndarray]) -> pd.DataFrame:
+        """Transform raw inputs to a DataFrame in the model layout."""
+        return pd.DataFrame(self.transform_array(X), columns=self.output_columns_)
+    
+    def record_to_array(self, record: Dict[str, Any]) -> np.ndarray:
+        """Lay out one raw feature record in the fitted input column order."""
+        return np.array(
+            [record.get(c, np.nan) for c in self.input_columns_], dtype=float
+        )[np.newaxis, :]
+    
+    def transform_record(self, record: Dict[str, Any]) -> np.ndarray:
+        """Transform one raw feature record to a single model-layout row."""
+        return self.transform_array(self.record_to_array(record))
+
+
 class CancerDataPreprocessor:
     """
     Main preprocessing pipeline combining all feature categories.
     """
     
-    def __init__(self):
+    def __init__(self, feature_pipeline: Optional[FeaturePipeline] = None):
+        self.feature_pipeline = feature_pipeline
         self.blood_preprocessor = BloodBiomarkerPreprocessor()
         self.smartwatch_preprocessor = SmartwatchPreprocessor()
         self.lifestyle_encoder = LifestyleFeatureEncoder()
@@ -387,15 +844,17 @@ class CancerDataPreprocessor:
         
         Combines blood biomarkers, smartwatch data, lifestyle, genetic,
         and medical history features into a single feature vector.
+        
+        Blood values are returned raw: derived blood features, imputation
+        and scaling belong to the model's fitted FeaturePipeline. When a
+        pipeline is set the result follows its fixed input column layout.
         """
         all_features = {}
         
-        # Process blood biomarkers
+        # Raw blood biomarker values
         if blood_data is not None and not blood_data.empty:
-            blood_features = self.blood_preprocessor.fit_transform(blood_data)
-            for col in blood_features.columns:
-                if blood_features[col].dtype in [np.float64, np.int64, float, int]:
-                    all_features[col] = float(blood_features[col].iloc[0])
+            for col in blood_data.select_dtypes(include=[np.number]).columns:
+                all_features[col] = float(blood_data[col].iloc[0])
         
         # Process smartwatch data
         if smartwatch_data is not None and not smartwatch_data.empty:
@@ -414,147 +873,20 @@ class CancerDataPreprocessor:
             medical = self.medical_encoder.encode(patient_info)
             all_features.update(medical)
         
+        if self.feature_pipeline is not None:
+            return pd.DataFrame(
+                self.feature_pipeline.record_to_array(all_features),
+                columns=self.feature_pipeline.input_columns_,
+            )
         return pd.DataFrame([all_features])
     
     def generate_synthetic_data(
-        self, n_samples: int = 1000, cancer_ratio: float = 0.3
+        self, n_samples: int = 1000, cancer_ratio: float = 0.3, random_state: int = 42
     ) -> Tuple[pd.DataFrame, pd.Series]:
         """
         Generate synthetic training data for model development.
+        
+        See SyntheticCohortGenerator for chunked generation of large cohorts.
         """
-        np.random.seed(42)
-        
-        n_cancer = int(n_samples * cancer_ratio)
-        n_healthy = n_samples - n_cancer
-        
-        data = []
-        labels = []
-        
-        # Generate healthy samples
-        for _ in range(n_healthy):
-            sample = self._generate_healthy_sample()
-            data.append(sample)
-            labels.append("no_cancer")
-        
-        # Generate cancer samples
-        cancer_types = ["lung", "breast", "colorectal", "prostate", "liver", "pancreatic"]
-        for i in range(n_cancer):
-            cancer_type = cancer_types[i % len(cancer_types)]
-            sample = self._generate_cancer_sample(cancer_type)
-            data.append(sample)
-            labels.append(cancer_type)
-        
-        df = pd.DataFrame(data)
-        labels = pd.Series(labels)
-        
-        # Shuffle
-        idx = np.random.permutation(len(df))
-        df = df.iloc[idx].reset_index(drop=True)
-        labels = labels.iloc[idx].reset_index(drop=True)
-        
-        return df, labels
-    
-    def _generate_healthy_sample(self) -> Dict[str, float]:
-        """Generate a healthy patient's features."""
-        return {
-            "wbc_count": np.random.normal(7, 1.5),
-            "rbc_count": np.random.normal(4.7, 0.4),
-            "hemoglobin": np.random.normal(14, 1.5),
-            "hematocrit": np.random.normal(42, 4),
-            "platelets": np.random.normal(250, 50),
-            "neutrophils": np.random.normal(55, 8),
-            "lymphocytes": np.random.normal(30, 5),
-            "monocytes": np.random.normal(5, 1.5),
-            "eosinophils": np.random.normal(2, 0.8),
-            "basophils": np.random.normal(0.5, 0.3),
-            "cea": np.random.exponential(1.5),
-            "ca125": np.random.normal(15, 8),
-            "ca199": np.random.normal(15, 8),
-            "afp": np.random.normal(4, 2),
-            "psa": np.random.normal(1.5, 1),
-            "ca153": np.random.normal(12, 5),
-            "crp": np.random.exponential(1),
-            "esr": np.random.normal(8, 4),
-            "ldh": np.random.normal(180, 30),
-            "alt": np.random.normal(25, 10),
-            "ast": np.random.normal(20, 8),
-            "albumin": np.random.normal(4.2, 0.3),
-            "creatinine": np.random.normal(0.9, 0.15),
-            "glucose_fasting": np.random.normal(85, 8),
-            "hba1c": np.random.normal(5.2, 0.3),
-            "total_cholesterol": np.random.normal(180, 25),
-            "vitamin_d": np.random.normal(45, 15),
-            # Smartwatch
-            "heart_rate_resting_avg": np.random.normal(68, 8),
-            "heart_rate_variability_avg": np.random.normal(50, 15),
-            "spo2_avg": np.random.normal(97.5, 0.8),
-            "steps_daily_avg": np.random.normal(7000, 2000),
-            "sleep_duration_avg": np.random.normal(450, 30),
-            "stress_level_avg": np.random.normal(35, 12),
-            # Lifestyle
-            "age": np.random.normal(45, 12),
-            "gender_encoded": np.random.choice([0, 1]),
-            "bmi": np.random.normal(24, 3),
-            "smoking_status_encoded": np.random.choice([0, 0, 0, 1]),
-            "pack_years": 0,
-            "alcohol_units_per_week": np.random.exponential(3),
-            "exercise_minutes_per_week": np.random.normal(150, 60),
-            # Genetic
-            "family_cancer_count": np.random.choice([0, 0, 0, 1]),
-            "brca1_positive": 0,
-            "brca2_positive": 0,
-            "genetic_risk_score": np.random.normal(0.1, 0.05),
-            # Medical
-            "has_diabetes": np.random.choice([0, 0, 0, 0, 1]),
-            "has_hypertension": np.random.choice([0, 0, 0, 1]),
-            "has_previous_cancer": 0,
-            "chronic_condition_count": np.random.choice([0, 0, 1, 1, 2]),
-        }
-    
-    def _generate_cancer_sample(self, cancer_type: str) -> Dict[str, float]:
-        """Generate a cancer patient's features with abnormal patterns."""
-        sample = self._generate_healthy_sample()
-        
-        # Common cancer indicators
-        sample["wbc_count"] = np.random.normal(12, 3)
-        sample["hemoglobin"] = np.random.normal(10, 2)
-        sample["platelets"] = np.random.normal(180, 80)
-        sample["crp"] = np.random.exponential(5)
-        sample["esr"] = np.random.normal(30, 15)
-        sample["ldh"] = np.random.normal(300, 80)
-        sample["albumin"] = np.random.normal(3.2, 0.5)
-        sample["age"] = np.random.normal(60, 10)
-        sample["has_previous_cancer"] = np.random.choice([0, 1], p=[0.7, 0.3])
-        
-        # Smartwatch anomalies
-        sample["heart_rate_resting_avg"] = np.random.normal(78, 10)
-        sample["heart_rate_variability_avg"] = np.random.normal(30, 10)
-        sample["spo2_avg"] = np.random.normal(95, 2)
-        sample["sleep_duration_avg"] = np.random.normal(360, 60)
-        sample["stress_level_avg"] = np.random.normal(55, 15)
-        
-        # Cancer-type specific markers
-        if cancer_type == "lung":
-            sample["cea"] = np.random.exponential(15)
-            sample["cyfra211"] = np.random.exponential(8) if "cyfra211" in sample else 8
-            sample["smoking_status_encoded"] = np.random.choice([2, 3, 4], p=[0.2, 0.4, 0.4])
-            sample["pack_years"] = np.random.normal(25, 10)
-        elif cancer_type == "breast":
-            sample["ca153"] = np.random.exponential(40)
-            sample["brca1_positive"] = np.random.choice([0, 1], p=[0.7, 0.3])
-            sample["gender_encoded"] = 1
-        elif cancer_type == "colorectal":
-            sample["cea"] = np.random.exponential(20)
-            sample["ca199"] = np.random.exponential(30)
-        elif cancer_type == "prostate":
-            sample["psa"] = np.random.exponential(15)
-            sample["gender_encoded"] = 0
-        elif cancer_type == "liver":
-            sample["afp"] = np.random.exponential(50)
-            sample["alt"] = np.random.normal(80, 30)
-            sample["ast"] = np.random.normal(70, 25)
-        elif cancer_type == "pancreatic":
-            sample["ca199"] = np.random.exponential(100)
-            sample["glucose_fasting"] = np.random.normal(130, 30)
-        
-        return sample
+        generator = SyntheticCohortGenerator(cancer_ratio=cancer_ratio, random_state=random_state)
+        return generator.generate(n_samples)
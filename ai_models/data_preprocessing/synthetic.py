@@ -0,0 +1,271 @@
+"""
+Synthetic Cohort Generator
+==========================
+
+Vectorized synthetic patients for model development and scale testing
+(no real PHI). Each class (``no_cancer`` and the six cancer types) is a
+parameter table mapping feature columns to a distribution. A cohort is
+generated column by column: every distribution is sampled once per chunk
+for all rows of the classes that share it, instead of building one dict
+per patient.
+
+Large cohorts are produced in fixed-size chunks and can be streamed into a
+memory-mapped training snapshot (see ai_models.training.datasets), so
+10M+ rows never have to fit in memory. Output is deterministic for a given
+seed and chunk size.
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HEALTHY_LABEL = "no_cancer"
+CANCER_TYPES = ("lung", "breast", "colorectal", "prostate", "liver", "pancreatic")
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+# column -> (distribution, *parameters); "choice" picks uniformly from the
+# listed values unless probabilities are given
+HEALTHY_PROFILE: Dict[str, Tuple[Any, ...]] = {
+    "wbc_count": ("normal", 7, 1.5),
+    "rbc_count": ("normal", 4.7, 0.4),
+    "hemoglobin": ("normal", 14, 1.5),
+    "hematocrit": ("normal", 42, 4),
+    "platelets": ("normal", 250, 50),
+    "neutrophils": ("normal", 55, 8),
+    "lymphocytes": ("normal", 30, 5),
+    "monocytes": ("normal", 5, 1.5),
+    "eosinophils": ("normal", 2, 0.8),
+    "basophils": ("normal", 0.5, 0.3),
+    "cea": ("exponential", 1.5),
+    "ca125": ("normal", 15, 8),
+    "ca199": ("normal", 15, 8),
+    "afp": ("normal", 4, 2),
+    "psa": ("normal", 1.5, 1),
+    "ca153": ("normal", 12, 5),
+    "crp": ("exponential", 1),
+    "esr": ("normal", 8, 4),
+    "ldh": ("normal", 180, 30),
+    "alt": ("normal", 25, 10),
+    "ast": ("normal", 20, 8),
+    "albumin": ("normal", 4.2, 0.3),
+    "creatinine": ("normal", 0.9, 0.15),
+    "glucose_fasting": ("normal", 85, 8),
+    "hba1c": ("normal", 5.2, 0.3),
+    "total_cholesterol": ("normal", 180, 25),
+    "vitamin_d": ("normal", 45, 15),
+    # Smartwatch
+    "heart_rate_resting_avg": ("normal", 68, 8),
+    "heart_rate_variability_avg": ("normal", 50, 15),
+    "spo2_avg": ("normal", 97.5, 0.8),
+    "steps_daily_avg": ("normal", 7000, 2000),
+    "sleep_duration_avg": ("normal", 450, 30),
+    "stress_level_avg": ("normal", 35, 12),
+    # Lifestyle
+    "age": ("normal", 45, 12),
+    "gender_encoded": ("choice", (0, 1)),
+    "bmi": ("normal", 24, 3),
+    "smoking_status_encoded": ("choice", (0, 1), (0.75, 0.25)),
+    "pack_years": ("constant", 0),
+    "alcohol_units_per_week": ("exponential", 3),
+    "exercise_minutes_per_week": ("normal", 150, 60),
+    # Genetic
+    "family_cancer_count": ("choice", (0, 1), (0.75, 0.25)),
+    "brca1_positive": ("constant", 0),
+    "brca2_positive": ("constant", 0),
+    "genetic_risk_score": ("normal", 0.1, 0.05),
+    # Medical
+    "has_diabetes": ("choice", (0, 1), (0.8, 0.2)),
+    "has_hypertension": ("choice", (0, 1), (0.75, 0.25)),
+    "has_previous_cancer": ("constant", 0),
+    "chronic_condition_count": ("choice", (0, 1, 2), (0.4, 0.4, 0.2)),
+    # Only measured for lung cancer patients
+    "cyfra211": ("missing",),
+}
+
+# Shared by every cancer type, on top of HEALTHY_PROFILE
+CANCER_PROFILE: Dict[str, Tuple[Any, ...]] = {
+    "wbc_count": ("normal", 12, 3),
+    "hemoglobin": ("normal", 10, 2),
+    "platelets": ("normal", 180, 80),
+    "crp": ("exponential", 5),
+    "esr": ("normal", 30, 15),
+    "ldh": ("normal", 300, 80),
+    "albumin": ("normal", 3.2, 0.5),
+    "age": ("normal", 60, 10),
+    "has_previous_cancer": ("choice", (0, 1), (0.7, 0.3)),
+    # Smartwatch anomalies
+    "heart_rate_resting_avg": ("normal", 78, 10),
+    "heart_rate_variability_avg": ("normal", 30, 10),
+    "spo2_avg": ("normal", 95, 2),
+    "sleep_duration_avg": ("normal", 360, 60),
+    "stress_level_avg": ("normal", 55, 15),
+}
+
+# Cancer-type specific markers, on top of CANCER_PROFILE
+CANCER_TYPE_PROFILES: Dict[str, Dict[str, Tuple[Any, ...]]] = {
+    "lung": {
+        "cea": ("exponential", 15),
+        "cyfra211": ("constant", 8),
+        "smoking_status_encoded": ("choice", (2, 3, 4), (0.2, 0.4, 0.4)),
+        "pack_years": ("normal", 25, 10),
+    },
+    "breast": {
+        "ca153": ("exponential", 40),
+        "brca1_positive": ("choice", (0, 1), (0.7, 0.3)),
+        "gender_encoded": ("constant", 1),
+    },
+    "colorectal": {
+        "cea": ("exponential", 20),
+        "ca199": ("exponential", 30),
+    },
+    "prostate": {
+        "psa": ("exponential", 15),
+        "gender_encoded": ("constant", 0),
+    },
+    "liver": {
+        "afp": ("exponential", 50),
+        "alt": ("normal", 80, 30),
+        "ast": ("normal", 70, 25),
+    },
+    "pancreatic": {
+        "ca199": ("exponential", 100),
+        "glucose_fasting": ("normal", 130, 30),
+    },
+}
+
+
+def _draw(rng: np.random.Generator, spec: Tuple[Any, ...], n: int) -> np.ndarray:
+    kind, *params = spec
+    if kind == "normal":
+        return rng.normal(params[0], params[1], n)
+    if kind == "exponential":
+        return rng.exponential(params[0], n)
+    if kind == "choice":
+        probabilities = params[1] if len(params) > 1 else None
+        return rng.choice(np.asarray(params[0], dtype=float), n, p=probabilities)
+    if kind == "constant":
+        return np.full(n, float(params[0]))
+    if kind == "missing":
+        return np.full(n, np.nan)
+    raise ValueError(f"Unknown distribution {kind!r}")
+
+
+class SyntheticCohortGenerator:
+    """
+    Draws synthetic cohorts from per-class parameter tables.
+
+    ``cancer_ratio`` of the rows are cancer patients, spread evenly over
+    CANCER_TYPES; row order is shuffled. ``random_state`` is a seed or a
+    ``numpy.random.Generator``, which is then consumed in place.
+    """
+
+    def __init__(
+        self,
+        cancer_ratio: float = 0.3,
+        random_state: Union[int, np.random.Generator, None] = 42,
+    ):
+        self.cancer_ratio = cancer_ratio
+        self.rng = np.random.default_rng(random_state)
+        self.classes = (HEALTHY_LABEL,) + CANCER_TYPES
+        self.columns = list(HEALTHY_PROFILE)
+
+        # Per column: classes grouped by identical distribution, so each
+        # distribution is sampled once per chunk
+        profiles = [HEALTHY_PROFILE] + [
+            {**HEALTHY_PROFILE, **CANCER_PROFILE, **CANCER_TYPE_PROFILES[t]} for t in CANCER_TYPES
+        ]
+        self._column_groups: List[List[Tuple[Tuple[Any, ...], Tuple[int, ...]]]] = []
+        for column in self.columns:
+            groups: Dict[Tuple[Any, ...], List[int]] = {}
+            for k, profile in enumerate(profiles):
+                groups.setdefault(profile[column], []).append(k)
+            self._column_groups.append([(spec, tuple(ks)) for spec, ks in groups.items()])
+
+    def sample_labels(self, n_samples: int) -> np.ndarray:
+        """Shuffled class codes (indices into ``classes``) for a cohort."""
+        n_cancer = int(n_samples * self.cancer_ratio)
+        per_type, extra = divmod(n_cancer, len(CANCER_TYPES))
+        counts = [n_samples - n_cancer] + [per_type + (k < extra) for k in range(len(CANCER_TYPES))]
+        codes = np.repeat(np.arange(len(self.classes), dtype=np.int8), counts)
+        return self.rng.permutation(codes)
+
+    def generate_block(self, codes: np.ndarray) -> np.ndarray:
+        """Feature matrix (rows x ``columns``) for the given class codes."""
+        block = np.empty((len(codes), len(self.columns)), order="F")
+        class_rows = [np.flatnonzero(codes == k) for k in range(len(self.classes))]
+        group_rows: Dict[Tuple[int, ...], np.ndarray] = {}
+        for j, groups in enumerate(self._column_groups):
+            for spec, ks in groups:
+                rows = group_rows.get(ks)
+                if rows is None:
+                    rows = group_rows[ks] = np.sort(np.concatenate([class_rows[k] for k in ks]))
+                block[rows, j] = _draw(self.rng, spec, len(rows))
+        return block
+
+    def iter_chunks(
+        self, n_samples: int, chunk_size: int = DEFAULT_CHUNK_ROWS
+    ) -> Iterator[Tuple[pd.DataFrame, pd.Series]]:
+        """Yield a cohort of ``n_samples`` rows as consecutive chunks."""
+        codes = self.sample_labels(n_samples)
+        labels = np.array(self.classes, dtype=object)
+        for start in range(0, n_samples, chunk_size):
+            chunk_codes = codes[start:start + chunk_size]
+            index = pd.RangeIndex(start, start + len(chunk_codes))
+            yield (
+                pd.DataFrame(self.generate_block(chunk_codes), columns=self.columns, index=index),
+                pd.Series(labels[chunk_codes], index=index),
+            )
+
+    def generate(self, n_samples: int = 1000) -> Tuple[pd.DataFrame, pd.Series]:
+        """Generate a whole cohort in memory."""
+        codes = self.sample_labels(n_samples)
+        df = pd.DataFrame(self.generate_block(codes), columns=self.columns)
+        return df, pd.Series(np.array(self.classes, dtype=object)[codes])
+
+    def write_snapshot(
+        self,
+        out_dir: Union[str, Path],
+        n_samples: int,
+        chunk_size: int = DEFAULT_CHUNK_ROWS,
+    ):
+        """
+        Stream a cohort into a training snapshot on disk.
+
+        X.npy (float32) is filled chunk by chunk through a memory map; y holds
+        class codes, with the class names in ``metadata["classes"]``. Reload
+        with ``TrainingSnapshot.load``.
+        """
+        from ai_models.training.datasets import TrainingSnapshot
+
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        codes = self.sample_labels(n_samples)
+        X = np.lib.format.open_memmap(
+            out / "X.npy", mode="w+", dtype=np.float32, shape=(n_samples, len(self.columns))
+        )
+        for start in range(0, n_samples, chunk_size):
+            X[start:start + chunk_size] = self.generate_block(codes[start:start + chunk_size])
+            logger.info(f"Generated synthetic rows {start}-{min(start + chunk_size, n_samples)} of {n_samples}")
+
+        snapshot = TrainingSnapshot(
+            X=X,
+            y=codes,
+            feature_names=list(self.columns),
+            sample_ids=np.arange(n_samples, dtype=np.int64),
+            metadata={
+                "source": "synthetic",
+                "classes": list(self.classes),
+                "cancer_ratio": self.cancer_ratio,
+                "chunk_size": chunk_size,
+            },
+        )
+        snapshot.save(out)
+        return snapshot
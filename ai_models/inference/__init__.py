@@ -1 +1,6 @@
 """Inference Package"""
+from ai_models.inference.attribution import AttributionEngine, build_attribution_engine
+from ai_models.inference.batching import MicroBatchBroker
+from ai_models.inference.cache import PredictionCache
+from ai_models.inference.executor import InferenceExecutor
+from ai_models.inference.tree_engine import TreeEngine, compile_estimator
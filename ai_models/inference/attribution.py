@@ -0,0 +1,364 @@
+"""
+Per-Prediction Feature Attribution
+==================================
+
+Explains individual predictions of the serving model as additive feature
+contributions: ``proba(x) = base(x) + sum_f contributions[f]`` for every
+class.
+
+- Tree members (RandomForest, ExtraTrees, DecisionTree, GradientBoosting)
+  get exact path-dependent TreeSHAP values. Every root-to-leaf path is
+  compiled once into its unique features, their zero fractions (share of
+  training cover following the path) and the interval a sample must fall
+  in to follow it. For a leaf with value v, feature i's share is
+
+      v * (o_i - z_i) * integral_0^1 prod_{k != i} (z_k + (o_k - z_k) u) du
+
+  (o_k = 1 when the sample satisfies the path's conditions on feature k).
+  The integrand is a polynomial of degree < depth, so a Gauss-Legendre
+  rule with depth/2 nodes evaluates it exactly; the whole batch and a
+  block of paths are processed at once with array operations.
+- Linear members (LogisticRegression, SGDClassifier) get
+  ``coef * (x - background)`` on the decision function; the background
+  defaults to zero, the training mean of standardized inputs.
+- Gradient boosting and linear contributions live in margin space. They
+  are mapped to probabilities through the link's Jacobian at the midpoint
+  and rescaled so each class sums exactly to its probability change.
+- A StackingClassifier with a linear final estimator combines its members'
+  contributions through the meta-learner's coefficients. Members without
+  an explainer (MLP, ...) are held at their actual output, so the base
+  value of such a model depends on the row.
+
+Compiling the paths happens once per fitted model (see
+``CancerRiskClassifier.attribution_engine_``); the tables are saved with
+the model artifact, so every worker serving a version shares them.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.ensemble import StackingClassifier
+
+from ai_models.inference.tree_engine import (
+    BOOSTING_TYPES, FOREST_TYPES, TreeEngine, _raw_to_proba, is_compilable,
+)
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the (rows x paths x depth x quadrature nodes) temporaries
+BLOCK_ELEMENTS = 1 << 21
+
+_TREE_LEAF = -1
+
+
+def _margin_to_proba(margin_values: np.ndarray, proba: np.ndarray, base_proba: np.ndarray) -> np.ndarray:
+    """
+    Map margin-space contributions (n, F, K) to probability space (n, F, C).
+
+    A single margin column is the positive-class margin of a binary model.
+    """
+    if margin_values.shape[2] == 1 and proba.shape[1] == 2:
+        margin_values = np.concatenate([np.zeros_like(margin_values), margin_values], axis=2)
+    mid = (proba + base_proba) / 2
+    # Softmax Jacobian: d p_c / d m_k = p_c (delta_ck - p_k)
+    jacobian = mid[:, :, np.newaxis] * (np.eye(mid.shape[1])[np.newaxis] - mid[:, np.newaxis, :])
+    values = np.einsum("nfk,nck->nfc", margin_values, jacobian)
+
+    total = values.sum(axis=1)
+    delta = proba - base_proba
+    scale = np.divide(delta, total, out=np.ones_like(total), where=np.abs(total) > 1e-12)
+    return values * scale[:, np.newaxis, :]
+
+
+class TreePathExplainer:
+    """Exact path-dependent TreeSHAP for one tree-based classifier."""
+
+    def __init__(self, estimator: Any):
+        self.n_features = int(estimator.n_features_in_)
+        self.is_boosting = isinstance(estimator, BOOSTING_TYPES)
+        trees = TreeEngine._trees_of(estimator)
+
+        if self.is_boosting:
+            self.loss = estimator._loss
+            self.n_outputs = int(estimator.estimators_.shape[1])
+            probe = np.zeros((1, self.n_features), dtype=np.float32)
+            self.init_raw = (
+                np.zeros(self.n_outputs) if estimator.init_ == "zero"
+                else np.asarray(estimator._raw_predict_init(probe)[0], dtype=np.float64)
+            )
+        else:
+            self.n_outputs = int(estimator.n_classes_)
+
+        self._compile(estimator, trees)
+
+    def _node_values(self, estimator: Any, trees: List[Any]) -> List[np.ndarray]:
+        """Per-node output of every tree, laid out as (nodes, n_outputs)."""
+        values = []
+        for i, tree in enumerate(trees):
+            if self.is_boosting:
+                value = np.zeros((tree.node_count, self.n_outputs))
+                value[:, i % self.n_outputs] = estimator.learning_rate * tree.value[:, 0, 0]
+            else:
+                value = TreeEngine._normalized_leaf_proba(tree, self.n_outputs)
+                if isinstance(estimator, FOREST_TYPES):
+                    value = value / len(trees)
+            values.append(value)
+        return values
+
+    def _compile(self, estimator: Any, trees: List[Any]) -> None:
+        """Flatten every root-to-leaf path into per-feature conditions."""
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        feature = np.concatenate([tree.feature for tree in trees]).astype(np.intp)
+        threshold = np.concatenate([tree.threshold for tree in trees]).astype(np.float64)
+        cover = np.concatenate([tree.weighted_n_node_samples for tree in trees]).astype(np.float64)
+        left = np.concatenate([
+            np.where(tree.children_left == _TREE_LEAF, _TREE_LEAF, tree.children_left + offset)
+            for tree, offset in zip(trees, offsets)
+        ])
+        right = np.concatenate([
+            np.where(tree.children_right == _TREE_LEAF, _TREE_LEAF, tree.children_right + offset)
+            for tree, offset in zip(trees, offsets)
+        ])
+        node_values = np.concatenate(self._node_values(estimator, trees))
+        depth = max(1, max(tree.max_depth for tree in trees))
+
+        # Breadth-first over all trees at once; each frontier node carries
+        # its path's unique features and their accumulated conditions
+        nodes = offsets[:-1].astype(np.intp)
+        k = len(nodes)
+        feats = np.full((k, depth), -1, dtype=np.intp)
+        zeros = np.ones((k, depth))
+        lower = np.full((k, depth), -np.inf)
+        upper = np.full((k, depth), np.inf)
+        used = np.zeros(k, dtype=np.intp)
+
+        leaves = []
+        while len(nodes):
+            is_leaf = left[nodes] == _TREE_LEAF
+            if is_leaf.any():
+                leaves.append((nodes[is_leaf], feats[is_leaf], zeros[is_leaf], lower[is_leaf], upper[is_leaf]))
+            split = ~is_leaf
+            nodes, feats, zeros = nodes[split], feats[split], zeros[split]
+            lower, upper, used = lower[split], upper[split], used[split]
+            if not len(nodes):
+                break
+
+            rows = np.arange(len(nodes))
+            f, t = feature[nodes], threshold[nodes]
+            match = feats == f[:, np.newaxis]
+            seen = match.any(axis=1)
+            slot = np.where(seen, match.argmax(axis=1), used)
+
+            children = []
+            for child, goes_left in ((left[nodes], True), (right[nodes], False)):
+                c_feats, c_zeros = feats.copy(), zeros.copy()
+                c_lower, c_upper = lower.copy(), upper.copy()
+                c_feats[rows, slot] = f
+                c_zeros[rows, slot] *= cover[child] / cover[nodes]
+                if goes_left:
+                    # x <= threshold
+                    c_upper[rows, slot] = np.minimum(upper[rows, slot], t)
+                else:
+                    c_lower[rows, slot] = np.maximum(lower[rows, slot], t)
+                children.append((child, c_feats, c_zeros, c_lower, c_upper))
+
+            used = np.concatenate([used + ~seen, used + ~seen])
+            nodes, feats, zeros, lower, upper = (
+                np.concatenate(parts) for parts in zip(*children)
+            )
+
+        leaf_nodes, feats, zeros, lower, upper = (np.concatenate(parts) for parts in zip(*leaves))
+        padding = feats < 0
+        # Padding slots always match and have zero fraction 1, so they contribute nothing
+        self.features = np.where(padding, 0, feats).astype(np.intp)
+        self.zero_fractions = zeros
+        self.lower = lower
+        self.upper = upper
+        self.depth = depth
+        self.n_paths = len(leaf_nodes)
+
+        leaf_values = node_values[leaf_nodes]
+        # The product of zero fractions is the leaf's share of the root cover
+        self.expected_value = (zeros.prod(axis=1)[:, np.newaxis] * leaf_values).sum(axis=0)
+
+        # Gathers slot weights (path-major, slot-minor) into (feature, output) rows
+        slot_rows = np.arange(self.n_paths * depth).reshape(self.n_paths, depth)
+        keep = ~padding
+        rows = np.repeat(slot_rows[keep], self.n_outputs)
+        columns = (self.features[keep][:, np.newaxis] * self.n_outputs + np.arange(self.n_outputs)).ravel()
+        data = np.repeat(leaf_values, depth, axis=0).reshape(self.n_paths, depth, -1)[keep].ravel()
+        nonzero = data != 0
+        self.scatter = sparse.csc_matrix(
+            (data[nonzero], (columns[nonzero], rows[nonzero])),
+            shape=(self.n_features * self.n_outputs, self.n_paths * depth),
+        )
+
+        # Quadrature tables. Each factor z + (o - z) u is z + (1 - z) u when
+        # the sample matches the slot and z (1 - u) otherwise, so the product
+        # over slots is exp(log_off + log_ratio @ o) and a slot's share is a
+        # dot product of the quadrature weights with product / factor.
+        n_nodes = max(1, (depth + 1) // 2)
+        u, w = np.polynomial.legendre.leggauss(n_nodes)
+        u, w = (u + 1) / 2, w / 2
+        z = zeros[:, :, np.newaxis]
+        factor_on = z + (1 - z) * u
+        factor_off = z * (1 - u)
+        self.log_off = np.log(factor_off).sum(axis=1)[:, :, np.newaxis]
+        self.log_ratio = np.swapaxes(np.log(factor_on) - np.log(factor_off), 1, 2)
+        # Slot weights for matching and non-matching slots, with the (o - z)
+        # factor folded in
+        self.share_on = w * (1 - z) / factor_on
+        self.share_off = -w * z / factor_off
+
+    def shap_values(self, X: np.ndarray) -> np.ndarray:
+        """Contributions (n, features, outputs) in the model's raw output space."""
+        # Trees compare float32 inputs against float64 thresholds. NaN goes
+        # right at every split, exactly like +inf.
+        X_t = np.asarray(X, dtype=np.float32).T.copy()
+        X_t[np.isnan(X_t)] = np.inf
+        n = X_t.shape[1]
+        depth = self.depth
+        out = np.zeros((self.n_features * self.n_outputs, n))
+        block = max(1, BLOCK_ELEMENTS // max(1, n * depth * self.log_ratio.shape[1]))
+
+        for start in range(0, self.n_paths, block):
+            paths = slice(start, start + block)
+            # (paths, slots, rows)
+            x = X_t[self.features[paths]]
+            ones = (x <= self.upper[paths, :, np.newaxis]) & (x > self.lower[paths, :, np.newaxis])
+            product = np.exp(self.log_off[paths] + self.log_ratio[paths] @ ones.astype(np.float64))
+            slot_weights = self.share_off[paths] @ product
+            np.copyto(slot_weights, self.share_on[paths] @ product, where=ones)
+            out += self.scatter[:, start * depth:(start + block) * depth] @ slot_weights.reshape(-1, n)
+
+        return out.T.reshape(n, self.n_features, self.n_outputs)
+
+    def explain(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Probability contributions, probabilities and base probabilities."""
+        values = self.shap_values(X)
+        raw = self.expected_value + values.sum(axis=1)
+        if not self.is_boosting:
+            base = np.broadcast_to(self.expected_value, raw.shape)
+            return values, raw, base
+
+        base_raw = np.broadcast_to(self.init_raw + self.expected_value, raw.shape)
+        raw = raw + self.init_raw
+        if self.n_outputs == 1:
+            proba = _raw_to_proba(self.loss, raw.ravel())
+            base = _raw_to_proba(self.loss, base_raw.ravel())
+        else:
+            proba = _raw_to_proba(self.loss, raw)
+            base = _raw_to_proba(self.loss, base_raw)
+        return _margin_to_proba(values, proba, base), proba, base
+
+
+class LinearExplainer:
+    """Exact contributions of a linear classifier's decision function."""
+
+    def __init__(self, estimator: Any, background: Optional[np.ndarray] = None):
+        self.estimator = estimator
+        n_features = estimator.coef_.shape[1]
+        self.background = np.zeros(n_features) if background is None else np.asarray(background, dtype=float)
+
+    def explain(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        X = np.asarray(X, dtype=float)
+        # Coefficients are read on every call, so incrementally updated models stay current
+        margin_values = (X - self.background)[:, :, np.newaxis] * self.estimator.coef_.T[np.newaxis]
+        proba = self.estimator.predict_proba(X)
+        base = np.broadcast_to(self.estimator.predict_proba(self.background[np.newaxis]), proba.shape)
+        return _margin_to_proba(margin_values, proba, base), proba, base
+
+
+def _is_linear(estimator: Any) -> bool:
+    return hasattr(estimator, "coef_") and hasattr(estimator, "predict_proba") and np.ndim(estimator.coef_) == 2
+
+
+def _member_explainer(estimator: Any, background: Optional[np.ndarray]):
+    if is_compilable(estimator):
+        if isinstance(estimator, BOOSTING_TYPES) and estimator.loss not in ("log_loss", "deviance"):
+            return None
+        return TreePathExplainer(estimator)
+    if _is_linear(estimator):
+        return LinearExplainer(estimator, background)
+    return None
+
+
+class AttributionEngine:
+    """Per-row feature contributions to the class probabilities of a model."""
+
+    def __init__(self, estimator: Any, background: Optional[np.ndarray] = None):
+        self.estimator = estimator
+        if isinstance(estimator, StackingClassifier):
+            self.members = [
+                _member_explainer(est, background) if est != "drop" and method == "predict_proba" else None
+                for est, method in zip(estimator.estimators_, estimator.stack_method_)
+            ]
+            self.explainer = None
+        else:
+            self.members = []
+            self.explainer = _member_explainer(estimator, background)
+
+    @property
+    def explained_members(self) -> int:
+        if self.explainer is not None:
+            return 1
+        return sum(explainer is not None for explainer in self.members)
+
+    def explain(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Contributions (n, features, classes) and base probabilities (n, classes).
+
+        ``base + contributions.sum(axis=1)`` equals the model's probabilities.
+        """
+        if self.explainer is not None:
+            values, _, base = self.explainer.explain(X)
+            return values, np.array(base)
+        return self._explain_stacking(np.asarray(X, dtype=float))
+
+    def _explain_stacking(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        stacking = self.estimator
+        binary = len(stacking.classes_) == 2
+        outputs, base_outputs, member_values = [], [], []
+        explainers = iter(self.members)
+        for est, method in zip(stacking.estimators_, stacking.stack_method_):
+            if est == "drop":
+                continue
+            explainer = next(explainers)
+            if explainer is None:
+                # Held at its actual output: contributes nothing, shifts the base
+                output = getattr(est, method)(X)
+                if output.ndim == 1:
+                    output = output[:, np.newaxis]
+                elif method == "predict_proba" and binary:
+                    output = output[:, 1:]
+                outputs.append(output)
+                base_outputs.append(output)
+                member_values.append(np.zeros((len(X), X.shape[1], output.shape[1])))
+                continue
+            values, output, base = explainer.explain(X)
+            # The stacking features of binary models are the positive-class column only
+            columns = slice(1, None) if binary else slice(None)
+            outputs.append(output[:, columns])
+            base_outputs.append(base[:, columns])
+            member_values.append(values[:, :, columns])
+
+        final = stacking.final_estimator_
+        stacked = np.hstack(outputs)
+        stacked_base = np.hstack(base_outputs)
+        margin_values = np.concatenate(member_values, axis=2) @ final.coef_.T
+        proba = final.predict_proba(stacked)
+        base = final.predict_proba(stacked_base)
+        return _margin_to_proba(margin_values, proba, base), base
+
+
+def build_attribution_engine(estimator: Any, background: Optional[np.ndarray] = None) -> Optional[AttributionEngine]:
+    """Compile an attribution engine for a serving estimator, or None if unsupported."""
+    if isinstance(estimator, StackingClassifier):
+        if getattr(estimator, "passthrough", False) or not _is_linear(estimator.final_estimator_):
+            return None
+    engine = AttributionEngine(estimator, background)
+    return engine if engine.explained_members else None
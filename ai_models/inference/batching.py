@@ -0,0 +1,259 @@
+"""
+Dynamic Micro-Batching Inference Broker
+=======================================
+
+Collects concurrent scoring requests for a few milliseconds (or until a
+maximum batch size is reached), evaluates them with a single vectorized
+model call and resolves each caller's future with its own row. Up to
+``max_in_flight`` batches are evaluated at once, so a multi-worker
+executor stays busy while the next batch is being collected.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BatchPredictFn = Callable[[pd.DataFrame], Union[np.ndarray, Awaitable[np.ndarray]]]
+
+# Queued after the last request when draining; tells the loop to exit
+_STOP = object()
+
+
+@dataclass
+class _PendingRequest:
+    """A single queued scoring request."""
+    features: Dict[str, Any]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class MicroBatchBroker:
+    """
+    In-process broker that turns many single-row scoring requests into
+    a handful of batched model calls.
+
+    The batch function receives a DataFrame with one row per request
+    (columns aligned to ``feature_names`` when given) and must return an
+    array with one output row per input row. It may be a plain function
+    or a coroutine function. ``max_in_flight`` caps how many batches run
+    concurrently; size it to the number of inference workers.
+    """
+
+    def __init__(
+        self,
+        predict_fn: BatchPredictFn,
+        feature_names: Optional[List[str]] = None,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        max_in_flight: int = 1,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be >= 1")
+        self.predict_fn = predict_fn
+        self.feature_names = feature_names
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_in_flight = max_in_flight
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._batches: Set[asyncio.Task] = set()
+
+        # Metrics
+        self._total_requests = 0
+        self._total_batches = 0
+        self._total_errors = 0
+        self._last_batch_size = 0
+        self._max_observed_batch_size = 0
+        self._max_queue_depth = 0
+        self._max_observed_in_flight = 0
+        self._total_batch_latency = 0.0
+        self._total_wait_latency = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self) -> None:
+        """Start the background batching loop."""
+        if self.is_running:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._worker = asyncio.create_task(self._run(), name="micro-batch-broker")
+        logger.info(
+            f"Micro-batch broker started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait_ms}, max_in_flight={self.max_in_flight})"
+        )
+
+    async def stop(self, drain: bool = False) -> None:
+        """
+        Stop the batching loop.
+
+        With ``drain=True`` every request queued before the call is still
+        scored; otherwise queued and in-flight requests fail immediately.
+        """
+        if self._worker is None:
+            return
+        worker, self._worker = self._worker, None
+        if drain and not worker.done():
+            await self._queue.put(_STOP)
+            await worker
+        else:
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+            for task in list(self._batches):
+                task.cancel()
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+        while self._queue is not None and not self._queue.empty():
+            pending = self._queue.get_nowait()
+            if pending is not _STOP and not pending.future.done():
+                pending.future.set_exception(RuntimeError("Inference broker stopped"))
+        logger.info("Micro-batch broker stopped")
+
+    async def submit(self, features: Dict[str, Any]) -> np.ndarray:
+        """Queue one feature record and wait for its model output row."""
+        if not self.is_running:
+            raise RuntimeError("Inference broker is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingRequest(features=features, future=future))
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _run(self) -> None:
+        """Collect requests into batches and dispatch them."""
+        stopping = False
+        batch: List[_PendingRequest] = []
+        try:
+            while not stopping:
+                # Wait for a free slot before collecting, so requests keep
+                # queueing (and the next batch grows) while every slot is busy
+                await self._slots.acquire()
+                first = await self._queue.get()
+                if first is _STOP:
+                    self._slots.release()
+                    break
+                batch = [first]
+                deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+
+                while len(batch) < self.max_batch_size:
+                    # Take whatever is already queued without waiting
+                    if not self._queue.empty():
+                        item = self._queue.get_nowait()
+                    else:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            break
+                        try:
+                            item = await asyncio.wait_for(self._queue.get(), remaining)
+                        except asyncio.TimeoutError:
+                            break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                task = asyncio.create_task(self._dispatch(batch))
+                self._batches.add(task)
+                task.add_done_callback(self._batch_done)
+                self._max_observed_in_flight = max(self._max_observed_in_flight, len(self._batches))
+                batch = []
+        except asyncio.CancelledError:
+            # Requests already taken off the queue but not yet dispatched
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(RuntimeError("Inference broker stopped"))
+            raise
+
+        # Draining: let the batches already dispatched finish
+        await asyncio.gather(*self._batches, return_exceptions=True)
+
+    def _batch_done(self, task: asyncio.Task) -> None:
+        self._batches.discard(task)
+        self._slots.release()
+
+    async def _dispatch(self, batch: List[_PendingRequest]) -> None:
+        """Run one vectorized model call and resolve every caller."""
+        started = time.perf_counter()
+        frame = pd.DataFrame.from_records(
+            [pending.features for pending in batch], columns=self.feature_names
+        )
+
+        try:
+            outputs = self.predict_fn(frame)
+            if inspect.isawaitable(outputs):
+                outputs = await outputs
+            outputs = np.asarray(outputs)
+            if len(outputs) != len(batch):
+                raise RuntimeError(
+                    f"Batch function returned {len(outputs)} rows for {len(batch)} requests"
+                )
+        except asyncio.CancelledError:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(RuntimeError("Inference broker stopped"))
+            raise
+        except Exception as e:
+            self._total_errors += 1
+            logger.warning(f"Batched inference failed for {len(batch)} requests: {e}")
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+        finally:
+            self._record_batch(batch, started)
+
+        for pending, row in zip(batch, outputs):
+            if not pending.future.done():
+                pending.future.set_result(row)
+
+    def _record_batch(self, batch: List[_PendingRequest], started: float) -> None:
+        """Update batch-level metrics."""
+        finished = time.perf_counter()
+        self._total_batches += 1
+        self._total_requests += len(batch)
+        self._last_batch_size = len(batch)
+        self._max_observed_batch_size = max(self._max_observed_batch_size, len(batch))
+        self._total_batch_latency += finished - started
+        self._total_wait_latency += sum(started - pending.enqueued_at for pending in batch)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get queue-depth and batch-size metrics."""
+        batches = max(self._total_batches, 1)
+        requests = max(self._total_requests, 1)
+        return {
+            "running": self.is_running,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "max_in_flight": self.max_in_flight,
+            "in_flight_batches": len(self._batches),
+            "max_observed_in_flight": self._max_observed_in_flight,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self._max_queue_depth,
+            "total_requests": self._total_requests,
+            "total_batches": self._total_batches,
+            "total_errors": self._total_errors,
+            "last_batch_size": self._last_batch_size,
+            "max_observed_batch_size": self._max_observed_batch_size,
+            "mean_batch_size": self._total_requests / batches,
+            "mean_batch_latency_ms": 1000.0 * self._total_batch_latency / batches,
+            "mean_queue_wait_ms": 1000.0 * self._total_wait_latency / requests,
+        }
@@ -0,0 +1,184 @@
+"""
+Prediction Cache
+================
+
+Memoizes model outputs per row. The same patient is scored again and again
+with unchanged inputs (dashboard loads, clinician views, nightly jobs), so
+outputs are cached under a fingerprint of the *preprocessed* feature vector
+plus the model version: only the ensemble call is skipped, and inputs that
+preprocess identically share an entry.
+
+The cache is an LRU bounded by ``max_entries`` rows. It is bound to one
+model version at a time; binding another version (a registry activation)
+drops every entry, and writes for any other version are ignored, so a
+request still finishing on the old version cannot repopulate it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 10_000
+
+ComputeFn = Callable[[np.ndarray], Union[Any, Awaitable[Any]]]
+
+
+def fingerprint_rows(X: np.ndarray) -> List[bytes]:
+    """Stable 128-bit digest of each row of a numeric matrix."""
+    # +0.0 turns -0.0 into 0.0; NaNs are rewritten with one bit pattern
+    X = np.ascontiguousarray(X, dtype=np.float64) + 0.0
+    X[np.isnan(X)] = np.nan
+    return [hashlib.blake2b(row.tobytes(), digest_size=16).digest() for row in X]
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of per-row model outputs.
+
+    Outputs live in namespaces ("proba", "explanation", ...) so different
+    methods of the same model do not collide. Thread-safe; the lock is only
+    held for lookups and inserts, never while the model runs.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, version: Optional[str] = None):
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        self.max_entries = max_entries
+        self._version = version
+        self._entries: "OrderedDict[Tuple[Optional[str], str, bytes], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Pickled (e.g. saved with a model) as an empty cache
+        return {"max_entries": self.max_entries, "version": self._version}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["max_entries"], state["version"])
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._version
+
+    def bind_version(self, version: Optional[str]) -> None:
+        """Serve another model version; entries of the previous one are dropped."""
+        with self._lock:
+            if version == self._version:
+                return
+            self._version = version
+            self._clear()
+        logger.info(f"Prediction cache bound to model version {version}")
+
+    def invalidate(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        if self._entries:
+            self._invalidations += 1
+        self._entries.clear()
+
+    def _lookup(
+        self, X: np.ndarray, namespace: str, version: Optional[str]
+    ) -> Tuple[List[Any], Dict[Hashable, List[int]]]:
+        """Cached values (None for misses) and the miss positions per distinct key."""
+        version = self._version if version is None else version
+        keys = [(version, namespace, digest) for digest in fingerprint_rows(X)]
+        values: List[Any] = [None] * len(keys)
+        missing: Dict[Hashable, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    values[i] = self._entries[key]
+                    self._hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+                    self._misses += 1
+        return values, missing
+
+    def _store(self, missing: Dict[Hashable, List[int]], values: List[Any], outputs: Any) -> None:
+        """Scatter computed outputs (one per distinct missing key) and cache them."""
+        with self._lock:
+            for (key, positions), output in zip(missing.items(), outputs):
+                if isinstance(output, np.ndarray):
+                    # Own, read-only copy instead of a view into the batch
+                    output = output.copy()
+                    output.flags.writeable = False
+                for i in positions:
+                    values[i] = output
+                if key[0] != self._version:
+                    continue
+                self._entries[key] = output
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    @staticmethod
+    def _first_rows(missing: Dict[Hashable, List[int]]) -> np.ndarray:
+        return np.fromiter((positions[0] for positions in missing.values()), dtype=np.intp, count=len(missing))
+
+    def get_or_compute(
+        self,
+        X: np.ndarray,
+        compute: ComputeFn,
+        namespace: str = "proba",
+        version: Optional[str] = None,
+    ) -> List[Any]:
+        """
+        One output per row of the preprocessed matrix ``X``.
+
+        ``compute`` receives the indices of the distinct missing rows and
+        returns their outputs in that order; ``version`` defaults to the
+        bound one.
+        """
+        values, missing = self._lookup(X, namespace, version)
+        if missing:
+            self._store(missing, values, compute(self._first_rows(missing)))
+        return values
+
+    async def aget_or_compute(
+        self,
+        X: np.ndarray,
+        compute: ComputeFn,
+        namespace: str = "proba",
+        version: Optional[str] = None,
+    ) -> List[Any]:
+        """``get_or_compute`` for a compute function that may be a coroutine."""
+        values, missing = self._lookup(X, namespace, version)
+        if missing:
+            outputs = compute(self._first_rows(missing))
+            if inspect.isawaitable(outputs):
+                outputs = await outputs
+            self._store(missing, values, outputs)
+        return values
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get hit-rate and occupancy metrics."""
+        lookups = self._hits + self._misses
+        return {
+            "version": self._version,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "evictions": self._evictions,
+            "invalidations": self._invalidations,
+        }
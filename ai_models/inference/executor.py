@@ -0,0 +1,196 @@
+"""
+Off-Event-Loop Model Execution Pool
+===================================
+
+Runs CPU-bound CancerRiskClassifier and CancerDataPreprocessor calls in a
+dedicated process pool so the asyncio event loop keeps serving other
+requests while a batch scores. Each worker process loads the model once
+at startup; the number of outstanding calls is bounded.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Per-worker state, populated by _init_worker in each child process
+_worker_model = None
+_worker_preprocessor = None
+
+
+def _init_worker(model_path: str) -> None:
+    """Load the model and preprocessor once per worker process."""
+    global _worker_model, _worker_preprocessor
+    from ai_models.data_preprocessing.preprocessor import CancerDataPreprocessor
+    from ai_models.models.cancer_classifier import CancerRiskClassifier
+
+    started = time.perf_counter()
+    _worker_model = CancerRiskClassifier.load_model(model_path)
+    # Lay features out exactly as the model's fitted pipeline expects them
+    _worker_preprocessor = CancerDataPreprocessor(
+        feature_pipeline=getattr(_worker_model, "feature_pipeline_", None)
+    )
+    logger.info(
+        f"Inference worker {os.getpid()} loaded model in "
+        f"{time.perf_counter() - started:.2f}s"
+    )
+
+
+def _worker_ping() -> int:
+    """No-op used to warm up worker processes."""
+    return os.getpid()
+
+
+def _call_model(method: str, args: tuple, kwargs: dict) -> Any:
+    return getattr(_worker_model, method)(*args, **kwargs)
+
+
+def _call_preprocessor(method: str, args: tuple, kwargs: dict) -> Any:
+    return getattr(_worker_preprocessor, method)(*args, **kwargs)
+
+
+class InferenceExecutor:
+    """
+    Process pool for model inference with an awaitable API.
+
+    At most ``max_pending`` calls may be outstanding at once; further
+    callers wait for a free slot instead of growing an unbounded queue.
+    """
+
+    def __init__(self, model_path: str, max_workers: int = 2, max_pending: int = 64):
+        if max_workers < 1:
+            raise ValueError("max_workers must be >= 1")
+        self.model_path = str(model_path)
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # Metrics
+        self._in_flight = 0
+        self._waiting = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_latency = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._pool is not None
+
+    async def start(self) -> None:
+        """Start the worker processes and wait until they have loaded the model."""
+        if self._pool is not None:
+            return
+        # Spawn (not fork) so workers do not inherit the event loop's threads
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_path,),
+        )
+        self._slots = asyncio.Semaphore(self.max_pending)
+
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(self._pool, _worker_ping)
+            for _ in range(self.max_workers)
+        ])
+        logger.info(f"Inference executor started with {self.max_workers} workers")
+
+    async def stop(self) -> None:
+        """Shut down the worker processes."""
+        if self._pool is None:
+            return
+        pool, self._pool = self._pool, None
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(pool.shutdown, wait=True, cancel_futures=True)
+        )
+        logger.info("Inference executor stopped")
+
+    async def _submit(self, fn, method: str, args: tuple, kwargs: dict) -> Any:
+        if self._pool is None:
+            raise RuntimeError("Inference executor is not running")
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._pool, functools.partial(fn, method, args, kwargs)
+            )
+            self._completed += 1
+            return result
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._total_latency += time.perf_counter() - started
+            self._in_flight -= 1
+            self._slots.release()
+
+    async def run_model(self, method: str, *args, **kwargs) -> Any:
+        """Call a CancerRiskClassifier method in a worker process."""
+        return await self._submit(_call_model, method, args, kwargs)
+
+    async def run_preprocessor(self, method: str, *args, **kwargs) -> Any:
+        """Call a CancerDataPreprocessor method in a worker process."""
+        return await self._submit(_call_preprocessor, method, args, kwargs)
+
+    async def predict_proba(self, X: pd.DataFrame) -> np.ndarray:
+        return await self.run_model("predict_proba", X)
+
+    async def preprocess(self, X: pd.DataFrame) -> np.ndarray:
+        return await self.run_model("_preprocess", X)
+
+    async def predict_proba_processed(self, X_processed: np.ndarray) -> np.ndarray:
+        return await self.run_model("_predict_proba_processed", X_processed)
+
+    async def predict_risk_score(self, X: pd.DataFrame) -> np.ndarray:
+        return await self.run_model("predict_risk_score", X)
+
+    async def predict_with_explanation(self, X: pd.DataFrame) -> List[Dict[str, Any]]:
+        return await self.run_model("predict_with_explanation", X)
+
+    async def prepare_features(
+        self,
+        blood_data: Optional[pd.DataFrame] = None,
+        smartwatch_data: Optional[pd.DataFrame] = None,
+        patient_info: Optional[Dict[str, Any]] = None,
+    ) -> pd.DataFrame:
+        return await self.run_preprocessor(
+            "prepare_features",
+            blood_data=blood_data,
+            smartwatch_data=smartwatch_data,
+            patient_info=patient_info,
+        )
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get pool utilisation metrics."""
+        finished = max(self._completed + self._failed, 1)
+        return {
+            "running": self.is_running,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self._in_flight,
+            "waiting_for_slot": self._waiting,
+            "completed": self._completed,
+            "failed": self._failed,
+            "mean_call_latency_ms": 1000.0 * self._total_latency / finished,
+        }
@@ -0,0 +1,354 @@
+"""
+Flattened Tree-Ensemble Inference Engine
+========================================
+
+Compiles fitted RandomForest, ExtraTrees, GradientBoosting and DecisionTree
+classifiers into contiguous node arrays (feature, threshold, children,
+leaf values) and evaluates every tree of every compiled member for a whole
+batch with a few NumPy operations per tree level, instead of sklearn's
+per-estimator Python dispatch.
+
+Results reproduce sklearn bit for bit: inputs are cast to float32 and
+compared against float64 thresholds exactly as sklearn's trees do, leaf
+values are normalised with the same operations, and tree outputs are
+summed in estimator order (sklearn's sequential ``n_jobs=1`` order).
+"""
+
+from __future__ import annotations
+
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from sklearn.ensemble import (
+    ExtraTreesClassifier,
+    GradientBoostingClassifier,
+    RandomForestClassifier,
+    StackingClassifier,
+)
+from sklearn.tree import DecisionTreeClassifier
+
+from ai_models.training.orchestrator import stacking_internals_supported
+
+logger = logging.getLogger(__name__)
+
+FOREST_TYPES = (RandomForestClassifier, ExtraTreesClassifier)
+TREE_TYPES = (DecisionTreeClassifier,)
+BOOSTING_TYPES = (GradientBoostingClassifier,)
+
+# sklearn marks leaves with this child index
+_TREE_LEAF = -1
+
+# Row x tree cells evaluated per pass. Large batches are split into row
+# chunks so the traversal and leaf-value temporaries stay bounded.
+CHUNK_CELLS = 1 << 16
+
+
+def is_compilable(estimator: Any) -> bool:
+    """Whether an estimator can be evaluated by the tree engine."""
+    if not isinstance(estimator, FOREST_TYPES + TREE_TYPES + BOOSTING_TYPES):
+        return False
+    if getattr(estimator, "n_outputs_", 1) != 1:
+        return False
+    if isinstance(estimator, BOOSTING_TYPES):
+        return estimator.init_ == "zero" or hasattr(estimator.init_, "predict_proba")
+    return True
+
+
+class _CompiledMember:
+    """Output post-processing for one compiled estimator."""
+
+    def __init__(self, kind: str, tree_start: int, tree_stop: int,
+                 node_offset: int, leaf_values: np.ndarray, **params):
+        self.kind = kind
+        self.tree_start = tree_start
+        self.tree_stop = tree_stop
+        self.node_offset = node_offset
+        self.leaf_values = leaf_values
+        self.params = params
+
+
+class TreeEngine:
+    """
+    Vectorized evaluator for one or more compiled tree-based classifiers.
+
+    All trees of all members share one set of node arrays, so a batch is
+    routed through every tree with a single loop over tree depth. Batches
+    larger than ``chunk_size`` rows are evaluated chunk by chunk.
+    """
+
+    def __init__(self, estimators: Sequence[Any], chunk_size: Optional[int] = None):
+        self.n_features_in_: Optional[int] = None
+        self.members: List[_CompiledMember] = []
+
+        features, thresholds, lefts, rights = [], [], [], []
+        roots: List[int] = []
+        n_nodes = 0
+        max_depth = 0
+
+        for estimator in estimators:
+            if not is_compilable(estimator):
+                raise TypeError(f"Cannot compile {type(estimator).__name__}")
+            n_features = estimator.n_features_in_
+            if self.n_features_in_ is None:
+                self.n_features_in_ = n_features
+            elif n_features != self.n_features_in_:
+                raise ValueError("Compiled estimators must share the same feature space")
+
+            trees = self._trees_of(estimator)
+            member_offset = n_nodes
+            tree_start = len(roots)
+            for tree in trees:
+                left = tree.children_left.astype(np.intp)
+                right = tree.children_right.astype(np.intp)
+                node_ids = np.arange(tree.node_count, dtype=np.intp) + n_nodes
+                leaf = left == _TREE_LEAF
+                # Leaves point at themselves so extra traversal steps are no-ops
+                left = np.where(leaf, node_ids, left + n_nodes)
+                right = np.where(leaf, node_ids, right + n_nodes)
+
+                features.append(np.where(leaf, 0, tree.feature).astype(np.intp))
+                thresholds.append(tree.threshold.astype(np.float64))
+                lefts.append(left)
+                rights.append(right)
+                roots.append(n_nodes)
+                n_nodes += tree.node_count
+                max_depth = max(max_depth, tree.max_depth)
+
+            self.members.append(
+                self._compile_member(estimator, trees, tree_start, len(roots), member_offset)
+            )
+
+        self.feature = np.concatenate(features)
+        self.threshold = np.concatenate(thresholds)
+        self.children_left = np.concatenate(lefts)
+        self.children_right = np.concatenate(rights)
+        self.roots = np.asarray(roots, dtype=np.intp)
+
+        # Traversal works on "slots": node n owns slots 2n (its right child)
+        # and 2n + 1 (its left child), so one comparison picks the next slot
+        # with a single add and gather.
+        self._slot_feature = np.repeat(self.feature, 2)
+        self._slot_threshold = np.repeat(self.threshold, 2)
+        self._slot_next = np.column_stack([2 * self.children_right, 2 * self.children_left]).ravel()
+        self.max_depth = max_depth
+        self.n_nodes = n_nodes
+        self.chunk_size = chunk_size or max(1, CHUNK_CELLS // max(len(roots), 1))
+
+    # ------------------------------------------------------------------
+    # Compilation
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _trees_of(estimator: Any) -> List[Any]:
+        if isinstance(estimator, FOREST_TYPES):
+            return [tree.tree_ for tree in estimator.estimators_]
+        if isinstance(estimator, BOOSTING_TYPES):
+            # Stage-major, one regression tree per class within a stage
+            return [tree.tree_ for tree in estimator.estimators_.ravel()]
+        return [estimator.tree_]
+
+    @staticmethod
+    def _normalized_leaf_proba(tree: Any, n_classes: int) -> np.ndarray:
+        """Per-node class probabilities, normalised the way sklearn's trees do."""
+        proba = np.array(tree.value[:, 0, :n_classes], dtype=np.float64)
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        proba /= normalizer
+        return proba
+
+    def _compile_member(self, estimator, trees, tree_start, tree_stop, node_offset) -> _CompiledMember:
+        if isinstance(estimator, BOOSTING_TYPES):
+            n_stages, n_trees_per_stage = estimator.estimators_.shape
+            leaf_values = np.concatenate([
+                estimator.learning_rate * tree.value[:, 0, 0] for tree in trees
+            ])
+            if estimator.init_ == "zero":
+                init_raw = np.zeros(n_trees_per_stage, dtype=np.float64)
+            else:
+                # The default init estimator predicts class priors, independent of X
+                probe = np.zeros((1, estimator.n_features_in_), dtype=np.float32)
+                init_raw = np.asarray(estimator._raw_predict_init(probe)[0], dtype=np.float64)
+            return _CompiledMember(
+                "boosting", tree_start, tree_stop, node_offset, leaf_values,
+                n_stages=n_stages, n_trees_per_stage=n_trees_per_stage,
+                init_raw=init_raw, loss=estimator._loss,
+            )
+
+        n_classes = int(estimator.n_classes_)
+        leaf_values = np.concatenate([self._normalized_leaf_proba(tree, n_classes) for tree in trees])
+        kind = "forest" if isinstance(estimator, FOREST_TYPES) else "tree"
+        return _CompiledMember(kind, tree_start, tree_stop, node_offset, leaf_values, n_classes=n_classes)
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+
+    def _validate(self, X: np.ndarray) -> np.ndarray:
+        # sklearn trees evaluate float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"X has shape {X.shape}, expected (n_samples, {self.n_features_in_})"
+            )
+        return X
+
+    def _chunks(self, X: np.ndarray) -> List[np.ndarray]:
+        return [X[start:start + self.chunk_size] for start in range(0, len(X), self.chunk_size)]
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node index (in the flattened arrays) for every sample and tree."""
+        X = self._validate(X)
+        if len(X) <= self.chunk_size:
+            return self._apply(X)
+        return np.concatenate([self._apply(chunk) for chunk in self._chunks(X)])
+
+    def _apply(self, X: np.ndarray) -> np.ndarray:
+        n_samples, n_features = X.shape
+        X_flat = X.ravel()
+
+        slots = np.broadcast_to(2 * self.roots, (n_samples, len(self.roots)))
+        if n_samples > 1:
+            row_offsets = (np.arange(n_samples, dtype=np.intp) * n_features)[:, np.newaxis]
+        for _ in range(self.max_depth):
+            columns = self._slot_feature[slots]
+            if n_samples > 1:
+                columns += row_offsets
+            # x <= threshold goes left; NaN compares False and goes right, as in sklearn
+            go_left = X_flat[columns] <= self._slot_threshold[slots]
+            slots = self._slot_next[slots + go_left]
+        return slots >> 1
+
+    def predict_proba(self, X: np.ndarray) -> List[np.ndarray]:
+        """Class probabilities of every compiled member, in compile order."""
+        X = self._validate(X)
+        if len(X) <= self.chunk_size:
+            return self._predict_chunk(X)
+        chunks = [self._predict_chunk(chunk) for chunk in self._chunks(X)]
+        return [np.concatenate(parts) for parts in zip(*chunks)]
+
+    def _predict_chunk(self, X: np.ndarray) -> List[np.ndarray]:
+        leaves = self._apply(X)
+        return [self._member_proba(member, leaves) for member in self.members]
+
+    @staticmethod
+    def _sequential_sum(values: np.ndarray) -> np.ndarray:
+        """Sum over axis 1 strictly left to right (cumsum is never pairwise)."""
+        # Copy out the last column so the full cumsum buffer can be freed
+        return np.cumsum(values, axis=1)[:, -1].copy()
+
+    def _member_proba(self, member: _CompiledMember, leaves: np.ndarray) -> np.ndarray:
+        member_leaves = leaves[:, member.tree_start:member.tree_stop] - member.node_offset
+        values = member.leaf_values[member_leaves]
+
+        if member.kind == "tree":
+            return values[:, 0, :]
+
+        if member.kind == "forest":
+            # sklearn sums the trees in order, then divides by their number
+            proba = self._sequential_sum(values)
+            proba /= member.tree_stop - member.tree_start
+            return proba
+
+        n_stages = member.params["n_stages"]
+        n_trees_per_stage = member.params["n_trees_per_stage"]
+        values = values.reshape(len(values), n_stages, n_trees_per_stage)
+        init = np.broadcast_to(member.params["init_raw"], (len(values), 1, n_trees_per_stage))
+        raw = self._sequential_sum(np.concatenate([init, values], axis=1))
+        if n_trees_per_stage == 1:
+            raw = raw.ravel()
+        return _raw_to_proba(member.params["loss"], raw)
+
+
+def _raw_to_proba(loss: Any, raw: np.ndarray) -> np.ndarray:
+    """Convert gradient boosting raw scores with the estimator's own loss."""
+    if hasattr(loss, "_raw_prediction_to_proba"):  # scikit-learn < 1.4
+        return loss._raw_prediction_to_proba(raw)
+    return loss.predict_proba(raw)
+
+
+class CompiledStackingClassifier:
+    """
+    StackingClassifier whose tree-based members run on a :class:`TreeEngine`.
+
+    Members the engine cannot compile (logistic regression, MLP, ...) are
+    still called through sklearn; the final estimator is sklearn's.
+    """
+
+    def __init__(self, stacking: StackingClassifier):
+        self.stacking = stacking
+        members = [
+            (i, est) for i, (est, method) in enumerate(zip(stacking.estimators_, stacking.stack_method_))
+            if est != "drop" and method == "predict_proba" and is_compilable(est)
+        ]
+        self.compiled_indices = [i for i, _ in members]
+        self.engine = TreeEngine([est for _, est in members]) if members else None
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        stacking = self.stacking
+        compiled = dict(zip(
+            self.compiled_indices,
+            self.engine.predict_proba(X) if self.engine is not None else [],
+        ))
+        predictions = [
+            compiled[i] if i in compiled else getattr(est, method)(X)
+            for i, (est, method) in enumerate(zip(stacking.estimators_, stacking.stack_method_))
+            if est != "drop"
+        ]
+        return stacking.final_estimator_.predict_proba(
+            stacking._concatenate_predictions(X, predictions)
+        )
+
+
+class CompiledClassifier:
+    """A single compiled tree-based classifier with a ``predict_proba`` API."""
+
+    def __init__(self, estimator: Any):
+        self.engine = TreeEngine([estimator])
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.engine.predict_proba(X)[0]
+
+
+def compile_estimator(estimator: Any):
+    """Compile a stacking ensemble or a tree-based classifier, or return None."""
+    if isinstance(estimator, StackingClassifier):
+        # The compiled predictor concatenates member outputs with sklearn internals
+        if not stacking_internals_supported():
+            return None
+        compiled = CompiledStackingClassifier(estimator)
+        return compiled if compiled.engine is not None else None
+    if is_compilable(estimator):
+        return CompiledClassifier(estimator)
+    return None
+
+
+@contextmanager
+def _sequential_sklearn(estimator: Any) -> Iterator[None]:
+    """Temporarily force n_jobs=1 so sklearn sums trees in a fixed order."""
+    targets = [estimator]
+    if isinstance(estimator, StackingClassifier):
+        targets.extend(est for est in estimator.estimators_ if est != "drop")
+    saved = []
+    for target in targets:
+        if hasattr(target, "n_jobs"):
+            saved.append((target, target.n_jobs))
+            target.n_jobs = 1
+    try:
+        yield
+    finally:
+        for target, n_jobs in saved:
+            target.n_jobs = n_jobs
+
+
+def verify_compiled(compiled: Any, estimator: Any, X: np.ndarray) -> Dict[str, Any]:
+    """Check compiled probabilities against sklearn bit for bit on a sample."""
+    with _sequential_sklearn(estimator):
+        expected = estimator.predict_proba(X)
+    actual = compiled.predict_proba(X)
+    return {
+        "n_samples": len(X),
+        "exact": bool(np.array_equal(actual, expected)),
+        "max_abs_diff": float(np.max(np.abs(actual - expected))) if len(X) else 0.0,
+    }
@@ -3,4 +3,6 @@ from ai_models.models.cancer_classifier import (
     CancerRiskClassifier,
     BinaryCancerDetector,
     MultiCancerClassifier,
+    IncrementalCancerClassifier,
 )
+from ai_models.models.registry import ModelRegistry
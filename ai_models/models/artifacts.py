@@ -0,0 +1,138 @@
+"""
+Memory-Mapped Model Artifacts
+=============================
+
+Artifact format that keeps a model's large NumPy arrays out of the pickle
+stream. The model is pickled with protocol 5 and every large contiguous
+array buffer is written, 64-byte aligned, into a sidecar ``.arrays`` file.
+Loading memory-maps that file read-only and hands the mapped buffers back
+to the unpickler, so arrays that are unpickled as plain ndarrays are views
+on the mapping instead of private copies, and worker processes loading
+the same artifact share their pages through the OS page cache.
+
+Layout::
+
+    model.pkl           # header pickle followed by the model pickle
+    model.pkl.arrays    # raw, aligned array buffers
+
+Not the whole model is shared. Objects that copy their state on
+unpickling end up private to each process: sklearn's ``Tree.__setstate__``
+copies its node and value arrays, so every worker still holds its own copy
+of each fitted tree (about 7 MB per process for the default 500-tree
+ensemble, growing with ``n_estimators`` and ``max_depth``). Only plain
+ndarray attributes stay shared: scalers, imputers, linear/MLP weights and
+the compiled inference arrays.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = "mmap-v1"
+ARRAYS_SUFFIX = ".arrays"
+BUFFER_ALIGNMENT = 64
+# Buffers smaller than this stay inside the pickle stream
+MIN_OUT_OF_BAND_BYTES = 4096
+
+
+def arrays_path(path: str) -> Path:
+    """Sidecar file holding the out-of-band array buffers of an artifact."""
+    return Path(str(path) + ARRAYS_SUFFIX)
+
+
+def save_artifact(obj: Any, path: str) -> Dict[str, Any]:
+    """
+    Save an object in the memory-mappable artifact format.
+
+    Returns a summary with the number and total size of the out-of-band
+    buffers.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    buffers: List[pickle.PickleBuffer] = []
+
+    def _buffer_callback(buffer: pickle.PickleBuffer) -> bool:
+        # Returning False moves the buffer out of band
+        if buffer.raw().nbytes < MIN_OUT_OF_BAND_BYTES:
+            return True
+        buffers.append(buffer)
+        return False
+
+    payload = pickle.dumps(obj, protocol=5, buffer_callback=_buffer_callback)
+
+    layout: List[Tuple[int, int]] = []
+    offset = 0
+    with open(arrays_path(path), "wb") as f:
+        for buffer in buffers:
+            raw = buffer.raw()
+            padding = -offset % BUFFER_ALIGNMENT
+            if padding:
+                f.write(b"\0" * padding)
+                offset += padding
+            f.write(raw)
+            layout.append((offset, raw.nbytes))
+            offset += raw.nbytes
+
+    header = {
+        "format": ARTIFACT_FORMAT,
+        "arrays_file": arrays_path(path).name,
+        "arrays_size_bytes": offset,
+        "buffers": layout,
+    }
+    with open(path, "wb") as f:
+        pickle.dump(header, f, protocol=5)
+        f.write(payload)
+
+    logger.info(
+        f"Saved memory-mapped artifact {path} "
+        f"({len(layout)} buffers, {offset / 1e6:.1f} MB mapped)"
+    )
+    return {"buffers": len(layout), "arrays_size_bytes": offset}
+
+
+def is_mmap_artifact(header: Any) -> bool:
+    return isinstance(header, dict) and header.get("format") == ARTIFACT_FORMAT
+
+
+def load_artifact(path: str) -> Any:
+    """
+    Load a model saved with :func:`save_artifact` or a plain pickle.
+
+    Array buffers of memory-mapped artifacts are mapped read-only, so the
+    resulting arrays must not be modified in place.
+    """
+    with open(path, "rb") as f:
+        header = pickle.load(f)
+        if not is_mmap_artifact(header):
+            # Plain pickle: the first object is the model itself
+            return header
+
+        sidecar = Path(path).parent / header["arrays_file"]
+        if header["arrays_size_bytes"] > 0:
+            mapped = np.memmap(sidecar, dtype=np.uint8, mode="r")
+            buffers = [mapped[offset:offset + nbytes] for offset, nbytes in header["buffers"]]
+        else:
+            buffers = []
+        return pickle.load(f, buffers=buffers)
+
+
+def artifact_files(path: str) -> List[Path]:
+    """All files belonging to an artifact (for checksums and copying)."""
+    files = [Path(path)]
+    sidecar = arrays_path(path)
+    if sidecar.exists():
+        files.append(sidecar)
+    return files
+
+
+def artifact_size_bytes(path: str) -> int:
+    return sum(os.path.getsize(p) for p in artifact_files(path))
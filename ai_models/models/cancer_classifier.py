@@ -9,10 +9,12 @@ lifestyle factors, and genetic information.
 
 from __future__ import annotations
 
+import copy
 import logging
 import os
 import json
 import pickle
+import time
 import warnings
 from datetime import datetime
 from pathlib import Path
@@ -20,7 +22,8 @@ from typing import Any, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
-from sklearn.base import BaseEstimator, ClassifierMixin
+import sklearn
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
 from sklearn.ensemble import (
     RandomForestClassifier,
     GradientBoostingClassifier,
@@ -50,6 +53,25 @@ from sklearn.pipeline import Pipeline
 from sklearn.impute import SimpleImputer
 from sklearn.feature_selection import SelectKBest, f_classif, mutual_info_classif
 
+from ai_models.data_preprocessing.preprocessor import (
+    BiomarkerFeatureEngine, BloodBiomarkerPreprocessor, FeaturePipeline,
+)
+
+from ai_models.inference.attribution import build_attribution_engine
+from ai_models.inference.cache import DEFAULT_MAX_ENTRIES, PredictionCache
+from ai_models.inference.tree_engine import compile_estimator, verify_compiled
+from ai_models.models.artifacts import save_artifact, load_artifact
+from ai_models.models.distillation import (
+    borderline_mask, fidelity_report, fit_soft_labels, make_student,
+)
+from ai_models.models.member_selection import (
+    SELECTION_METRICS, SubsetScorer, greedy_select, measure_row_latency,
+)
+from ai_models.training.orchestrator import (
+    TaskResult, TrainingOrchestrator, TrainingTask, assemble_stacking, out_of_fold_proba,
+    stacking_internals_supported,
+)
+
 warnings.filterwarnings("ignore")
 logger = logging.getLogger(__name__)
 
@@ -159,6 +181,29 @@ CANCER_TYPES = [
     "lymphoma", "brain", "other"
 ]
 
+# Labels meaning "no cancer"; the risk score is 1 - P(that class). Binary
+# models (BinaryCancerClassifier, incremental label="binary") use 0.
+NEGATIVE_CLASS_LABELS = ("no_cancer", "none")
+
+# Risk category thresholds (checked in order, first match wins)
+RISK_CATEGORY_THRESHOLDS = [
+    (0.8, "critical"),
+    (0.6, "very_high"),
+    (0.4, "high"),
+    (0.2, "moderate"),
+    (0.1, "low"),
+]
+DEFAULT_RISK_CATEGORY = "very_low"
+
+# Base models stacked by the ensemble: (stacking name, base model name)
+STACKING_MEMBERS = [
+    ("rf", "random_forest"),
+    ("gb", "gradient_boosting"),
+    ("et", "extra_trees"),
+    ("lr", "logistic_regression"),
+    ("mlp", "mlp"),
+]
+
 
 # ============================================================================
 # Cancer Risk Classifier
@@ -191,6 +236,13 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
         use_feature_selection: bool = True,
         top_k_features: int = 50,
         cv_folds: int = 5,
+        training_workers: int = 1,
+        model_time_budget: Optional[float] = None,
+        use_feature_pipeline: bool = True,
+        blood_imputation: str = "knn",
+        distill_student: Optional[str] = None,
+        student_target_agreement: float = 0.995,
+        serve_student: bool = True,
     ):
         self.n_estimators = n_estimators
         self.max_depth = max_depth
@@ -200,6 +252,13 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
         self.use_feature_selection = use_feature_selection
         self.top_k_features = top_k_features
         self.cv_folds = cv_folds
+        self.training_workers = training_workers
+        self.model_time_budget = model_time_budget
+        self.use_feature_pipeline = use_feature_pipeline
+        self.blood_imputation = blood_imputation
+        self.distill_student = distill_student
+        self.student_target_agreement = student_target_agreement
+        self.serve_student = serve_student
         
         # Models
         self.models = {}
@@ -208,10 +267,32 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
         self.imputer = SimpleImputer(strategy="median")
         self.feature_selector = None
         self.label_encoder = LabelEncoder()
+        # Raw inputs -> model layout (derived blood features, blood imputation/scaling)
+        self.feature_pipeline_ = None
+        
+        # Flattened tree-engine version of the serving model (see compile_inference)
+        self.compiled_model_ = None
+        self.compiled_verification_ = {}
+        
+        # Per-row feature attribution tables for the serving model (see build_attribution)
+        self.attribution_engine_ = None
+        
+        # Distilled student served in front of the ensemble (see distill)
+        self.student_ = None
+        self.compiled_student_ = None
+        self.student_report_ = {}
+        self.routing_stats_ = {"student_rows": 0, "teacher_rows": 0}
+        
+        # Measured latency and value of each member (see select_members)
+        self.latency_profile_ = {}
+        
+        # Per-row output memoization (see enable_prediction_cache)
+        self.prediction_cache_ = None
         
         # Feature importance
         self.feature_importances_ = None
         self.feature_names_ = None
+        self.model_feature_names_ = None
         self.selected_features_ = None
         
         # Training metrics
@@ -304,18 +385,14 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
         
         return models
     
-    def _create_ensemble(self) -> BaseEstimator:
-        """Create the ensemble model using stacking."""
+    def _create_ensemble(self, member_names: Optional[List[str]] = None) -> BaseEstimator:
+        """Create the ensemble model using stacking (STACKING_MEMBERS by default)."""
         base_models = self._create_base_models()
+        if member_names is None:
+            member_names = [name for _, name in STACKING_MEMBERS]
         
         # Level 1 estimators for stacking
-        estimators = [
-            ("rf", base_models["random_forest"]),
-            ("gb", base_models["gradient_boosting"]),
-            ("et", base_models["extra_trees"]),
-            ("lr", base_models["logistic_regression"]),
-            ("mlp", base_models["mlp"]),
-        ]
+        estimators = [(self._stacking_name(name), base_models[name]) for name in member_names]
         
         # Stacking with Logistic Regression as meta-learner
         stacking = StackingClassifier(
@@ -332,6 +409,11 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
         
         return stacking
     
+    @staticmethod
+    def _stacking_name(name: str) -> str:
+        """Estimator name of a base model inside the stacking ensemble."""
+        return dict((model_name, short_name) for short_name, model_name in STACKING_MEMBERS).get(name, name)
+    
     def fit(
         self,
         X: Union[pd.DataFrame, np.ndarray],
@@ -351,12 +433,26 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
         # Convert to numpy if needed
         if isinstance(X, pd.DataFrame):
             self.feature_names_ = list(X.columns)
-            X = X.values
         elif feature_names:
             self.feature_names_ = feature_names
         else:
             self.feature_names_ = [f"feature_{i}" for i in range(X.shape[1])]
         
+        # Fit the raw-input feature pipeline once; it is saved with the model
+        if self.use_feature_pipeline:
+            if not isinstance(X, pd.DataFrame):
+                X = pd.DataFrame(X, columns=self.feature_names_)
+            self.feature_pipeline_ = FeaturePipeline(
+                BloodBiomarkerPreprocessor(imputation=self.blood_imputation)
+            ).fit(X)
+            self.model_feature_names_ = list(self.feature_pipeline_.output_columns_)
+            X = self.feature_pipeline_.transform_array(X)
+        else:
+            self.feature_pipeline_ = None
+            self.model_feature_names_ = list(self.feature_names_)
+            if isinstance(X, pd.DataFrame):
+                X = X.values
+        
         if isinstance(y, pd.Series):
             y = y.values
         
@@ -382,12 +478,12 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
             # Track selected features
             mask = self.feature_selector.get_support()
             self.selected_features_ = [
-                f for f, m in zip(self.feature_names_, mask) if m
+                f for f, m in zip(self.model_feature_names_, mask) if m
             ]
             logger.info(f"Selected {len(self.selected_features_)} features")
         else:
             X_selected = X_scaled
-            self.selected_features_ = self.feature_names_
+            self.selected_features_ = self.model_feature_names_
         
         self.n_features_in_ = X_selected.shape[1]
         
@@ -399,49 +495,86 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
             random_state=self.random_state,
         )
         
-        # Train individual models
+        # Train individual models, the stacking folds and CV in one orchestrated run
         base_models = self._create_base_models()
+        stack_names = [name for _, name in STACKING_MEMBERS] if self.use_ensemble else []
+        # One set of shuffled folds over the training split feeds the stacking
+        # meta-learner and the CV scores. Unlike the earlier cross_val_score
+        # over all rows, the validation split is not part of CV.
+        folds = list(StratifiedKFold(
+            n_splits=self.cv_folds, shuffle=True, random_state=self.random_state
+        ).split(X_train, y_train))
+        orchestrator = TrainingOrchestrator(
+            n_workers=self.training_workers, time_budget=self.model_time_budget
+        )
         
-        logger.info("Training individual models...")
-        for name, model in base_models.items():
-            try:
-                model.fit(X_train, y_train)
-                
-                # Evaluate on validation set
-                y_pred = model.predict(X_val)
-                y_proba = None
-                if hasattr(model, "predict_proba"):
-                    y_proba = model.predict_proba(X_val)
-                
-                accuracy = accuracy_score(y_val, y_pred)
-                f1 = f1_score(y_val, y_pred, average="weighted")
-                
-                metrics = {
-                    "accuracy": float(accuracy),
-                    "f1_weighted": float(f1),
-                }
-                
-                if y_proba is not None and self.n_classes_ == 2:
-                    try:
-                        auc = roc_auc_score(y_val, y_proba[:, 1])
-                        metrics["auc_roc"] = float(auc)
-                    except Exception:
-                        pass
-                
-                self.training_metrics_[name] = metrics
-                self.models[name] = model
-                
-                logger.info(f"  {name}: accuracy={accuracy:.4f}, f1={f1:.4f}")
-                
-            except Exception as e:
-                logger.warning(f"  {name} failed: {e}")
+        tasks = [TrainingTask(name, model) for name, model in base_models.items()]
+        tasks += self._fold_tasks(base_models, stack_names, folds)
+        
+        logger.info(
+            f"Training {len(base_models)} models and {len(tasks) - len(base_models)} fold fits "
+            f"({orchestrator.n_workers} workers)..."
+        )
+        results = orchestrator.run(tasks, X_train, y_train, X_val)
+        fold_results = self._group_fold_results(results)
+        
+        for result in results:
+            if result.fold is not None:
+                continue
+            name = result.name
+            if not result.ok:
+                logger.warning(f"  {name} failed: {result.error}")
+                continue
+            
+            # Evaluate on validation set
+            y_pred = result.val_pred
+            y_proba = result.val_proba
+            
+            accuracy = accuracy_score(y_val, y_pred)
+            f1 = f1_score(y_val, y_pred, average="weighted")
+            
+            metrics = {
+                "accuracy": float(accuracy),
+                "f1_weighted": float(f1),
+                "fit_seconds": float(result.seconds),
+            }
+            
+            if y_proba is not None and self.n_classes_ == 2:
+                try:
+                    auc = roc_auc_score(y_val, y_proba[:, 1])
+                    metrics["auc_roc"] = float(auc)
+                except Exception:
+                    pass
+            
+            self.training_metrics_[name] = metrics
+            self.models[name] = result.model
+            
+            logger.info(f"  {name}: accuracy={accuracy:.4f}, f1={f1:.4f} ({result.seconds:.1f}s)")
         
-        # Train ensemble
+        # Assemble the ensemble from the full fits and out-of-fold predictions
+        oof_predictions = {}
         if self.use_ensemble:
             logger.info("Training ensemble model...")
+            members = [
+                name for name in stack_names
+                if name in self.models and len(fold_results.get(name, [])) == len(folds)
+            ]
+            for name in set(stack_names) - set(members):
+                logger.warning(f"  {name} excluded from ensemble (training failed)")
             try:
-                self.ensemble_model = self._create_ensemble()
-                self.ensemble_model.fit(X_train, y_train)
+                if not members:
+                    raise RuntimeError("no base model trained successfully")
+                oof_predictions = {
+                    short_name: out_of_fold_proba(fold_results[name], len(y_train))
+                    for short_name, name in STACKING_MEMBERS if name in members
+                }
+                self.ensemble_model = assemble_stacking(
+                    self._create_ensemble(members),
+                    {short_name: self.models[name] for short_name, name in STACKING_MEMBERS if name in members},
+                    oof_predictions,
+                    X_train,
+                    y_train,
+                )
                 
                 y_pred = self.ensemble_model.predict(X_val)
                 accuracy = accuracy_score(y_val, y_pred)
@@ -457,44 +590,117 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
                 logger.warning(f"  Ensemble failed: {e}")
                 self.ensemble_model = None
         
-        # Cross-validation
+        # Cross-validation, scored on the shared folds
         logger.info("Running cross-validation...")
         best_model_name = max(
             self.training_metrics_,
             key=lambda k: self.training_metrics_[k].get("f1_weighted", 0)
         )
-        if best_model_name == "ensemble" and self.ensemble_model:
-            cv_model = self.ensemble_model
-        else:
-            cv_model = self.models.get(best_model_name)
-        
-        if cv_model:
-            try:
-                cv = StratifiedKFold(n_splits=self.cv_folds, shuffle=True, random_state=self.random_state)
-                cv_scores = cross_val_score(cv_model, X_selected, y_encoded, cv=cv, scoring="f1_weighted")
-                self.cv_scores_ = {
-                    "mean": float(np.mean(cv_scores)),
-                    "std": float(np.std(cv_scores)),
-                    "scores": [float(s) for s in cv_scores],
-                }
-                logger.info(f"  CV F1: {self.cv_scores_['mean']:.4f} ± {self.cv_scores_['std']:.4f}")
-            except Exception as e:
-                logger.warning(f"  CV failed: {e}")
+        try:
+            if best_model_name == "ensemble" and self.ensemble_model:
+                cv_scores = self._ensemble_cv_scores(oof_predictions, y_train, folds)
+            else:
+                if best_model_name not in fold_results:
+                    extra = orchestrator.run(
+                        self._fold_tasks(base_models, [best_model_name], folds), X_train, y_train
+                    )
+                    fold_results.update(self._group_fold_results(extra))
+                best_folds = fold_results.get(best_model_name, [])
+                if len(best_folds) != len(folds):
+                    raise RuntimeError(f"fold fits of {best_model_name} failed")
+                cv_scores = [
+                    f1_score(y_train[r.test_index], r.fold_pred, average="weighted")
+                    for r in best_folds
+                ]
+            self.cv_scores_ = {
+                "model": best_model_name,
+                # The ensemble's CV refits only the meta-learner; members keep their fold fits
+                "scope": "meta_learner" if best_model_name == "ensemble" else "model",
+                "mean": float(np.mean(cv_scores)),
+                "std": float(np.std(cv_scores)),
+                "scores": [float(s) for s in cv_scores],
+            }
+            logger.info(f"  CV F1: {self.cv_scores_['mean']:.4f} ± {self.cv_scores_['std']:.4f}")
+        except Exception as e:
+            logger.warning(f"  CV failed: {e}")
         
         # Compute feature importance
         self._compute_feature_importances()
         
+        self.compile_inference(X_val)
+        self.build_attribution()
+        
+        if self.distill_student:
+            try:
+                self._distill_processed(X_train, X_val, y_val, self.distill_student)
+            except Exception as e:
+                logger.warning(f"  Distillation failed: {e}")
+        
         self.is_fitted_ = True
         self.training_date_ = datetime.utcnow().isoformat()
         
         logger.info("Model training completed!")
         return self
     
+    @staticmethod
+    def _fold_tasks(
+        base_models: Dict[str, BaseEstimator],
+        names: List[str],
+        folds: List[Tuple[np.ndarray, np.ndarray]],
+    ) -> List[TrainingTask]:
+        """One training task per (model, fold)."""
+        return [
+            TrainingTask(name, base_models[name], fold=i, train_index=train_idx, test_index=test_idx)
+            for name in names if name in base_models
+            for i, (train_idx, test_idx) in enumerate(folds)
+        ]
+    
+    @staticmethod
+    def _group_fold_results(results: List[TaskResult]) -> Dict[str, List[TaskResult]]:
+        """Successful fold results per model; models with a failed fold are dropped."""
+        grouped: Dict[str, List[TaskResult]] = {}
+        failed = set()
+        for result in results:
+            if result.fold is None:
+                continue
+            if not result.ok:
+                failed.add(result.name)
+                continue
+            grouped.setdefault(result.name, []).append(result)
+        return {name: group for name, group in grouped.items() if name not in failed}
+    
+    def _ensemble_cv_scores(
+        self,
+        oof_predictions: Dict[str, np.ndarray],
+        y: np.ndarray,
+        folds: List[Tuple[np.ndarray, np.ndarray]],
+    ) -> List[float]:
+        """
+        Cross-validate the stacked model on the shared folds.
+        
+        The meta-learner is refit per fold on the out-of-fold base-model
+        predictions, so no base model is trained again. The scores therefore
+        measure the meta-learner only, not a refit of the whole ensemble.
+        """
+        if not stacking_internals_supported():
+            raise RuntimeError(f"ensemble CV is not supported on scikit-learn {sklearn.__version__}")
+        X_meta = self.ensemble_model._concatenate_predictions(
+            None, [oof_predictions[short_name] for short_name in self.ensemble_model.named_estimators_]
+        )
+        scores = []
+        for train_idx, test_idx in folds:
+            meta = clone(self.ensemble_model.final_estimator).fit(X_meta[train_idx], y[train_idx])
+            scores.append(f1_score(y[test_idx], meta.predict(X_meta[test_idx]), average="weighted"))
+        return scores
+    
     def predict(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
         """Predict cancer risk class."""
         self._check_is_fitted()
         X_processed = self._preprocess(X)
         
+        if self._serving_student():
+            return self._labels_from_proba(self._predict_proba_processed(X_processed))
+        
         if self.ensemble_model:
             return self.label_encoder.inverse_transform(
                 self.ensemble_model.predict(X_processed)
@@ -510,6 +716,46 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
         """Predict cancer risk probabilities."""
         self._check_is_fitted()
         X_processed = self._preprocess(X)
+        cache = getattr(self, "prediction_cache_", None)
+        if cache is None or not len(X_processed):
+            return self._predict_proba_processed(X_processed)
+        return np.vstack(cache.get_or_compute(
+            X_processed, lambda rows: self._predict_proba_processed(X_processed[rows])
+        ))
+    
+    def _predict_proba_processed(self, X_processed: np.ndarray) -> np.ndarray:
+        """
+        Predict probabilities for an already preprocessed feature matrix.
+        
+        With a distilled student, rows are scored by the student and only
+        those whose risk score lies within the fallback margin of a risk
+        category threshold are re-scored by the full ensemble.
+        """
+        if not self._serving_student():
+            return self._teacher_proba(X_processed)
+        
+        student = self.compiled_student_ if self.compiled_student_ is not None else self.student_
+        proba = student.predict_proba(X_processed)
+        borderline = borderline_mask(
+            self.risk_scores_from_proba(proba),
+            [threshold for threshold, _ in RISK_CATEGORY_THRESHOLDS],
+            self.student_report_.get("fallback_margin", 0.0),
+        )
+        n_borderline = int(borderline.sum())
+        if n_borderline:
+            proba[borderline] = self._teacher_proba(X_processed[borderline])
+        self.routing_stats_["student_rows"] += len(proba) - n_borderline
+        self.routing_stats_["teacher_rows"] += n_borderline
+        return proba
+    
+    def _serving_student(self) -> bool:
+        return getattr(self, "student_", None) is not None and getattr(self, "serve_student", True)
+    
+    def _teacher_proba(self, X_processed: np.ndarray) -> np.ndarray:
+        """Probabilities of the full serving model (compiled ensemble or best model)."""
+        compiled = getattr(self, "compiled_model_", None)
+        if compiled is not None:
+            return compiled.predict_proba(X_processed)
         
         if self.ensemble_model and hasattr(self.ensemble_model, "predict_proba"):
             return self.ensemble_model.predict_proba(X_processed)
@@ -520,90 +766,167 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
         
         # Fallback: one-hot encode predictions
         predictions = best_model.predict(X_processed)
-        n_samples = len(predictions)
-        proba = np.zeros((n_samples, self.n_classes_))
-        for i, pred in enumerate(predictions):
-            proba[i, pred] = 1.0
+        proba = np.zeros((len(predictions), self.n_classes_))
+        proba[np.arange(len(predictions)), predictions] = 1.0
         return proba
     
     def predict_risk_score(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
         """
         Predict overall cancer risk score (0-1).
-        Returns the maximum probability across all cancer classes.
+        Returns 1 - P(no cancer), or the maximum class probability when the
+        model has no "no cancer" class (see NEGATIVE_CLASS_LABELS).
         """
-        proba = self.predict_proba(X)
-        
-        # Risk score = 1 - P(no_cancer) or max(P(cancer types))
-        if "no_cancer" in list(self.classes_):
-            no_cancer_idx = list(self.classes_).index("no_cancer")
-            risk_scores = 1 - proba[:, no_cancer_idx]
+        return self.risk_scores_from_proba(self.predict_proba(X))
+    
+    def _negative_class_index(self) -> Optional[int]:
+        """Column of the "no cancer" class, if the model has one."""
+        classes = [c.item() if isinstance(c, np.generic) else c for c in self.classes_]
+        for label in NEGATIVE_CLASS_LABELS:
+            if label in classes:
+                return classes.index(label)
+        if len(classes) == 2 and 0 in classes:
+            return classes.index(0)
+        return None
+    
+    def risk_scores_from_proba(self, proba: np.ndarray) -> np.ndarray:
+        """Derive risk scores from a probability matrix."""
+        # Risk score = 1 - P(no cancer), or max(P(cancer types)) without such a class
+        negative_idx = self._negative_class_index()
+        if negative_idx is not None:
+            risk_scores = 1 - proba[:, negative_idx]
         else:
             risk_scores = np.max(proba, axis=1)
         
         return risk_scores
     
+    def _labels_from_proba(self, proba: np.ndarray) -> np.ndarray:
+        """Map the arg-max column of a probability matrix back to class labels."""
+        estimator = self.ensemble_model or self._get_best_model()
+        columns = getattr(estimator, "classes_", None)
+        if columns is None or len(columns) != proba.shape[1]:
+            columns = np.arange(proba.shape[1])
+        return self.label_encoder.inverse_transform(
+            np.asarray(columns)[np.argmax(proba, axis=1)]
+        )
+    
+    @staticmethod
+    def _risk_categories(risk_scores: np.ndarray) -> np.ndarray:
+        """Bucket risk scores into risk categories."""
+        risk_scores = np.asarray(risk_scores)
+        return np.select(
+            [risk_scores >= threshold for threshold, _ in RISK_CATEGORY_THRESHOLDS],
+            [category for _, category in RISK_CATEGORY_THRESHOLDS],
+            default=DEFAULT_RISK_CATEGORY,
+        )
+    
     def predict_with_explanation(
         self, X: Union[pd.DataFrame, np.ndarray]
     ) -> List[Dict[str, Any]]:
         """
         Predict with detailed risk explanation.
         
+        Preprocessing and ensemble inference run once for the whole batch;
+        class, probabilities, risk score and category are all derived from
+        that single probability matrix. Top features are the row's largest
+        contributions to its risk score (``risk_score = baseline_risk_score +
+        sum of contributions``) when the serving model has an attribution
+        engine, and the global feature importances otherwise. Explanations
+        always come from the full ensemble, never the distilled student.
+        
+        Explanations are cached by preprocessed row, which different raw
+        inputs can share, so each feature's raw ``value`` is always taken
+        from ``X`` itself.
+        
         Returns risk scores, predictions, feature contributions, and recommendations.
         """
         self._check_is_fitted()
         X_processed = self._preprocess(X)
+        cache = getattr(self, "prediction_cache_", None)
+        if cache is None or not len(X_processed):
+            results = self._explain_processed(X_processed)
+        else:
+            results = [
+                copy.deepcopy(result)
+                for result in cache.get_or_compute(
+                    X_processed, lambda rows: self._explain_processed(X_processed[rows]),
+                    namespace="explanation",
+                )
+            ]
+        self._attach_raw_values(X, results)
+        return results
+    
+    def _attach_raw_values(self, X: Union[pd.DataFrame, np.ndarray], results: List[Dict[str, Any]]) -> None:
+        """Fill each top feature's ``value`` with the row's raw input."""
+        raw_columns: Dict[str, Optional[List[Any]]] = {}
+        for i, result in enumerate(results):
+            for feature in result["top_contributing_features"]:
+                fname = feature["feature"]
+                if fname not in raw_columns:
+                    raw_columns[fname] = self._raw_feature_column(X, fname)
+                values = raw_columns[fname]
+                feature["value"] = values[i] if values is not None else None
+    
+    def _explain_processed(self, X_processed: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        predict_with_explanation for rows already preprocessed into
+        ``X_processed``; raw feature values are left to _attach_raw_values.
+        """
+        probabilities = self._teacher_proba(X_processed)
+        predictions = self._labels_from_proba(probabilities)
+        risk_scores = self.risk_scores_from_proba(probabilities)
+        risk_categories = self._risk_categories(risk_scores)
+        confidences = np.max(probabilities, axis=1)
         
-        predictions = self.predict(X)
-        probabilities = self.predict_proba(X)
-        risk_scores = self.predict_risk_score(X)
+        # Per-row contributions to the risk score when the serving model can
+        # be explained, otherwise the global importances for every row
+        attribution = self._risk_contributions(X_processed, probabilities)
+        n_selected = len(self.selected_features_ or [])
+        if attribution is not None:
+            contributions, baselines = attribution
+            top_idx = np.argsort(-np.abs(contributions), axis=1)[:, :10]
+        else:
+            contributions = baselines = None
+            global_idx = []
+            if self.feature_importances_ is not None:
+                global_idx = [
+                    idx for idx in np.argsort(self.feature_importances_)[::-1][:10]
+                    if idx < n_selected
+                ]
+            top_idx = np.tile(np.asarray(global_idx, dtype=np.intp), (len(probabilities), 1))
+        
+        class_names = [str(cls) for cls in self.classes_]
+        probability_rows = probabilities.tolist()
+        risk_score_list = risk_scores.tolist()
+        recommendations_cache: Dict[Tuple[str, Tuple[str, ...]], List[str]] = {}
         
         results = []
-        for i in range(len(predictions)):
-            # Get class probabilities
-            class_probs = {}
-            for j, cls in enumerate(self.classes_):
-                class_probs[str(cls)] = float(probabilities[i, j])
-            
-            # Get risk category
-            risk_score = float(risk_scores[i])
-            if risk_score >= 0.8:
-                risk_category = "critical"
-            elif risk_score >= 0.6:
-                risk_category = "very_high"
-            elif risk_score >= 0.4:
-                risk_category = "high"
-            elif risk_score >= 0.2:
-                risk_category = "moderate"
-            elif risk_score >= 0.1:
-                risk_category = "low"
-            else:
-                risk_category = "very_low"
-            
-            # Get top contributing features
-            if isinstance(X, pd.DataFrame):
-                feature_values = X.iloc[i].to_dict()
-            else:
-                feature_values = {
-                    f: float(X[i, j]) if j < X.shape[1] else 0
-                    for j, f in enumerate(self.selected_features_ or [])
-                }
+        for i in range(len(probability_rows)):
+            class_probs = dict(zip(class_names, probability_rows[i]))
+            risk_score = float(risk_score_list[i])
+            risk_category = str(risk_categories[i])
             
             top_features = []
-            if self.feature_importances_ is not None:
-                sorted_idx = np.argsort(self.feature_importances_)[::-1]
-                for idx in sorted_idx[:10]:
-                    if idx < len(self.selected_features_ or []):
-                        fname = self.selected_features_[idx]
-                        top_features.append({
-                            "feature": fname,
-                            "importance": float(self.feature_importances_[idx]),
-                            "value": feature_values.get(fname, None),
-                        })
+            for idx in top_idx[i]:
+                fname = self.selected_features_[idx]
+                if contributions is not None:
+                    contribution = float(contributions[i, idx])
+                    importance = abs(contribution)
+                else:
+                    contribution = None
+                    importance = float(self.feature_importances_[idx])
+                top_features.append({
+                    "feature": fname,
+                    "importance": importance,
+                    "contribution": contribution,
+                    "value": None,
+                })
             
-            # Generate recommendations
-            recommendations = self._generate_recommendations(
-                risk_score, risk_category, class_probs, top_features
-            )
+            # Recommendations only depend on the category and the top features
+            key = (risk_category, tuple(feat["feature"] for feat in top_features[:5]))
+            if key not in recommendations_cache:
+                recommendations_cache[key] = self._generate_recommendations(
+                    risk_score, risk_category, class_probs, top_features
+                )
             
             result = {
                 "prediction": str(predictions[i]),
@@ -611,17 +934,38 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
                 "risk_category": risk_category,
                 "class_probabilities": class_probs,
                 "top_contributing_features": top_features,
-                "recommendations": recommendations,
-                "model_confidence": float(np.max(probabilities[i])),
+                "recommendations": list(recommendations_cache[key]),
+                "model_confidence": float(confidences[i]),
                 "model_version": self.version_,
             }
+            if baselines is not None:
+                result["baseline_risk_score"] = float(baselines[i])
             results.append(result)
         
         return results
     
+    def _raw_feature_column(
+        self, X: Union[pd.DataFrame, np.ndarray], feature_name: str
+    ) -> Optional[List[Any]]:
+        """Get the raw (unprocessed) values of one feature for every row."""
+        if isinstance(X, pd.DataFrame):
+            if feature_name not in X.columns:
+                return None
+            return X[feature_name].tolist()
+        
+        if feature_name not in (self.feature_names_ or []):
+            return None
+        j = self.feature_names_.index(feature_name)
+        if j >= X.shape[1]:
+            return None
+        return np.asarray(X[:, j], dtype=float).tolist()
+    
     def _preprocess(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
         """Preprocess features."""
-        if isinstance(X, pd.DataFrame):
+        pipeline = getattr(self, "feature_pipeline_", None)
+        if pipeline is not None:
+            X = pipeline.transform_array(X)
+        elif isinstance(X, pd.DataFrame):
             X = X.values
         
         X_imputed = self.imputer.transform(X)
@@ -634,15 +978,390 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
         
         return X_selected
     
+    def compile_inference(self, X_check: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """
+        Compile the serving model's tree members into the flattened tree engine.
+        
+        Args:
+            X_check: Preprocessed rows used to check that the compiled model
+                reproduces sklearn's probabilities bit for bit. The compiled
+                model is only used when the check passes.
+        """
+        self.compiled_model_ = None
+        self.compiled_verification_ = {}
+        
+        if self.ensemble_model is not None and hasattr(self.ensemble_model, "predict_proba"):
+            target = self.ensemble_model
+        elif self.models:
+            target = self._get_best_model()
+        else:
+            return self.compiled_verification_
+        
+        try:
+            compiled = compile_estimator(target)
+        except Exception as e:
+            logger.warning(f"Tree engine compilation failed: {e}")
+            return self.compiled_verification_
+        if compiled is None:
+            return self.compiled_verification_
+        
+        if X_check is not None and len(X_check):
+            self.compiled_verification_ = verify_compiled(compiled, target, X_check)
+            if not self.compiled_verification_["exact"]:
+                logger.warning(
+                    f"Compiled model differs from sklearn "
+                    f"(max abs diff {self.compiled_verification_['max_abs_diff']:.3e}), not using it"
+                )
+                return self.compiled_verification_
+        
+        self.compiled_model_ = compiled
+        logger.info("Compiled tree members for vectorized inference")
+        return self.compiled_verification_
+    
+    def build_attribution(self) -> bool:
+        """
+        Compile per-row feature attribution for the serving model.
+        
+        The attribution tables are saved with the model, so every loaded
+        version explains predictions without further preparation. Returns
+        whether the serving model (or some of its stacking members) can be
+        explained.
+        """
+        self.attribution_engine_ = None
+        if self.ensemble_model is not None and hasattr(self.ensemble_model, "predict_proba"):
+            target = self.ensemble_model
+        elif self.models:
+            target = self._get_best_model()
+        else:
+            return False
+        
+        try:
+            self.attribution_engine_ = build_attribution_engine(target)
+        except Exception as e:
+            logger.warning(f"Attribution engine build failed: {e}")
+        return self.attribution_engine_ is not None
+    
+    def _get_attribution_engine(self):
+        if "attribution_engine_" not in self.__dict__ and self.is_fitted_:
+            # Models saved before per-row attribution existed
+            self.build_attribution()
+        return self.attribution_engine_
+    
+    def _risk_contributions(
+        self, X_processed: np.ndarray, probabilities: np.ndarray
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Per-feature contributions to each row's risk score, and the baselines."""
+        engine = self._get_attribution_engine()
+        if engine is None:
+            return None
+        try:
+            values, base = engine.explain(X_processed)
+        except Exception as e:
+            logger.warning(f"Feature attribution failed: {e}")
+            return None
+        
+        negative_idx = self._negative_class_index()
+        if negative_idx is not None:
+            return -values[:, :, negative_idx], 1 - base[:, negative_idx]
+        # Risk is the top class probability, so explain that class per row
+        rows = np.arange(len(probabilities))
+        top = np.argmax(probabilities, axis=1)
+        return values[rows, :, top], base[rows, top]
+    
+    def explain(self, X: Union[pd.DataFrame, np.ndarray]) -> pd.DataFrame:
+        """
+        Per-row contributions of the model features to the risk score.
+        
+        Columns are ``selected_features_`` plus ``baseline``; each row sums
+        to its risk score.
+        """
+        self._check_is_fitted()
+        X_processed = self._preprocess(X)
+        attribution = self._risk_contributions(
+            X_processed, self._teacher_proba(X_processed)
+        )
+        if attribution is None:
+            raise RuntimeError("The serving model does not support per-row attribution")
+        contributions, baselines = attribution
+        frame = pd.DataFrame(contributions, columns=self.selected_features_)
+        frame["baseline"] = baselines
+        return frame
+    
+    def distill(
+        self,
+        X: Union[pd.DataFrame, np.ndarray],
+        y: Optional[Union[pd.Series, np.ndarray]] = None,
+        student: str = "logistic",
+        validation_fraction: float = 0.2,
+    ) -> Dict[str, Any]:
+        """
+        Distill the serving model into a compact student and serve it.
+        
+        The student is fitted to the ensemble's probabilities on part of
+        ``X``; the rest measures its fidelity and sets the fallback margin
+        so that the risk categories served agree with the ensemble's on
+        ``student_target_agreement`` of the held-out rows.
+        Labels are optional and only add the accuracy gap to the report.
+        
+        Args:
+            X: Raw feature rows (no labels needed)
+            y: Optional true labels of ``X``
+            student: "logistic" or "boosting"
+            validation_fraction: Share of ``X`` held out for the fidelity report
+        
+        Returns:
+            The fidelity report (also kept as ``student_report_``)
+        """
+        self._check_is_fitted()
+        X_processed = self._preprocess(X)
+        y_encoded = None if y is None else self.label_encoder.transform(
+            np.asarray(y.values if isinstance(y, pd.Series) else y)
+        )
+        fit_idx, eval_idx = train_test_split(
+            np.arange(len(X_processed)),
+            test_size=validation_fraction,
+            random_state=self.random_state,
+        )
+        return self._distill_processed(
+            X_processed[fit_idx],
+            X_processed[eval_idx],
+            y_encoded[eval_idx] if y_encoded is not None else None,
+            student,
+        )
+    
+    def _distill_processed(
+        self,
+        X_fit: np.ndarray,
+        X_eval: np.ndarray,
+        y_eval: Optional[np.ndarray],
+        kind: str,
+    ) -> Dict[str, Any]:
+        """Fit a student on preprocessed rows and measure it against the teacher."""
+        self.student_ = None
+        self.compiled_student_ = None
+        self.student_report_ = {}
+        
+        logger.info(f"Distilling the serving model into a {kind} student...")
+        student = fit_soft_labels(
+            make_student(kind, self.random_state), X_fit, self._teacher_proba(X_fit)
+        )
+        compiled = None
+        try:
+            compiled = compile_estimator(student)
+            if compiled is not None and not verify_compiled(compiled, student, X_eval)["exact"]:
+                compiled = None
+        except Exception as e:
+            logger.warning(f"  Student compilation failed: {e}")
+            compiled = None
+        
+        started = time.perf_counter()
+        teacher_proba = self._teacher_proba(X_eval)
+        teacher_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        student_proba = (compiled if compiled is not None else student).predict_proba(X_eval)
+        student_seconds = time.perf_counter() - started
+        
+        report = fidelity_report(
+            teacher_proba,
+            student_proba,
+            self.risk_scores_from_proba,
+            self._risk_categories,
+            [threshold for threshold, _ in RISK_CATEGORY_THRESHOLDS],
+            self.student_target_agreement,
+            y_eval,
+        )
+        n_eval = max(len(X_eval), 1)
+        report.update({
+            "student": kind,
+            "n_fit": int(len(X_fit)),
+            "compiled": compiled is not None,
+            "teacher_ms_per_row": teacher_seconds * 1000 / n_eval,
+            "student_ms_per_row": student_seconds * 1000 / n_eval,
+        })
+        
+        self.student_ = student
+        self.compiled_student_ = compiled
+        self.student_report_ = report
+        self.routing_stats_ = {"student_rows": 0, "teacher_rows": 0}
+        logger.info(
+            f"  Student: mean risk gap={report['risk_gap_mean']:.4f}, "
+            f"category agreement={report['category_agreement']:.4f}, "
+            f"fallback margin={report['fallback_margin']:.4f} "
+            f"({report['fallback_rate']:.1%} of rows to the ensemble)"
+        )
+        return report
+    
+    def select_members(
+        self,
+        X: Union[pd.DataFrame, np.ndarray],
+        y: Union[pd.Series, np.ndarray],
+        latency_budget_ms: float,
+        metric: str = "f1_weighted",
+        min_gain: float = 1e-3,
+        latency_rows: int = 200,
+        drop_unselected: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Rebuild the ensemble from the members that fit a p99 latency budget.
+        
+        Every trained base model with ``predict_proba`` is a candidate. Each
+        one's single-row latency is measured in its serving form (compiled
+        when the tree engine supports it) and its value is the validation
+        score of the meta-learner stacked on it. Members are added greedily
+        (see ``greedy_select``); the chosen stack's meta-learner is fitted
+        on the members' predictions for ``X``, so ``X``/``y`` must be
+        labeled rows the base models were not trained on.
+        
+        The rebuilt ensemble's measured p99 must fit the budget as well;
+        otherwise the last member added is dropped again. The budget covers
+        ensemble scoring of preprocessed rows, not preprocessing.
+        
+        Args:
+            X: Held-out raw feature rows
+            y: Their labels (every class must occur)
+            latency_budget_ms: p99 per-row latency budget in milliseconds
+            metric: "f1_weighted" or "auc"
+            min_gain: Smallest score gain worth adding a member for
+            latency_rows: Rows timed per model
+            drop_unselected: Remove the pruned base models from ``models``
+        
+        Returns:
+            The latency profile (also kept as ``latency_profile_``)
+        """
+        self._check_is_fitted()
+        if metric not in SELECTION_METRICS:
+            raise ValueError(f"Unknown metric {metric!r}, expected one of {SELECTION_METRICS}")
+        X_processed = self._preprocess(X)
+        y_encoded = self.label_encoder.transform(
+            np.asarray(y.values if isinstance(y, pd.Series) else y)
+        )
+        if len(np.unique(y_encoded)) != self.n_classes_:
+            raise ValueError("The selection rows must contain every class")
+        sample = X_processed[:latency_rows]
+        
+        logger.info(f"Profiling {len(self.models)} base models for a {latency_budget_ms:.2f} ms budget...")
+        member_proba: Dict[str, np.ndarray] = {}
+        members: Dict[str, Dict[str, Any]] = {}
+        for name, model in self.models.items():
+            if not hasattr(model, "predict_proba") or len(getattr(model, "classes_", [])) != self.n_classes_:
+                continue
+            try:
+                compiled = compile_estimator(model)
+            except Exception:
+                compiled = None
+            serving = compiled if compiled is not None else model
+            try:
+                latency = measure_row_latency(serving.predict_proba, sample)
+                member_proba[name] = model.predict_proba(X_processed)
+            except Exception as e:
+                logger.warning(f"  {name} excluded, predict_proba failed: {e}")
+                continue
+            members[name] = {**latency, "compiled": compiled is not None}
+        if not members:
+            raise RuntimeError("No base model can be stacked")
+        
+        meta_learner = (
+            self.ensemble_model.final_estimator if self.ensemble_model is not None
+            else self._create_ensemble([]).final_estimator
+        )
+        scorer = SubsetScorer(member_proba, y_encoded, meta_learner, self.cv_folds, self.random_state)
+        candidates = list(members)
+        
+        # The meta-learner's own cost, timed on the widest input it can get
+        meta = clone(meta_learner).fit(scorer.meta_features(candidates), y_encoded)
+        overhead = measure_row_latency(meta.predict_proba, scorer.meta_features(candidates)[:latency_rows])
+        
+        selected, steps = greedy_select(
+            candidates,
+            {name: profile["p99_ms"] for name, profile in members.items()},
+            lambda subset: scorer.score(subset)[metric],
+            latency_budget_ms,
+            overhead_ms=overhead["p99_ms"],
+            min_gain=min_gain,
+        )
+        if not selected:
+            raise ValueError(f"No base model fits a p99 budget of {latency_budget_ms} ms")
+        
+        while True:
+            self.ensemble_model = assemble_stacking(
+                self._create_ensemble(selected),
+                {self._stacking_name(name): self.models[name] for name in selected},
+                {self._stacking_name(name): member_proba[name] for name in selected},
+                X_processed,
+                y_encoded,
+            )
+            self.compile_inference(sample)
+            measured = measure_row_latency(self._teacher_proba, sample)
+            if measured["p99_ms"] <= latency_budget_ms or len(selected) == 1:
+                break
+            logger.info(f"  Measured p99 {measured['p99_ms']:.2f} ms over budget, dropping {selected[-1]}")
+            selected.pop()
+        
+        final_scores = scorer.score(selected)
+        for name, profile in members.items():
+            profile["selected"] = name in selected
+            profile["solo"] = scorer.score([name])
+            # Selected: what removing it costs; others: what adding it would gain
+            if name in selected:
+                without = scorer.score([m for m in selected if m != name])
+                profile["marginal"] = {k: final_scores[k] - without[k] for k in SELECTION_METRICS}
+            else:
+                with_member = scorer.score(selected + [name])
+                profile["marginal"] = {k: with_member[k] - final_scores[k] for k in SELECTION_METRICS}
+        
+        self.latency_profile_ = {
+            "budget_ms": float(latency_budget_ms),
+            "metric": metric,
+            "n_rows": int(len(X_processed)),
+            "selected": list(selected),
+            "steps": steps,
+            "members": members,
+            "meta_learner": overhead,
+            "ensemble": {**measured, **final_scores, "compiled": self.compiled_model_ is not None},
+            "all_members": scorer.score(candidates),
+            "selected_at": datetime.utcnow().isoformat(),
+        }
+        
+        if drop_unselected:
+            for name in set(self.models) - set(selected):
+                del self.models[name]
+            self._compute_feature_importances()
+        if getattr(self, "student_", None) is not None:
+            logger.info("Dropping the distilled student, its teacher has changed")
+            self.student_ = self.compiled_student_ = None
+            self.student_report_ = {}
+        self.build_attribution()
+        
+        logger.info(
+            f"  Selected {selected}: p99={measured['p99_ms']:.2f} ms, "
+            f"{metric}={final_scores[metric]:.4f} (all members: {self.latency_profile_['all_members'][metric]:.4f})"
+        )
+        return self.latency_profile_
+    
+    def enable_prediction_cache(
+        self, max_entries: int = DEFAULT_MAX_ENTRIES, version: Optional[str] = None
+    ) -> PredictionCache:
+        """
+        Memoize predict_proba / predict_with_explanation outputs per row.
+        
+        Rows are keyed by their preprocessed feature vector and ``version``
+        (by default the model version and training date), so a retrained
+        model never reads another model's entries. The cache is saved with
+        the model empty.
+        """
+        self.prediction_cache_ = PredictionCache(
+            max_entries, version=version or f"{self.version_}@{self.training_date_}"
+        )
+        return self.prediction_cache_
+    
     def _get_best_model(self) -> BaseEstimator:
         """Get the best performing individual model."""
         if not self.models:
             raise RuntimeError("No models trained")
         
         best_name = max(
-            self.training_metrics_,
+            (k for k in self.training_metrics_ if k in self.models),
             key=lambda k: self.training_metrics_[k].get("f1_weighted", 0)
-            if k != "ensemble" else 0
         )
         return self.models[best_name]
     
@@ -733,13 +1452,38 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
             "classes": list(self.classes_) if self.classes_ is not None else [],
             "n_models": len(self.models),
             "has_ensemble": self.ensemble_model is not None,
+            "compiled_inference": getattr(self, "compiled_model_", None) is not None,
+            "attribution": getattr(self, "attribution_engine_", None) is not None,
+            "student": {
+                **getattr(self, "student_report_", {}),
+                "serving": self._serving_student(),
+                "routing": dict(getattr(self, "routing_stats_", {})),
+            } if getattr(self, "student_", None) is not None else None,
+            "latency_profile": getattr(self, "latency_profile_", {}),
+            "prediction_cache": (
+                self.prediction_cache_.get_metrics()
+                if getattr(self, "prediction_cache_", None) is not None else None
+            ),
             "training_metrics": self.training_metrics_,
             "cv_scores": self.cv_scores_,
             "selected_features": self.selected_features_,
+            "input_features": self.feature_names_,
+            "feature_pipeline": getattr(self, "feature_pipeline_", None) is not None,
+            "blood_imputation": getattr(self, "blood_imputation", "knn"),
         }
     
-    def save_model(self, filepath: str) -> None:
-        """Save the model to disk."""
+    def save_model(self, filepath: str, memory_map: bool = False) -> None:
+        """
+        Save the model to disk.
+
+        With ``memory_map=True`` the large arrays go to a sidecar file that
+        is memory-mapped on load. Plain array state is then shared between
+        worker processes, but fitted sklearn trees are still copied into
+        each one (see ai_models.models.artifacts).
+        """
+        if memory_map:
+            save_artifact(self, filepath)
+            return
         Path(filepath).parent.mkdir(parents=True, exist_ok=True)
         with open(filepath, "wb") as f:
             pickle.dump(self, f)
@@ -747,9 +1491,8 @@ class CancerRiskClassifier(BaseEstimator, ClassifierMixin):
     
     @staticmethod
     def load_model(filepath: str) -> "CancerRiskClassifier":
-        """Load a saved model."""
-        with open(filepath, "rb") as f:
-            model = pickle.load(f)
+        """Load a saved model (plain or memory-mapped artifact)."""
+        model = load_artifact(filepath)
         logger.info(f"Model loaded from {filepath}")
         return model
 
@@ -826,3 +1569,224 @@ class MultiCancerClassifier(CancerRiskClassifier):
             results.append(top_risks)
         
         return results
+
+
+# ============================================================================
+# Incremental Cancer Classifier (online updates with partial_fit)
+# ============================================================================
+
+class IncrementalCancerClassifier(CancerRiskClassifier):
+    """
+    Linear cancer risk classifier trained from mini-batches with partial_fit.
+    
+    Folds new screening outcomes into a model without a full ensemble
+    retrain. Nothing is fitted once up front: blood-derived features come
+    from the stateless BiomarkerFeatureEngine, the scaler statistics are
+    updated with every batch (StandardScaler.partial_fit ignores NaN) and
+    missing values are imputed with the running means. The classes must be
+    known at the first batch; later batches may only use those labels.
+    
+    Serves through the CancerRiskClassifier interface, so checkpoints are
+    registered and activated like any other model version (see
+    ai_models.training.incremental).
+    """
+    
+    def __init__(
+        self,
+        classes: Optional[List[Any]] = None,
+        alpha: float = 1e-4,
+        batch_size: int = 4096,
+        random_state: int = 42,
+        use_derived_features: bool = True,
+    ):
+        super().__init__(
+            random_state=random_state,
+            use_ensemble=False,
+            use_feature_selection=False,
+            use_feature_pipeline=False,
+        )
+        self.classes = classes
+        self.alpha = alpha
+        self.batch_size = batch_size
+        self.use_derived_features = use_derived_features
+        self.version_ = "1.0.0-incremental"
+        self._reset()
+    
+    def _reset(self) -> None:
+        self.models = {}
+        self.scaler = StandardScaler()
+        self.label_encoder = LabelEncoder()
+        self.feature_engine_ = None
+        self.feature_names_ = None
+        self.model_feature_names_ = None
+        self.selected_features_ = None
+        self.feature_importances_ = None
+        self.attribution_engine_ = None
+        self.training_metrics_ = {}
+        self.classes_ = None
+        self.n_classes_ = 0
+        self.n_features_in_ = 0
+        self.n_samples_seen_ = 0
+        self.n_batches_ = 0
+        # Progressive validation: each batch is scored before the model learns from it
+        self._progressive_loss = 0.0
+        self._progressive_correct = 0
+        self._progressive_rows = 0
+        self.is_fitted_ = False
+    
+    def _initialize(
+        self,
+        X: Union[pd.DataFrame, np.ndarray],
+        y: np.ndarray,
+        feature_names: Optional[List[str]],
+    ) -> None:
+        """Fix the input layout and the classes from the first batch."""
+        if isinstance(X, pd.DataFrame):
+            self.feature_names_ = list(X.columns)
+        elif feature_names:
+            self.feature_names_ = list(feature_names)
+        else:
+            self.feature_names_ = [f"feature_{i}" for i in range(X.shape[1])]
+        
+        if self.use_derived_features:
+            self.feature_engine_ = BiomarkerFeatureEngine(self.feature_names_)
+            self.model_feature_names_ = list(self.feature_engine_.feature_names)
+        else:
+            self.model_feature_names_ = list(self.feature_names_)
+        self.selected_features_ = self.model_feature_names_
+        self.n_features_in_ = len(self.model_feature_names_)
+        
+        classes = self.classes if self.classes is not None else np.unique(y)
+        self.label_encoder.fit(np.asarray(classes))
+        self.classes_ = self.label_encoder.classes_
+        self.n_classes_ = len(self.classes_)
+        if self.n_classes_ < 2:
+            raise ValueError(
+                f"Incremental training needs at least two classes, got {list(self.classes_)}; "
+                "pass classes= when the first batch does not contain all of them"
+            )
+        
+        self.models = {
+            "sgd": SGDClassifier(
+                loss="log_loss",
+                alpha=self.alpha,
+                random_state=self.random_state,
+            )
+        }
+    
+    def _model_inputs(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """Raw inputs -> unscaled model layout (input columns + derived features)."""
+        if isinstance(X, pd.DataFrame):
+            values = X.reindex(columns=self.feature_names_).to_numpy(dtype=float)
+        else:
+            values = np.asarray(X, dtype=float)
+            if values.ndim == 1:
+                values = values[np.newaxis, :]
+        if self.feature_engine_ is not None:
+            return self.feature_engine_.transform(values)
+        return values
+    
+    def _scale(self, values: np.ndarray) -> np.ndarray:
+        scaled = self.scaler.transform(values)
+        # Missing values (and features not observed yet) sit at the running mean
+        scaled[np.isnan(scaled)] = 0.0
+        return scaled
+    
+    def _preprocess(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """Preprocess features with the current running statistics."""
+        return self._scale(self._model_inputs(X))
+    
+    def partial_fit(
+        self,
+        X: Union[pd.DataFrame, np.ndarray],
+        y: Union[pd.Series, np.ndarray],
+        feature_names: Optional[List[str]] = None,
+    ) -> "IncrementalCancerClassifier":
+        """
+        Update the scaler statistics and the model with one mini-batch.
+        
+        Args:
+            X: Raw feature rows (DataFrames are aligned to the first batch's columns)
+            y: Labels, all from the classes fixed at the first batch
+            feature_names: Column names for array input on the first batch
+        """
+        y = np.asarray(y.values if isinstance(y, pd.Series) else y)
+        if not len(y):
+            return self
+        if not self.is_fitted_:
+            self._initialize(X, y, feature_names)
+        
+        unknown = np.setdiff1d(y, self.classes_)
+        if len(unknown):
+            raise ValueError(f"Labels {list(unknown)} are not among the model classes {list(self.classes_)}")
+        y_encoded = self.label_encoder.transform(y)
+        
+        values = self._model_inputs(X)
+        model = self.models["sgd"]
+        if self.is_fitted_:
+            proba = model.predict_proba(self._scale(values))
+            self._progressive_loss += log_loss(y_encoded, proba, labels=np.arange(self.n_classes_)) * len(y)
+            self._progressive_correct += int((np.argmax(proba, axis=1) == y_encoded).sum())
+            self._progressive_rows += len(y)
+        
+        self.scaler.partial_fit(values)
+        model.partial_fit(self._scale(values), y_encoded, classes=np.arange(self.n_classes_))
+        
+        self.n_samples_seen_ += len(y)
+        self.n_batches_ += 1
+        self.is_fitted_ = True
+        self.training_date_ = datetime.utcnow().isoformat()
+        self.training_metrics_["sgd"] = self._incremental_metrics()
+        if self.student_ is not None:
+            logger.info("Dropping the distilled student, its teacher has changed")
+            self.student_ = self.compiled_student_ = None
+            self.student_report_ = {}
+        if self.attribution_engine_ is None:
+            # Reads the live coefficients, so it is built once
+            self.build_attribution()
+        self._compute_feature_importances()
+        return self
+    
+    def fit(
+        self,
+        X: Union[pd.DataFrame, np.ndarray],
+        y: Union[pd.Series, np.ndarray],
+        feature_names: Optional[List[str]] = None,
+    ) -> "IncrementalCancerClassifier":
+        """Train from scratch with one pass of ``batch_size`` mini-batches."""
+        self._reset()
+        y = np.asarray(y.values if isinstance(y, pd.Series) else y)
+        for start in range(0, len(y), self.batch_size):
+            stop = start + self.batch_size
+            batch = X.iloc[start:stop] if isinstance(X, pd.DataFrame) else X[start:stop]
+            self.partial_fit(batch, y[start:stop], feature_names=feature_names)
+        logger.info(f"Incremental model trained on {self.n_samples_seen_} rows in {self.n_batches_} batches")
+        return self
+    
+    def _incremental_metrics(self) -> Dict[str, Any]:
+        metrics: Dict[str, Any] = {
+            "samples_seen": int(self.n_samples_seen_),
+            "batches": int(self.n_batches_),
+        }
+        if self._progressive_rows:
+            metrics["progressive_log_loss"] = float(self._progressive_loss / self._progressive_rows)
+            metrics["progressive_accuracy"] = float(self._progressive_correct / self._progressive_rows)
+        return metrics
+    
+    def _compute_feature_importances(self):
+        """Mean absolute standardized coefficient per feature."""
+        model = self.models.get("sgd")
+        if model is None or not hasattr(model, "coef_"):
+            return super()._compute_feature_importances()
+        importances = np.abs(model.coef_).mean(axis=0)
+        self.feature_importances_ = importances / max(importances.sum(), 1e-12)
+    
+    def get_model_info(self) -> Dict[str, Any]:
+        """Get model information, including how much data has been folded in."""
+        info = super().get_model_info()
+        info.update({
+            "incremental": True,
+            "samples_seen": int(self.n_samples_seen_),
+            "batches": int(self.n_batches_),
+        })
+        return info
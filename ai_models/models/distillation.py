@@ -0,0 +1,157 @@
+"""
+Ensemble Distillation
+=====================
+
+Compact student models trained on the stacking ensemble's soft labels.
+
+A student is an ordinary sklearn classifier fitted to the teacher's class
+probabilities: every training row is repeated once per class with that
+class as label and the teacher's probability as sample weight, which makes
+the usual log-loss the cross-entropy against the soft labels. Two students
+are available:
+
+- ``"logistic"``: multinomial logistic regression on the engineered
+  (pipeline + scaled + selected) features.
+- ``"boosting"``: shallow gradient boosting, which the tree engine compiles
+  for vectorized inference.
+
+The teacher stays in the model: ``CancerRiskClassifier`` serves the student
+and re-scores with the teacher only rows whose student risk score lies
+within the fallback margin of a risk category threshold. A student row can
+only land in another category than the teacher's when a threshold lies
+between the two risk scores, so the margin is the smallest one that brings
+the routed model's category agreement with the teacher on held-out rows up
+to a target (99.5% by default).
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import numpy as np
+from sklearn.base import BaseEstimator
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+
+logger = logging.getLogger(__name__)
+
+STUDENT_KINDS = ("logistic", "boosting")
+
+# Soft labels below this weight are dropped from the replicated training set
+MIN_SOFT_LABEL_WEIGHT = 1e-4
+
+
+def make_student(kind: str, random_state: int = 42) -> BaseEstimator:
+    """Create an unfitted student model."""
+    if kind == "logistic":
+        return LogisticRegression(
+            max_iter=2000,
+            solver="lbfgs",
+            multi_class="multinomial",
+            random_state=random_state,
+        )
+    if kind == "boosting":
+        return GradientBoostingClassifier(
+            n_estimators=60,
+            max_depth=3,
+            learning_rate=0.1,
+            subsample=0.8,
+            random_state=random_state,
+        )
+    raise ValueError(f"Unknown student {kind!r}, expected one of {STUDENT_KINDS}")
+
+
+def fit_soft_labels(estimator: BaseEstimator, X: np.ndarray, proba: np.ndarray) -> BaseEstimator:
+    """
+    Fit a classifier to soft labels (rows of class probabilities).
+
+    The fitted classes are the column indices of ``proba``.
+    """
+    n_rows, n_classes = proba.shape
+    X_rep = np.tile(X, (n_classes, 1))
+    y_rep = np.repeat(np.arange(n_classes), n_rows)
+    weights = proba.T.ravel()
+
+    keep = weights >= MIN_SOFT_LABEL_WEIGHT
+    # Every class keeps at least its most probable row, so none goes missing
+    keep[np.arange(n_classes) * n_rows + proba.argmax(axis=0)] = True
+    estimator.fit(X_rep[keep], y_rep[keep], sample_weight=weights[keep])
+    return estimator
+
+
+def threshold_distance(risk_scores: np.ndarray, thresholds: Sequence[float]) -> np.ndarray:
+    """Distance of each risk score to its nearest threshold."""
+    distance = np.abs(np.asarray(risk_scores)[:, np.newaxis] - np.asarray(thresholds)[np.newaxis, :])
+    return distance.min(axis=1)
+
+
+def borderline_mask(risk_scores: np.ndarray, thresholds: Sequence[float], margin: float) -> np.ndarray:
+    """Rows whose risk score is within ``margin`` of any threshold."""
+    if margin <= 0:
+        return np.zeros(len(risk_scores), dtype=bool)
+    return threshold_distance(risk_scores, thresholds) < margin
+
+
+def calibrate_margin(distance: np.ndarray, disagree: np.ndarray, target_agreement: float) -> float:
+    """
+    Smallest fallback margin whose routed category agreement meets the target.
+
+    ``distance`` is the student risk's distance to the nearest threshold and
+    ``disagree`` marks rows whose student category differs from the teacher's;
+    routing a row (distance < margin) makes it agree.
+    """
+    allowed = int(np.floor((1 - target_agreement) * len(distance)))
+    misses = np.sort(distance[disagree])[::-1]
+    if len(misses) <= allowed:
+        return 0.0
+    # Cover every disagreeing row except the ``allowed`` farthest ones
+    return float(np.nextafter(misses[allowed], np.inf))
+
+
+def fidelity_report(
+    teacher_proba: np.ndarray,
+    student_proba: np.ndarray,
+    risk_fn: Callable[[np.ndarray], np.ndarray],
+    category_fn: Callable[[np.ndarray], np.ndarray],
+    thresholds: Sequence[float],
+    target_agreement: float,
+    y_true: Optional[np.ndarray] = None,
+) -> Dict[str, Any]:
+    """
+    Compare a student with its teacher on held-out rows.
+
+    Also picks the fallback margin (see ``calibrate_margin``) and reports
+    how the routed model agrees with the teacher.
+    """
+    teacher_risk = risk_fn(teacher_proba)
+    student_risk = risk_fn(student_proba)
+    gap = np.abs(student_risk - teacher_risk)
+    category_match = category_fn(teacher_risk) == category_fn(student_risk)
+
+    distance = threshold_distance(student_risk, thresholds)
+    margin = calibrate_margin(distance, ~category_match, target_agreement)
+    routed = distance < margin
+
+    report = {
+        "n_eval": int(len(gap)),
+        "risk_gap_mean": float(gap.mean()) if len(gap) else 0.0,
+        "risk_gap_p95": float(np.quantile(gap, 0.95)) if len(gap) else 0.0,
+        "risk_gap_max": float(gap.max()) if len(gap) else 0.0,
+        "label_agreement": float(np.mean(teacher_proba.argmax(axis=1) == student_proba.argmax(axis=1))),
+        "category_agreement": float(np.mean(category_match)),
+        "target_agreement": target_agreement,
+        "fallback_margin": margin,
+        "fallback_rate": float(np.mean(routed)),
+        # Routed rows are scored by the teacher itself
+        "routed_category_agreement": float(np.mean(category_match | routed)),
+    }
+    if y_true is not None:
+        teacher_accuracy = float(np.mean(teacher_proba.argmax(axis=1) == y_true))
+        student_accuracy = float(np.mean(student_proba.argmax(axis=1) == y_true))
+        report.update({
+            "teacher_accuracy": teacher_accuracy,
+            "student_accuracy": student_accuracy,
+            "accuracy_gap": teacher_accuracy - student_accuracy,
+        })
+    return report
@@ -0,0 +1,145 @@
+"""
+Ensemble Member Selection
+=========================
+
+Helpers for pruning the stacking ensemble down to the members that earn
+their inference cost (see ``CancerRiskClassifier.select_members``):
+
+- ``measure_row_latency`` times single-row calls, the way the API scores
+  one patient at a time, and reports mean / p50 / p99 milliseconds.
+- ``SubsetScorer`` scores any subset of members by cross-validating the
+  meta-learner on the members' predictions for labeled held-out rows
+  (blending), so no base model is refitted.
+- ``greedy_select`` grows the subset one member at a time, taking the
+  largest score gain whose estimated p99 latency still fits the budget.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Tuple
+
+import numpy as np
+from sklearn.base import BaseEstimator, clone
+from sklearn.metrics import f1_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold, cross_val_predict
+
+logger = logging.getLogger(__name__)
+
+SELECTION_METRICS = ("f1_weighted", "auc")
+
+
+def measure_row_latency(
+    predict_fn: Callable[[np.ndarray], Any], X: np.ndarray, quantile: float = 0.99
+) -> Dict[str, float]:
+    """Per-row latency of ``predict_fn`` called on one row of ``X`` at a time."""
+    if not len(X):
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0}
+    predict_fn(X[:1])  # warm-up
+    timings = np.empty(len(X))
+    for i in range(len(X)):
+        started = time.perf_counter()
+        predict_fn(X[i:i + 1])
+        timings[i] = time.perf_counter() - started
+    timings *= 1000
+    return {
+        "mean_ms": float(timings.mean()),
+        "p50_ms": float(np.quantile(timings, 0.5)),
+        "p99_ms": float(np.quantile(timings, quantile)),
+    }
+
+
+class SubsetScorer:
+    """
+    Validation scores of the stack built from any subset of members.
+
+    ``member_proba`` maps member names to their predict_proba on labeled
+    held-out rows; scores are cached per subset.
+    """
+
+    def __init__(
+        self,
+        member_proba: Dict[str, np.ndarray],
+        y: np.ndarray,
+        meta_learner: BaseEstimator,
+        cv_folds: int = 5,
+        random_state: int = 42,
+    ):
+        self.member_proba = member_proba
+        self.y = y
+        self.meta_learner = meta_learner
+        self.n_classes = next(iter(member_proba.values())).shape[1]
+        self.cv = StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=random_state)
+        self._cache: Dict[FrozenSet[str], Dict[str, float]] = {}
+
+    def meta_features(self, members: Iterable[str]) -> np.ndarray:
+        """Meta-learner input, laid out like StackingClassifier's."""
+        # Binary stacking keeps only the positive-class column
+        start = 1 if self.n_classes == 2 else 0
+        return np.hstack([self.member_proba[name][:, start:] for name in members])
+
+    def score(self, members: Iterable[str]) -> Dict[str, float]:
+        members = tuple(members)
+        key = frozenset(members)
+        if not key:
+            return {"f1_weighted": 0.0, "auc": 0.0}
+        if key not in self._cache:
+            proba = cross_val_predict(
+                clone(self.meta_learner), self.meta_features(members), self.y,
+                cv=self.cv, method="predict_proba",
+            )
+            scores = {
+                "f1_weighted": float(f1_score(self.y, proba.argmax(axis=1), average="weighted")),
+                "auc": 0.0,
+            }
+            try:
+                if self.n_classes == 2:
+                    scores["auc"] = float(roc_auc_score(self.y, proba[:, 1]))
+                else:
+                    scores["auc"] = float(roc_auc_score(self.y, proba, multi_class="ovr", average="weighted"))
+            except ValueError:
+                pass
+            self._cache[key] = scores
+        return self._cache[key]
+
+
+def greedy_select(
+    candidates: List[str],
+    latency_ms: Dict[str, float],
+    score_fn: Callable[[Tuple[str, ...]], float],
+    budget_ms: float,
+    overhead_ms: float = 0.0,
+    min_gain: float = 1e-3,
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Forward selection under a latency budget.
+
+    The estimated latency of a subset is ``overhead_ms`` plus the sum of its
+    members' latencies (an upper bound for p99 values). Each step adds the
+    member with the largest score gain among those that still fit; selection
+    stops when none fits or the best gain is below ``min_gain``.
+
+    Returns the selected members in the order they were added and one
+    record per step.
+    """
+    selected: List[str] = []
+    steps: List[Dict[str, Any]] = []
+    current_score = score_fn(())
+    spent = overhead_ms
+    while True:
+        best = None
+        for name in candidates:
+            if name in selected or spent + latency_ms[name] > budget_ms:
+                continue
+            gain = score_fn(tuple(selected) + (name,)) - current_score
+            if best is None or gain > best[1] or (gain == best[1] and latency_ms[name] < latency_ms[best[0]]):
+                best = (name, gain)
+        if best is None or (selected and best[1] < min_gain):
+            break
+        name, gain = best
+        selected.append(name)
+        current_score += gain
+        spent += latency_ms[name]
+        steps.append({"member": name, "gain": float(gain), "score": float(current_score), "estimated_ms": float(spent)})
+    return selected, steps
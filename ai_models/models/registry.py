@@ -0,0 +1,221 @@
+"""
+Versioned Model Registry
+========================
+
+Stores trained cancer models as immutable, versioned artifacts with
+metadata (model info, feature list, training metrics) and tracks which
+version is active. Publishing a version and switching the active pointer
+are both atomic on the filesystem, so readers never see a half-written
+model.
+
+Layout::
+
+    <models_dir>/
+        ACTIVE                      # name of the active version
+        versions/<version>/
+            model.pkl
+            model.pkl.arrays        # memory-mapped array buffers
+            metadata.json
+
+Artifacts are written in the memory-mapped format by default (see
+``ai_models.models.artifacts``), so every worker serving a version maps
+the same array pages instead of holding its own copy.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ai_models.models.artifacts import (
+    artifact_files, artifact_size_bytes, load_artifact, save_artifact,
+)
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_POINTER = "ACTIVE"
+VERSIONS_DIR = "versions"
+MODEL_FILE = "model.pkl"
+METADATA_FILE = "metadata.json"
+
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    """Write a small text file atomically (write to temp file, then rename)."""
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _files_sha256(paths: List[Path]) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Filesystem-backed registry of versioned model artifacts."""
+
+    def __init__(self, models_dir: str):
+        self.models_dir = Path(models_dir)
+        self.versions_dir = self.models_dir / VERSIONS_DIR
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Publishing
+    # ------------------------------------------------------------------
+
+    def register(
+        self,
+        model: Any,
+        version: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        activate: bool = False,
+        memory_map: bool = True,
+    ) -> str:
+        """
+        Store a trained model as a new immutable version.
+
+        Args:
+            model: Fitted model (CancerRiskClassifier or compatible)
+            version: Version name; defaults to ``<model.version_>-<UTC timestamp>``
+            metadata: Extra metadata stored alongside the model info
+            activate: Make this the active version once stored
+            memory_map: Store arrays in a memory-mappable sidecar file
+        """
+        if version is None:
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+            version = f"{getattr(model, 'version_', 'model')}-{stamp}"
+
+        final_dir = self.versions_dir / version
+        if final_dir.exists():
+            raise ValueError(f"Model version already exists: {version}")
+
+        # Build the version in a staging directory and publish it with one rename
+        staging_dir = Path(tempfile.mkdtemp(dir=str(self.versions_dir), prefix=f".{version}."))
+        try:
+            model_path = staging_dir / MODEL_FILE
+            if memory_map:
+                save_artifact(model, str(model_path))
+            else:
+                with open(model_path, "wb") as f:
+                    pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            info = model.get_model_info() if hasattr(model, "get_model_info") else {}
+            record = {
+                "version": version,
+                "model_class": type(model).__name__,
+                "registered_at": datetime.now(timezone.utc).isoformat(),
+                "artifact": MODEL_FILE,
+                "artifact_format": "mmap" if memory_map else "pickle",
+                "artifact_sha256": _files_sha256(artifact_files(str(model_path))),
+                "artifact_size_bytes": artifact_size_bytes(str(model_path)),
+                "model_info": info,
+                "feature_names": list(getattr(model, "feature_names_", None) or []),
+                "training_metrics": info.get("training_metrics", {}),
+                "metadata": metadata or {},
+            }
+            with open(staging_dir / METADATA_FILE, "w", encoding="utf-8") as f:
+                json.dump(record, f, indent=2, default=str)
+
+            os.replace(staging_dir, final_dir)
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        logger.info(f"Registered model version {version}")
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version: str) -> None:
+        """Atomically point the registry at an existing version."""
+        if not (self.versions_dir / version / METADATA_FILE).exists():
+            raise KeyError(f"Unknown model version: {version}")
+        _atomic_write_text(self.models_dir / ACTIVE_POINTER, version)
+        logger.info(f"Activated model version {version}")
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    @property
+    def active_version(self) -> Optional[str]:
+        pointer = self.models_dir / ACTIVE_POINTER
+        if not pointer.exists():
+            return None
+        version = pointer.read_text(encoding="utf-8").strip()
+        return version or None
+
+    def list_versions(self) -> List[Dict[str, Any]]:
+        """Metadata for every stored version, oldest first."""
+        records = []
+        for version_dir in self.versions_dir.iterdir():
+            if version_dir.name.startswith(".") or not version_dir.is_dir():
+                continue
+            try:
+                records.append(self.get_metadata(version_dir.name))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable model version {version_dir.name}: {e}")
+        return sorted(records, key=lambda r: r.get("registered_at", ""))
+
+    def get_metadata(self, version: str) -> Dict[str, Any]:
+        """Read the metadata stored for a version."""
+        path = self.versions_dir / version / METADATA_FILE
+        if not path.exists():
+            raise KeyError(f"Unknown model version: {version}")
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def artifact_path(self, version: str) -> Path:
+        """Path to the stored model artifact for a version."""
+        metadata = self.get_metadata(version)
+        return self.versions_dir / version / metadata.get("artifact", MODEL_FILE)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def load(self, version: Optional[str] = None) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Load a version (the active one by default).
+
+        Returns the model and a load report including the measured
+        cold-start load time.
+        """
+        version = version or self.active_version
+        if version is None:
+            raise LookupError("No active model version")
+
+        path = self.artifact_path(version)
+        started = time.perf_counter()
+        model = load_artifact(str(path))
+        load_seconds = time.perf_counter() - started
+
+        report = {
+            "version": version,
+            "artifact_path": str(path),
+            "load_seconds": load_seconds,
+            "loaded_at": datetime.now(timezone.utc).isoformat(),
+        }
+        logger.info(f"Loaded model version {version} in {load_seconds:.3f}s")
+        return model, report
@@ -0,0 +1,323 @@
+"""
+Training Dataset Builder
+========================
+
+Builds the wide blood-biomarker training matrix from the long-format
+``blood_biomarkers`` table (one row per biomarker_name) without loading
+the lab rows into pandas:
+
+1. Labels: ``blood_samples`` joined to ``cancer_screenings`` through
+   ``blood_sample_id``. Every sample with at least one screening becomes a
+   row; its label is whether any of those screenings detected cancer
+   (``label="binary"``) or the detected cancer type, ``"none"`` otherwise
+   (``label="cancer_type"``; the greatest type name if several differ).
+2. Values: the biomarker rows of those samples are streamed in
+   keyset-ordered chunks on ``(blood_sample_id, id)`` and scattered into a
+   preallocated float32 matrix whose columns follow BLOOD_FEATURES.
+   Biomarker names are matched case-insensitively; unmatched names are
+   counted in the snapshot metadata.
+
+With ``screened_since`` only samples with a screening recorded after that
+time are included (labels still use all of their screenings), which is
+how incremental training picks up new outcomes (see
+ai_models.training.incremental).
+
+Peak memory is the matrix plus one chunk. With ``out_dir`` the matrix is
+a memory-mapped ``X.npy`` written in place and the snapshot can be
+reloaded later without the database::
+
+    snapshot = build_blood_dataset("sqlite:///cancerguard.db", out_dir="data/snapshots/blood")
+    snapshot = TrainingSnapshot.load("data/snapshots/blood")
+    model.fit(snapshot.X, snapshot.y, feature_names=snapshot.feature_names)
+
+Usage::
+
+    python -m ai_models.training.datasets --database-url sqlite:///cancerguard.db --out data/snapshots/blood
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from sqlalchemy import Boolean, DateTime, Float, String, case, column, create_engine, func, select, table, tuple_
+from sqlalchemy.engine import Connection, Engine
+
+from ai_models.models.cancer_classifier import BLOOD_FEATURES
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+DEFAULT_CHUNK_SIZE = 50000
+LABEL_MODES = ("binary", "cancer_type")
+NO_CANCER_LABEL = "none"
+
+# Lightweight table definitions: only the columns read here, so this module
+# does not depend on the backend's ORM models
+_samples = table(
+    "blood_samples",
+    column("id", String),
+    column("is_deleted", Boolean),
+)
+_biomarkers = table(
+    "blood_biomarkers",
+    column("id", String),
+    column("blood_sample_id", String),
+    column("biomarker_name", String),
+    column("value", Float),
+    column("is_deleted", Boolean),
+)
+_screenings = table(
+    "cancer_screenings",
+    column("blood_sample_id", String),
+    column("cancer_detected", Boolean),
+    column("cancer_type_screened", String),
+    column("is_deleted", Boolean),
+    column("created_at", DateTime),
+)
+
+
+@dataclass
+class TrainingSnapshot:
+    """A wide training matrix with its labels, reloadable from disk."""
+    X: np.ndarray
+    y: np.ndarray
+    feature_names: List[str]
+    sample_ids: np.ndarray
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def save(self, out_dir: Union[str, Path]) -> Path:
+        """Write X.npy, y.npy, sample_ids.npy and metadata.json to ``out_dir``."""
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        x_path = out / "X.npy"
+        if isinstance(self.X, np.memmap) and Path(self.X.filename).resolve() == x_path.resolve():
+            self.X.flush()
+        else:
+            np.save(x_path, np.asarray(self.X, dtype=np.float32))
+        np.save(out / "y.npy", self.y)
+        np.save(out / "sample_ids.npy", self.sample_ids)
+        metadata = {
+            **self.metadata,
+            "version": SNAPSHOT_VERSION,
+            "rows": int(self.X.shape[0]),
+            "feature_names": list(self.feature_names),
+        }
+        (out / "metadata.json").write_text(json.dumps(metadata, indent=2))
+        return out
+
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: bool = True) -> "TrainingSnapshot":
+        """Load a saved snapshot; with mmap=True X is memory-mapped read-only."""
+        path = Path(path)
+        metadata = json.loads((path / "metadata.json").read_text())
+        if metadata.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot version {metadata.get('version')} in {path}, expected {SNAPSHOT_VERSION}"
+            )
+        X = np.load(path / "X.npy", mmap_mode="r" if mmap else None)
+        return cls(
+            X=X,
+            y=np.load(path / "y.npy"),
+            feature_names=metadata.pop("feature_names"),
+            sample_ids=np.load(path / "sample_ids.npy"),
+            metadata=metadata,
+        )
+
+
+def _open(bind: Union[str, Engine, Connection], stack: ExitStack) -> Connection:
+    if isinstance(bind, Connection):
+        return bind
+    engine = create_engine(bind) if isinstance(bind, str) else bind
+    if isinstance(bind, str):
+        stack.callback(engine.dispose)
+    return stack.enter_context(engine.connect())
+
+
+def _normalize_name(name: Optional[str]) -> str:
+    return (name or "").strip().lower().replace(" ", "_")
+
+
+def _screened_samples(screened_since: Optional[datetime] = None):
+    """Ids of blood samples with a screening (recorded after ``screened_since``)."""
+    s = _screenings.c
+    stmt = select(s.blood_sample_id).where(s.is_deleted == False)
+    if screened_since is not None:
+        stmt = stmt.group_by(s.blood_sample_id).having(func.max(s.created_at) > screened_since)
+    return stmt
+
+
+def screening_watermark(conn: Connection) -> Optional[datetime]:
+    """Record time of the newest screening; pass it as ``screened_since`` next time."""
+    return conn.execute(
+        select(func.max(_screenings.c.created_at)).where(_screenings.c.is_deleted == False)
+    ).scalar()
+
+
+def load_labels(
+    conn: Connection,
+    label: str = "binary",
+    screened_since: Optional[datetime] = None,
+) -> Tuple[List[str], np.ndarray]:
+    """Sample ids (sorted) and their labels for every screened blood sample."""
+    if label not in LABEL_MODES:
+        raise ValueError(f"Unknown label mode {label!r}, expected one of {LABEL_MODES}")
+
+    detected = _screenings.c.cancer_detected == True
+    if label == "binary":
+        label_expr = func.max(case((detected, 1), else_=0))
+    else:
+        label_expr = func.max(case((detected, _screenings.c.cancer_type_screened)))
+
+    stmt = (
+        select(_samples.c.id, label_expr)
+        .select_from(_samples.join(_screenings, _screenings.c.blood_sample_id == _samples.c.id))
+        .where(_samples.c.is_deleted == False, _screenings.c.is_deleted == False)
+        .where(_samples.c.id.in_(_screened_samples(screened_since)))
+        .group_by(_samples.c.id)
+        .order_by(_samples.c.id)
+    )
+    rows = conn.execute(stmt).all()
+    sample_ids = [row[0] for row in rows]
+    if label == "binary":
+        y = np.fromiter((row[1] for row in rows), dtype=np.int8, count=len(rows))
+    else:
+        y = np.array([row[1] or NO_CANCER_LABEL for row in rows], dtype=str)
+    return sample_ids, y
+
+
+def scatter_biomarkers(
+    conn: Connection,
+    X: np.ndarray,
+    row_index: Dict[str, int],
+    column_index: Dict[str, int],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    screened_since: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """Stream biomarker rows of screened samples into X; returns load statistics."""
+    b = _biomarkers.c
+    screened = _screened_samples(screened_since)
+    base = (
+        select(b.blood_sample_id, b.id, b.biomarker_name, b.value)
+        .where(b.is_deleted == False, b.blood_sample_id.in_(screened))
+        .order_by(b.blood_sample_id, b.id)
+        .limit(chunk_size)
+    )
+
+    name_columns: Dict[Optional[str], int] = {}
+    unmatched: Counter = Counter()
+    lab_rows = stored = chunks = 0
+    last_key = None
+    while True:
+        stmt = base if last_key is None else base.where(tuple_(b.blood_sample_id, b.id) > tuple_(*last_key))
+        rows = conn.execute(stmt).all()
+        if not rows:
+            break
+        last_key = (rows[-1][0], rows[-1][1])
+        chunks += 1
+        lab_rows += len(rows)
+
+        sample_ids, _, names, values = zip(*rows)
+        for name in set(names).difference(name_columns):
+            name_columns[name] = column_index.get(_normalize_name(name), -1)
+        rows_at = np.fromiter((row_index.get(s, -1) for s in sample_ids), dtype=np.int64, count=len(rows))
+        cols_at = np.fromiter((name_columns[n] for n in names), dtype=np.int64, count=len(rows))
+        values = np.array(values, dtype=np.float64)
+
+        unmatched.update(n for n, c in zip(names, cols_at) if c < 0)
+        keep = (rows_at >= 0) & (cols_at >= 0) & np.isfinite(values)
+        X[rows_at[keep], cols_at[keep]] = values[keep]
+        stored += int(keep.sum())
+
+    return {
+        "lab_rows": lab_rows,
+        "stored_values": stored,
+        "chunks": chunks,
+        "unmatched_biomarkers": dict(unmatched.most_common(50)),
+    }
+
+
+def build_blood_dataset(
+    bind: Union[str, Engine, Connection],
+    feature_names: Optional[Sequence[str]] = None,
+    label: str = "binary",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    out_dir: Optional[Union[str, Path]] = None,
+    screened_since: Optional[datetime] = None,
+) -> TrainingSnapshot:
+    """
+    Pivot screened blood samples into a wide float32 matrix.
+
+    Args:
+        bind: Synchronous SQLAlchemy URL, Engine or Connection
+        feature_names: Matrix columns (default BLOOD_FEATURES); missing values are NaN
+        label: One of LABEL_MODES
+        chunk_size: Biomarker rows fetched per query
+        out_dir: If given, X is written in place as a memory-mapped .npy
+            and the snapshot is saved there
+        screened_since: Only include samples with a screening recorded
+            after this time
+    """
+    started = time.perf_counter()
+    feature_names = list(feature_names or BLOOD_FEATURES)
+    column_index = {name: j for j, name in enumerate(feature_names)}
+
+    with ExitStack() as stack:
+        conn = _open(bind, stack)
+        # Read first, so screenings recorded during the build are picked up next time
+        watermark = screening_watermark(conn)
+        sample_ids, y = load_labels(conn, label, screened_since)
+        row_index = {sample_id: i for i, sample_id in enumerate(sample_ids)}
+
+        shape = (len(sample_ids), len(feature_names))
+        if out_dir is not None:
+            Path(out_dir).mkdir(parents=True, exist_ok=True)
+            X = np.lib.format.open_memmap(Path(out_dir) / "X.npy", mode="w+", dtype=np.float32, shape=shape)
+            X[:] = np.nan
+        else:
+            X = np.full(shape, np.nan, dtype=np.float32)
+
+        stats = scatter_biomarkers(conn, X, row_index, column_index, chunk_size, screened_since)
+
+    metadata = {
+        "label": label,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "screened_since": screened_since.isoformat() if screened_since else None,
+        "screened_through": watermark.isoformat() if watermark else None,
+        "build_seconds": round(time.perf_counter() - started, 3),
+        **stats,
+    }
+    snapshot = TrainingSnapshot(X, y, feature_names, np.array(sample_ids, dtype=str), metadata)
+    logger.info(
+        f"Built blood dataset: {shape[0]} samples x {shape[1]} features from "
+        f"{stats['lab_rows']} lab rows in {stats['chunks']} chunks"
+    )
+    if out_dir is not None:
+        snapshot.save(out_dir)
+    return snapshot
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build a blood biomarker training snapshot")
+    parser.add_argument("--database-url", required=True, help="Synchronous SQLAlchemy URL")
+    parser.add_argument("--out", required=True, help="Snapshot directory")
+    parser.add_argument("--label", choices=LABEL_MODES, default="binary")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    snapshot = build_blood_dataset(args.database_url, label=args.label, chunk_size=args.chunk_size, out_dir=args.out)
+    print(json.dumps({k: v for k, v in snapshot.metadata.items() if k != "unmatched_biomarkers"}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
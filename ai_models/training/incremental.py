@@ -0,0 +1,204 @@
+"""
+Incremental Training
+====================
+
+Folds new screening outcomes into an IncrementalCancerClassifier instead
+of retraining the ensemble from scratch. Each run:
+
+1. resumes from the newest incremental checkpoint in the model registry
+   (or starts a new model),
+2. builds a blood training snapshot of the samples screened since that
+   checkpoint's watermark (``build_blood_dataset(screened_since=...)``),
+3. streams the snapshot through ``partial_fit`` in mini-batches, and
+4. registers checkpoints: every ``checkpoint_seconds`` while training and
+   once at the end. Only the final checkpoint advances the watermark, so
+   a run that dies half way is repeated from the previous one.
+
+Meant to run hourly from cron::
+
+    python -m ai_models.training.incremental --database-url sqlite:///cancerguard.db --models-dir ai_models/saved_models
+
+The first run trains on every screened sample; a large first pass can be
+written to a memory-mapped snapshot with ``--snapshot-dir``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from sqlalchemy.engine import Connection, Engine
+
+from ai_models.models.cancer_classifier import IncrementalCancerClassifier
+from ai_models.models.registry import ModelRegistry
+from ai_models.training.datasets import (
+    DEFAULT_CHUNK_SIZE, LABEL_MODES, TrainingSnapshot, build_blood_dataset,
+)
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_KIND = "incremental"
+DEFAULT_CHECKPOINT_SECONDS = 600.0
+
+
+def iter_minibatches(
+    X: np.ndarray, y: np.ndarray, batch_size: int
+) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """Yield (stop row, X rows, y rows); memory-mapped X is read one batch at a time."""
+    for start in range(0, len(y), batch_size):
+        stop = min(start + batch_size, len(y))
+        yield stop, np.asarray(X[start:stop], dtype=float), y[start:stop]
+
+
+def snapshot_labels(snapshot: TrainingSnapshot) -> np.ndarray:
+    """Snapshot labels, mapping class codes to names when the snapshot stores them."""
+    classes = snapshot.metadata.get("classes")
+    if classes is not None:
+        return np.asarray(classes, dtype=object)[snapshot.y]
+    return snapshot.y
+
+
+def latest_checkpoint(registry: ModelRegistry) -> Optional[Dict[str, Any]]:
+    """Metadata of the newest incremental checkpoint that completed its increment."""
+    for record in reversed(registry.list_versions()):
+        extra = record.get("metadata", {})
+        if extra.get("kind") == CHECKPOINT_KIND and not extra.get("partial"):
+            return record
+    return None
+
+
+def train_on_snapshot(
+    model: IncrementalCancerClassifier,
+    snapshot: TrainingSnapshot,
+    registry: Optional[ModelRegistry] = None,
+    checkpoint_seconds: float = DEFAULT_CHECKPOINT_SECONDS,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> List[str]:
+    """
+    Stream a snapshot through ``partial_fit``, checkpointing periodically.
+
+    Rows whose label is not one of the model's classes are skipped (an
+    incremental model cannot add classes). Returns the registered
+    intermediate checkpoint versions.
+    """
+    y = snapshot_labels(snapshot)
+    if not model.is_fitted_ and model.classes is None:
+        # The first batch need not contain every class
+        model.classes = list(np.unique(y))
+    if model.is_fitted_:
+        known = np.isin(y, model.classes_)
+        if not known.all():
+            logger.warning(f"Skipping {int((~known).sum())} rows with labels outside {list(model.classes_)}")
+            X, y = snapshot.X[known], y[known]
+        else:
+            X = snapshot.X
+    else:
+        X = snapshot.X
+
+    versions = []
+    last_checkpoint = time.monotonic()
+    for stop, X_batch, y_batch in iter_minibatches(X, y, model.batch_size):
+        model.partial_fit(X_batch, y_batch, feature_names=snapshot.feature_names)
+        if registry is not None and stop < len(y) and time.monotonic() - last_checkpoint >= checkpoint_seconds:
+            versions.append(registry.register(
+                model,
+                metadata={**(metadata or {}), "kind": CHECKPOINT_KIND, "partial": True, "rows_consumed": stop},
+            ))
+            last_checkpoint = time.monotonic()
+    return versions
+
+
+def run_increment(
+    bind: Union[str, Engine, Connection],
+    registry: ModelRegistry,
+    label: str = "binary",
+    checkpoint_seconds: float = DEFAULT_CHECKPOINT_SECONDS,
+    batch_size: int = 4096,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    snapshot_dir: Optional[Union[str, Path]] = None,
+    activate: bool = False,
+) -> Dict[str, Any]:
+    """Fold the screenings recorded since the last checkpoint into the model."""
+    previous = latest_checkpoint(registry)
+    if previous is not None:
+        model, _ = registry.load(previous["version"])
+        watermark = previous["metadata"].get("screened_through")
+        screened_since = datetime.fromisoformat(watermark) if watermark else None
+        feature_names = model.feature_names_
+    else:
+        model = IncrementalCancerClassifier(
+            classes=[0, 1] if label == "binary" else None, batch_size=batch_size
+        )
+        screened_since = None
+        feature_names = None
+
+    snapshot = build_blood_dataset(
+        bind,
+        feature_names=feature_names,
+        label=label,
+        chunk_size=chunk_size,
+        out_dir=snapshot_dir,
+        screened_since=screened_since,
+    )
+    summary = {
+        "resumed_from": previous["version"] if previous else None,
+        "screened_since": snapshot.metadata["screened_since"],
+        "rows": int(len(snapshot.y)),
+        "version": None,
+    }
+    if not len(snapshot.y):
+        logger.info("No new screening outcomes since the last checkpoint")
+        return summary
+
+    metadata = {"label": label, "screened_since": snapshot.metadata["screened_since"]}
+    summary["intermediate_versions"] = train_on_snapshot(model, snapshot, registry, checkpoint_seconds, metadata)
+    summary["version"] = registry.register(
+        model,
+        metadata={
+            **metadata,
+            "kind": CHECKPOINT_KIND,
+            "resumed_from": summary["resumed_from"],
+            "screened_through": snapshot.metadata["screened_through"],
+            "rows": summary["rows"],
+        },
+        activate=activate,
+    )
+    summary["training_metrics"] = model.training_metrics_.get("sgd", {})
+    logger.info(f"Folded {summary['rows']} samples into {summary['version']}")
+    return summary
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fold new screening outcomes into the incremental model")
+    parser.add_argument("--database-url", required=True, help="Synchronous SQLAlchemy URL")
+    parser.add_argument("--models-dir", required=True, help="Model registry directory")
+    parser.add_argument("--label", choices=LABEL_MODES, default="binary")
+    parser.add_argument("--checkpoint-seconds", type=float, default=DEFAULT_CHECKPOINT_SECONDS)
+    parser.add_argument("--batch-size", type=int, default=4096, help="Rows per partial_fit call (new models)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--snapshot-dir", help="Write the snapshot as a memory-mapped .npy here")
+    parser.add_argument("--activate", action="store_true", help="Activate the final checkpoint")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    summary = run_increment(
+        args.database_url,
+        ModelRegistry(args.models_dir),
+        label=args.label,
+        checkpoint_seconds=args.checkpoint_seconds,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        snapshot_dir=args.snapshot_dir,
+        activate=args.activate,
+    )
+    print(json.dumps(summary, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
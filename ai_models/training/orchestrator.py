@@ -0,0 +1,388 @@
+"""
+Parallel Training Orchestrator
+==============================
+
+Fits independent base models concurrently in separate worker processes,
+each with its own time budget. A model that raises, crashes its worker or
+runs past its budget is reported as failed without affecting the others.
+
+Besides full fits, the orchestrator runs per-fold fits over one shared set
+of stratified folds. Their out-of-fold predictions feed both the stacking
+meta-learner and the cross-validation scores, so each model is trained
+once per fold instead of once for stacking and again for CV.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import traceback
+from dataclasses import dataclass, field
+from multiprocessing.connection import wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import sklearn
+from sklearn.base import BaseEstimator, clone
+from sklearn.preprocessing import LabelEncoder
+from sklearn.utils import Bunch
+
+logger = logging.getLogger(__name__)
+
+# assemble_stacking, the ensemble CV and the compiled stacking predictor use
+# StackingClassifier internals (_validate_estimators, _method_name,
+# _concatenate_predictions, _label_encoder) that are not public API. They
+# are checked against this scikit-learn minor release (backend/requirements.txt
+# pins 1.3.2); other releases fall back to public API.
+STACKING_INTERNALS_SKLEARN = (1, 3)
+
+
+def stacking_internals_supported() -> bool:
+    """Whether the installed scikit-learn has the StackingClassifier internals used here."""
+    major, minor = sklearn.__version__.split(".")[:2]
+    return (int(major), int(minor)) == STACKING_INTERNALS_SKLEARN
+
+
+@dataclass
+class TrainingTask:
+    """One model fit: on the full training set (fold=None) or on one CV fold."""
+    name: str
+    estimator: BaseEstimator
+    fold: Optional[int] = None
+    train_index: Optional[np.ndarray] = None
+    test_index: Optional[np.ndarray] = None
+
+
+@dataclass
+class TaskResult:
+    """Outcome of a TrainingTask."""
+    name: str
+    fold: Optional[int]
+    ok: bool
+    seconds: float = 0.0
+    error: Optional[str] = None
+    model: Optional[BaseEstimator] = None
+    # Full fits: predictions on the validation set
+    val_pred: Optional[np.ndarray] = None
+    val_proba: Optional[np.ndarray] = None
+    # Fold fits: predictions on the held-out fold
+    test_index: Optional[np.ndarray] = None
+    fold_pred: Optional[np.ndarray] = None
+    fold_proba: Optional[np.ndarray] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+# ============================================================================
+# Task execution (runs in the worker process, or inline)
+# ============================================================================
+
+def _limit_threads(estimator: BaseEstimator, n_jobs: Optional[int]) -> None:
+    """Cap the estimator's own parallelism so workers do not oversubscribe CPUs."""
+    if n_jobs is not None and "n_jobs" in estimator.get_params():
+        estimator.set_params(n_jobs=n_jobs)
+
+
+def _execute(task: TrainingTask, X: np.ndarray, y: np.ndarray,
+             X_val: Optional[np.ndarray], n_jobs: Optional[int]) -> TaskResult:
+    started = time.perf_counter()
+    estimator = clone(task.estimator)
+    _limit_threads(estimator, n_jobs)
+    has_proba = hasattr(estimator, "predict_proba")
+
+    if task.fold is None:
+        estimator.fit(X, y)
+        result = TaskResult(name=task.name, fold=None, ok=True, model=estimator)
+        if X_val is not None:
+            result.val_pred = estimator.predict(X_val)
+            result.val_proba = estimator.predict_proba(X_val) if has_proba else None
+    else:
+        estimator.fit(X[task.train_index], y[task.train_index])
+        X_test = X[task.test_index]
+        result = TaskResult(
+            name=task.name,
+            fold=task.fold,
+            ok=True,
+            test_index=task.test_index,
+            fold_pred=estimator.predict(X_test),
+            fold_proba=_full_class_proba(estimator, X_test, np.unique(y)) if has_proba else None,
+        )
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def _full_class_proba(estimator: BaseEstimator, X: np.ndarray, classes: np.ndarray) -> np.ndarray:
+    """predict_proba with one column per training class, even if a fold missed one."""
+    proba = estimator.predict_proba(X)
+    if len(estimator.classes_) == len(classes):
+        return proba
+    full = np.zeros((len(X), len(classes)), dtype=proba.dtype)
+    full[:, np.searchsorted(classes, estimator.classes_)] = proba
+    return full
+
+
+def _worker_loop(data_dir: str, n_jobs: Optional[int], conn) -> None:
+    """Worker process: load the training data once, then run tasks until told to stop."""
+    X = np.load(os.path.join(data_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(data_dir, "y.npy"))
+    val_path = os.path.join(data_dir, "X_val.npy")
+    X_val = np.load(val_path, mmap_mode="r") if os.path.exists(val_path) else None
+    conn.send(_READY)
+
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        try:
+            result = _execute(task, X, y, X_val, n_jobs)
+            if result.model is not None:
+                # Large fitted models go through a file rather than the pipe
+                model_path = os.path.join(data_dir, f"{task.name}-{os.getpid()}.pkl")
+                with open(model_path, "wb") as f:
+                    pickle.dump(result.model, f, protocol=pickle.HIGHEST_PROTOCOL)
+                result.model = None
+                result.extra["model_path"] = model_path
+        except Exception as e:
+            result = TaskResult(
+                name=task.name, fold=task.fold, ok=False,
+                error=f"{type(e).__name__}: {e}\n{traceback.format_exc()}",
+            )
+        conn.send(result)
+    conn.close()
+
+
+_READY = "ready"
+
+
+class _Worker:
+    """A long-lived training process and the task it is currently running."""
+
+    def __init__(self, ctx, data_dir: str, n_jobs: Optional[int]):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_loop, args=(data_dir, n_jobs, child_conn), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.task_index: Optional[int] = None
+        self.started = 0.0
+
+    @property
+    def busy(self) -> bool:
+        return self.task_index is not None
+
+    def assign(self, index: int, task: TrainingTask) -> None:
+        self.task_index = index
+        self.started = time.perf_counter()
+        self.conn.send(task)
+
+    def kill(self) -> None:
+        self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+    def close(self) -> None:
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+
+# ============================================================================
+# Orchestrator
+# ============================================================================
+
+class TrainingOrchestrator:
+    """
+    Run training tasks across worker processes with per-task time budgets.
+
+    With ``n_workers <= 1`` and no time budget the tasks run inline in the
+    calling process (failures are still isolated per task).
+    """
+
+    def __init__(self, n_workers: int = 1, time_budget: Optional[float] = None):
+        self.n_workers = max(1, int(n_workers))
+        self.time_budget = time_budget
+
+    @property
+    def uses_processes(self) -> bool:
+        return self.n_workers > 1 or self.time_budget is not None
+
+    def run(
+        self,
+        tasks: Sequence[TrainingTask],
+        X: np.ndarray,
+        y: np.ndarray,
+        X_val: Optional[np.ndarray] = None,
+    ) -> List[TaskResult]:
+        """Run all tasks; results come back in task order."""
+        if not self.uses_processes:
+            return [self._run_inline(task, X, y, X_val) for task in tasks]
+        return self._run_processes(list(tasks), X, y, X_val)
+
+    @staticmethod
+    def _run_inline(task, X, y, X_val) -> TaskResult:
+        started = time.perf_counter()
+        try:
+            return _execute(task, X, y, X_val, n_jobs=None)
+        except Exception as e:
+            return TaskResult(
+                name=task.name, fold=task.fold, ok=False,
+                seconds=time.perf_counter() - started, error=f"{type(e).__name__}: {e}",
+            )
+
+    def _run_processes(self, tasks, X, y, X_val) -> List[TaskResult]:
+        # Workers memory-map the training data instead of each receiving a copy
+        data_dir = tempfile.mkdtemp(prefix="cancer-training-")
+        np.save(os.path.join(data_dir, "X.npy"), np.ascontiguousarray(X))
+        np.save(os.path.join(data_dir, "y.npy"), np.asarray(y))
+        if X_val is not None:
+            np.save(os.path.join(data_dir, "X_val.npy"), np.ascontiguousarray(X_val))
+
+        n_workers = min(self.n_workers, len(tasks))
+        n_jobs = max(1, (os.cpu_count() or 1) // n_workers)
+        ctx = multiprocessing.get_context("spawn")
+        results: Dict[int, TaskResult] = {}
+        pending = list(enumerate(tasks))
+        failed_models = set()
+        workers = [_Worker(ctx, data_dir, n_jobs) for _ in range(n_workers)]
+
+        def fail(worker: _Worker, error: str) -> None:
+            task = tasks[worker.task_index]
+            results[worker.task_index] = TaskResult(
+                name=task.name, fold=task.fold, ok=False,
+                seconds=time.perf_counter() - worker.started, error=error,
+            )
+            failed_models.add(task.name)
+
+        try:
+            while pending or any(worker.busy for worker in workers):
+                # Skip remaining fits of a model that already failed
+                for index, task in [p for p in pending if p[1].name in failed_models]:
+                    pending.remove((index, task))
+                    results[index] = TaskResult(
+                        name=task.name, fold=task.fold, ok=False,
+                        error="skipped after an earlier failure of this model",
+                    )
+
+                for worker in workers:
+                    if pending and worker.ready and not worker.busy:
+                        worker.assign(*pending.pop(0))
+
+                timeout = None
+                if self.time_budget is not None and any(worker.busy for worker in workers):
+                    now = time.perf_counter()
+                    timeout = max(0.0, min(
+                        worker.started + self.time_budget - now for worker in workers if worker.busy
+                    ))
+
+                ready_conns = wait([worker.conn for worker in workers], timeout=timeout)
+                for i, worker in enumerate(workers):
+                    if worker.conn not in ready_conns:
+                        continue
+                    try:
+                        message = worker.conn.recv()
+                    except EOFError:
+                        if not worker.ready:
+                            raise RuntimeError("Training worker failed to start")
+                        if worker.busy:
+                            fail(worker, f"worker exited with code {worker.process.exitcode}")
+                        worker.kill()
+                        workers[i] = _Worker(ctx, data_dir, n_jobs)
+                        continue
+                    if message == _READY:
+                        worker.ready = True
+                        continue
+                    results[worker.task_index] = self._collect(message)
+                    if not message.ok:
+                        failed_models.add(message.name)
+                    worker.task_index = None
+
+                if self.time_budget is not None:
+                    now = time.perf_counter()
+                    for i, worker in enumerate(workers):
+                        if worker.busy and now - worker.started >= self.time_budget:
+                            fail(worker, f"exceeded time budget of {self.time_budget:.0f}s")
+                            worker.kill()
+                            workers[i] = _Worker(ctx, data_dir, n_jobs)
+        finally:
+            for worker in workers:
+                if worker.busy:
+                    worker.kill()
+                else:
+                    worker.close()
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+        return [results[i] for i in range(len(tasks))]
+
+    @staticmethod
+    def _collect(result: TaskResult) -> TaskResult:
+        model_path = result.extra.pop("model_path", None)
+        if model_path is not None:
+            with open(model_path, "rb") as f:
+                result.model = pickle.load(f)
+            os.remove(model_path)
+        return result
+
+
+# ============================================================================
+# Out-of-fold helpers
+# ============================================================================
+
+def out_of_fold_proba(fold_results: Sequence[TaskResult], n_samples: int) -> np.ndarray:
+    """Reassemble per-fold predict_proba outputs into sample order."""
+    n_classes = fold_results[0].fold_proba.shape[1]
+    oof = np.zeros((n_samples, n_classes), dtype=np.float64)
+    for result in fold_results:
+        oof[result.test_index] = result.fold_proba
+    return oof
+
+
+def assemble_stacking(stacking, fitted: Dict[str, BaseEstimator],
+                      oof_predictions: Dict[str, np.ndarray], X: np.ndarray, y: np.ndarray):
+    """
+    Turn an unfitted StackingClassifier into a fitted one from existing fits.
+
+    ``fitted`` holds each member fitted on the full training set and
+    ``oof_predictions`` its out-of-fold predict_proba, i.e. exactly what
+    ``StackingClassifier.fit`` would compute with its own ``cv`` splits.
+    Only the meta-learner is trained here. On a scikit-learn release whose
+    internals are unverified, the stacking is fitted from scratch instead.
+    """
+    if not stacking_internals_supported():
+        logger.warning(
+            f"scikit-learn {sklearn.__version__} is not "
+            f"{'.'.join(map(str, STACKING_INTERNALS_SKLEARN))}.x; fitting the stacking ensemble from scratch"
+        )
+        return stacking.fit(X, y)
+    if hasattr(stacking, "_validate_params"):
+        stacking._validate_params()
+    names, all_estimators = stacking._validate_estimators()
+    stacking._validate_final_estimator()
+
+    stacking._label_encoder = LabelEncoder().fit(y)
+    stacking.classes_ = stacking._label_encoder.classes_
+    y_encoded = stacking._label_encoder.transform(y)
+
+    stacking.estimators_ = [fitted[name] for name in names]
+    stacking.named_estimators_ = Bunch(**{name: fitted[name] for name in names})
+    stacking.stack_method_ = [
+        stacking._method_name(name, est, stacking.stack_method)
+        for name, est in zip(names, all_estimators)
+    ]
+    if any(method != "predict_proba" for method in stacking.stack_method_):
+        raise ValueError("Only stack_method='predict_proba' members can be assembled")
+
+    X_meta = stacking._concatenate_predictions(X, [oof_predictions[name] for name in names])
+    stacking.final_estimator_.fit(X_meta, y_encoded)
+    return stacking
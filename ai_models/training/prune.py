@@ -0,0 +1,96 @@
+"""
+Ensemble Pruning
+================
+
+Prunes a registered model's ensemble to a p99 latency budget and registers
+the result as a new version (see ``CancerRiskClassifier.select_members``).
+The selection rows come from a training snapshot the model was not trained
+on, e.g. one built with ``ai_models.training.datasets`` after the model's
+training date::
+
+    python -m ai_models.training.prune --models-dir ai_models/saved_models --snapshot holdout/ --budget-ms 5
+
+The new version's metadata records its parent, the selected members and
+the measured latency profile.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Union
+
+import pandas as pd
+
+from ai_models.models.member_selection import SELECTION_METRICS
+from ai_models.models.registry import ModelRegistry
+from ai_models.training.datasets import TrainingSnapshot
+from ai_models.training.incremental import snapshot_labels
+
+logger = logging.getLogger(__name__)
+
+PRUNED_KIND = "pruned"
+
+
+def prune_registered_model(
+    registry: ModelRegistry,
+    snapshot: Union[TrainingSnapshot, str, Path],
+    latency_budget_ms: float,
+    version: Optional[str] = None,
+    metric: str = "f1_weighted",
+    activate: bool = False,
+) -> Dict[str, Any]:
+    """Prune a version (the active one by default) and register the result."""
+    if not isinstance(snapshot, TrainingSnapshot):
+        snapshot = TrainingSnapshot.load(snapshot)
+    model, report = registry.load(version)
+    parent = report["version"]
+
+    X = pd.DataFrame(snapshot.X, columns=snapshot.feature_names)
+    profile = model.select_members(X, snapshot_labels(snapshot), latency_budget_ms, metric=metric)
+    new_version = registry.register(
+        model,
+        metadata={
+            "kind": PRUNED_KIND,
+            "parent_version": parent,
+            "latency_budget_ms": latency_budget_ms,
+            "members": profile["selected"],
+            "latency_profile": profile,
+        },
+        activate=activate,
+    )
+    return {
+        "parent_version": parent,
+        "version": new_version,
+        "selected": profile["selected"],
+        "ensemble": profile["ensemble"],
+        "all_members": profile["all_members"],
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Prune a registered ensemble to a latency budget")
+    parser.add_argument("--models-dir", required=True, help="Model registry directory")
+    parser.add_argument("--snapshot", required=True, help="Held-out training snapshot directory")
+    parser.add_argument("--budget-ms", type=float, required=True, help="p99 per-row latency budget")
+    parser.add_argument("--version", help="Version to prune (default: the active one)")
+    parser.add_argument("--metric", choices=SELECTION_METRICS, default="f1_weighted")
+    parser.add_argument("--activate", action="store_true", help="Activate the pruned version")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    summary = prune_registered_model(
+        ModelRegistry(args.models_dir),
+        args.snapshot,
+        args.budget_ms,
+        version=args.version,
+        metric=args.metric,
+        activate=args.activate,
+    )
+    print(json.dumps(summary, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Blood Imputation Benchmark
+==========================
+
+Compares the blood imputation strategies on synthetic cohorts of growing
+size. Each strategy is fitted the way FeaturePipeline fits it (fit_transform
+on the derived blood block of the training rows) and then scored on a
+held-out set:
+
+- nrmse: RMSE of the imputed entries, per column divided by the column's
+  standard deviation
+- fit_seconds / fit_peak_mb: wall time and peak traced allocations of the fit
+- model_mb: pickled size of the fitted imputer
+- batch_ms_per_1k: transform time for 1000 held-out rows
+- row_p50_ms / row_p95_ms: single-record transform latency
+
+KNNImputer's fit_transform is quadratic in the number of rows, so sizes
+above ``max_rows`` for a strategy are skipped and their fit time is
+extrapolated from the largest measured size.
+
+Usage::
+
+    python -m ai_models.utils.imputation_benchmark --sizes 10000 100000 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import pickle
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ai_models.data_preprocessing.imputation import IMPUTATION_STRATEGIES
+from ai_models.data_preprocessing.preprocessor import BiomarkerFeatureEngine, BloodBiomarkerPreprocessor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+# Largest training size each strategy is run at by default
+DEFAULT_MAX_ROWS = {"knn": 20_000}
+
+N_HOLDOUT = 1000
+N_LATENCY_ROWS = 200
+
+
+def synthetic_blood_panel(n_rows: int, random_state: int = 0) -> pd.DataFrame:
+    """
+    Raw blood measurements with a shared latent structure.
+
+    Values are driven by a few latent factors (plus noise) and placed
+    around each biomarker's reference range, so neighbouring patients carry
+    information about each other's missing values. Tumor markers are
+    log-normal.
+    """
+    rng = np.random.default_rng(random_state)
+    ranges = BloodBiomarkerPreprocessor.REFERENCE_RANGES
+    columns = list(ranges)
+    columns += [c for c in BloodBiomarkerPreprocessor.TUMOR_MARKERS if c not in ranges]
+    columns += BloodBiomarkerPreprocessor.DERIVATION_INPUTS
+
+    # Fixed loadings: cohorts drawn with different seeds share one structure
+    n_factors = 4
+    loadings = np.random.default_rng(1234).normal(0.0, 1.0, size=(n_factors, len(columns)))
+    loadings /= np.linalg.norm(loadings, axis=0)
+    latent = rng.standard_normal((n_rows, n_factors)).astype(np.float32)
+    z = latent @ loadings.astype(np.float32)
+    z += rng.standard_normal(z.shape, dtype=np.float32) * 0.4
+
+    data: Dict[str, np.ndarray] = {}
+    for j, col in enumerate(columns):
+        low, high = ranges.get(col, (0.0, 10.0))
+        if col in BloodBiomarkerPreprocessor.TUMOR_MARKERS:
+            data[col] = np.exp(np.log(max(high, 1.0) / 3.0) + 0.6 * z[:, j])
+        else:
+            data[col] = low + (high - low) * (0.5 + 0.25 * z[:, j])
+    data["total_protein"] = data["albumin"] + 2.5 + 0.3 * np.abs(z[:, 0])
+    return pd.DataFrame(data)
+
+
+def mask_values(df: pd.DataFrame, missing_rate: float, random_state: int = 0) -> pd.DataFrame:
+    """Blank out measurements completely at random."""
+    rng = np.random.default_rng(random_state)
+    values = df.to_numpy(dtype=float)
+    values[rng.random(values.shape) < missing_rate] = np.nan
+    return pd.DataFrame(values, columns=df.columns)
+
+
+def _nrmse(imputed: np.ndarray, truth: np.ndarray, missing: np.ndarray) -> float:
+    scored = missing & np.isfinite(truth)
+    std = np.nanstd(truth, axis=0)
+    std[~(std > 0)] = 1.0
+    errors = ((imputed - truth) / std)[scored]
+    return float(np.sqrt(np.mean(errors ** 2))) if errors.size else 0.0
+
+
+def benchmark_strategy(
+    strategy: str,
+    train_block: np.ndarray,
+    holdout_block: np.ndarray,
+    holdout_truth: np.ndarray,
+) -> Dict[str, Any]:
+    """Fit one strategy on the training block and score it on the hold-out."""
+    imputer = BloodBiomarkerPreprocessor(imputation=strategy).imputer
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    imputer.fit_transform(train_block)
+    fit_seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    imputed = imputer.transform(holdout_block)
+    batch_seconds = time.perf_counter() - start
+
+    incomplete = np.flatnonzero(np.isnan(holdout_block).any(axis=1))[:N_LATENCY_ROWS]
+    latencies = []
+    for i in incomplete:
+        start = time.perf_counter()
+        imputer.transform(holdout_block[i:i + 1])
+        latencies.append(time.perf_counter() - start)
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+
+    return {
+        "strategy": strategy,
+        "rows": len(train_block),
+        "nrmse": round(_nrmse(imputed, holdout_truth, np.isnan(holdout_block)), 4),
+        "fit_seconds": round(fit_seconds, 3),
+        "fit_peak_mb": round(peak / 1e6, 1),
+        "model_mb": round(len(pickle.dumps(imputer, protocol=5)) / 1e6, 2),
+        "batch_ms_per_1k": round(batch_seconds * 1000 * 1000 / len(holdout_block), 2),
+        "row_p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "row_p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+    }
+
+
+def run_benchmark(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    strategies: Sequence[str] = IMPUTATION_STRATEGIES,
+    missing_rate: float = 0.1,
+    max_rows: Optional[Dict[str, int]] = None,
+    random_state: int = 0,
+) -> List[Dict[str, Any]]:
+    """Benchmark every strategy at every training size."""
+    limits = dict(DEFAULT_MAX_ROWS)
+    limits.update(max_rows or {})
+    results: List[Dict[str, Any]] = []
+
+    holdout_raw = synthetic_blood_panel(N_HOLDOUT, random_state=random_state + 1)
+    # Every synthetic column is a blood measurement, so the engine output is
+    # the full blood block
+    engine = BiomarkerFeatureEngine(list(holdout_raw.columns))
+
+    def blood_block(df: pd.DataFrame) -> np.ndarray:
+        return engine.transform(df.to_numpy(dtype=float))
+
+    holdout_truth = blood_block(holdout_raw)
+    holdout_block = blood_block(mask_values(holdout_raw, missing_rate, random_state + 1))
+
+    for size in sizes:
+        train_raw = mask_values(synthetic_blood_panel(size, random_state), missing_rate, random_state)
+        train_block = blood_block(train_raw)
+        del train_raw
+
+        for strategy in strategies:
+            limit = limits.get(strategy)
+            if limit is not None and size > limit:
+                measured = [r for r in results if r["strategy"] == strategy and "fit_seconds" in r]
+                result: Dict[str, Any] = {"strategy": strategy, "rows": size, "skipped": f"above max_rows={limit}"}
+                if measured and strategy == "knn":
+                    largest = measured[-1]
+                    result["estimated_fit_seconds"] = round(
+                        largest["fit_seconds"] * (size / largest["rows"]) ** 2, 1
+                    )
+                results.append(result)
+                logger.info(f"Skipping {strategy} at {size} rows: {result['skipped']}")
+                continue
+
+            result = benchmark_strategy(strategy, train_block, holdout_block, holdout_truth)
+            results.append(result)
+            logger.info(f"{strategy} at {size} rows: {result}")
+
+    return results
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Render benchmark results as a plain-text table."""
+    columns = [
+        "strategy", "rows", "nrmse", "fit_seconds", "fit_peak_mb", "model_mb",
+        "batch_ms_per_1k", "row_p50_ms", "row_p95_ms",
+    ]
+    lines = ["  ".join(f"{c:>15}" for c in columns)]
+    for result in results:
+        if "skipped" in result:
+            note = result["skipped"]
+            if "estimated_fit_seconds" in result:
+                note += f", est. fit {result['estimated_fit_seconds']}s"
+            lines.append(f"{result['strategy']:>15}  {result['rows']:>15}  {note}")
+        else:
+            lines.append("  ".join(f"{result[c]!s:>15}" for c in columns))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark blood imputation strategies")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--strategies", nargs="+", default=list(IMPUTATION_STRATEGIES),
+                        choices=IMPUTATION_STRATEGIES)
+    parser.add_argument("--missing-rate", type=float, default=0.1)
+    parser.add_argument("--max-knn-rows", type=int, default=DEFAULT_MAX_ROWS["knn"])
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    results = run_benchmark(
+        sizes=args.sizes,
+        strategies=args.strategies,
+        missing_rate=args.missing_rate,
+        max_rows={"knn": args.max_knn_rows},
+    )
+    print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
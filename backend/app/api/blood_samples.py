@@ -5,14 +5,20 @@ from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import get_settings
 from app.database import get_db_session
 from app.models.blood_sample import BloodSample, BloodBiomarker
 from app.models.patient import Patient
+from app.models.user import User
 from app.schemas.blood_sample import (
     BloodSampleCreate, BloodSampleResponse, BiomarkerCreate,
     BiomarkerResponse, BloodAnalysisResult
 )
 from app.security import get_current_user_id, get_current_user_token, generate_record_number
+from app.services.feature_store import get_feature_vector
+from app.services.inference_service import (
+    DEFAULT_MODEL_VERSION, build_patient_features, get_inference_service
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/blood-samples", tags=["Blood Samples"])
@@ -148,6 +154,27 @@ async def analyze_blood_sample(
     if total > 0:
         risk_score = (abnormal / total) * 0.5 + (cancer_markers_elevated / max(total, 1)) * 0.5
     
+    # Blend in the trained ensemble when one is deployed
+    ml_result = None
+    ml_weight = get_settings().ai_model.blood_analysis_ml_weight
+    inference = get_inference_service()
+    if inference.is_ready and ml_weight > 0:
+        features = None
+        vector = await get_feature_vector(db, sample.patient_id)
+        if vector is not None and vector.latest_blood_sample_id == sample_id:
+            features = vector.feature_values
+        else:
+            # Not the patient's latest sample: score with this sample's biomarkers
+            patient_result = await db.execute(select(Patient).where(Patient.id == sample.patient_id))
+            patient = patient_result.scalar_one_or_none()
+            if patient:
+                user = await db.get(User, patient.user_id)
+                features = build_patient_features(patient, biomarkers, user)
+        if features is not None:
+            ml_result = await inference.score(features)
+            if ml_result:
+                risk_score = (1 - ml_weight) * risk_score + ml_weight * ml_result["risk_score"]
+    
     risk_category = "very_low"
     if risk_score >= 0.8:
         risk_category = "critical"
@@ -176,6 +203,6 @@ async def analyze_blood_sample(
         ai_recommendations=[
             "Regular monitoring recommended" if risk_category == "low" else "Consult oncologist immediately" if risk_category in ["high", "critical"] else "Follow-up in 3 months"
         ],
-        model_confidence=0.87,
-        model_version="1.0.0",
+        model_confidence=ml_result["confidence"] if ml_result else 0.87,
+        model_version=ml_result["model_version"] if ml_result else DEFAULT_MODEL_VERSION,
     )
@@ -1,7 +1,7 @@
 """Cancer Detection API"""
 from __future__ import annotations
 import logging
-import json
+import time
 from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select
@@ -9,12 +9,20 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db_session
 from app.models.patient import Patient
 from app.models.cancer_screening import (
-    CancerScreening, CancerRiskAssessment, CancerPrediction, ScreeningRecommendation
+    CancerScreening, CancerRiskAssessment, CancerPrediction, ScreeningRecommendation, BatchScoringJob
+)
+from app.schemas.smartwatch_data import (
+    BatchScoringJobResponse, BatchScoringRequest,
+    CancerRiskResponse, CancerScreeningCreate, CancerScreeningResponse,
+    RiskWhatIfRequest, RiskWhatIfResponse,
+)
+from app.security import get_current_user_id, get_current_user_token, generate_record_number, require_system_admin
+from app.services import batch_scoring
+from app.services.feature_store import get_feature_vector
+from app.services.inference_service import get_inference_service
+from app.services.risk_scoring import (
+    DEFAULT_ENGINE, assessment_values, load_patient_columns, recommendations_for, score_patient,
 )
-from app.models.blood_sample import BloodSample, BloodBiomarker
-from app.models.smartwatch_data import SmartwatchData
-from app.schemas.smartwatch_data import CancerRiskResponse, CancerScreeningCreate, CancerScreeningResponse
-from app.security import get_current_user_id, get_current_user_token, generate_record_number
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/cancer-detection", tags=["Cancer Detection"])
@@ -31,164 +39,177 @@ async def predict_cancer_risk(
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    # Gather data points for risk assessment
-    risk_factors = {}
-    base_risk = 0.05  # 5% baseline
-    
-    # Age factor
-    if patient.bmi:
-        if patient.bmi > 30:
-            base_risk += 0.05
-    
-    # Smoking
-    if patient.smoking_status in ["current_light", "current_moderate", "current_heavy"]:
-        pack_years = patient.get_pack_years() or 0
-        base_risk += min(0.15, pack_years * 0.005)
-        risk_factors["smoking"] = {"impact": "high", "pack_years": pack_years}
-    
-    # Alcohol
-    if patient.alcohol_consumption == "heavy":
-        base_risk += 0.08
-        risk_factors["alcohol"] = {"impact": "moderate"}
-    
-    # Family history
-    if patient.has_previous_cancer:
-        base_risk += 0.15
-        risk_factors["previous_cancer"] = {"impact": "very_high"}
-    
-    # Genetic markers
-    if patient.brca1_positive:
-        base_risk += 0.20
-        risk_factors["brca1"] = {"impact": "very_high"}
-    if patient.brca2_positive:
-        base_risk += 0.15
-        risk_factors["brca2"] = {"impact": "high"}
-    
-    # Medical conditions
-    if patient.has_diabetes:
-        base_risk += 0.03
-    if patient.has_obesity:
-        base_risk += 0.05
-    
-    # Get latest blood sample results
-    blood_result = await db.execute(
-        select(BloodSample).where(
-            BloodSample.patient_id == patient_id
-        ).order_by(BloodSample.collection_date.desc()).limit(1)
-    )
-    latest_blood = blood_result.scalar_one_or_none()
-    
-    blood_data_used = False
-    if latest_blood:
-        blood_data_used = True
-        if latest_blood.ai_cancer_risk_score:
-            base_risk = (base_risk + latest_blood.ai_cancer_risk_score) / 2
-    
-    # Get smartwatch anomalies
-    sw_result = await db.execute(
-        select(SmartwatchData).where(
-            SmartwatchData.patient_id == patient_id,
-            SmartwatchData.ai_anomaly_detected == True
-        ).limit(10)
-    )
-    anomalies = sw_result.scalars().all()
-    smartwatch_data_used = len(anomalies) > 0
-    if anomalies:
-        base_risk += 0.02 * len(anomalies)
-    
-    # Cap risk score
-    overall_risk = min(0.99, max(0.01, base_risk))
+    # Latest blood results, smartwatch anomalies and model features come
+    # from the patient's materialized feature vector
+    vector = await get_feature_vector(db, patient_id)
     
-    # Determine category
-    if overall_risk >= 0.8:
-        category = "critical"
-    elif overall_risk >= 0.6:
-        category = "very_high"
-    elif overall_risk >= 0.4:
-        category = "high"
-    elif overall_risk >= 0.2:
-        category = "moderate"
-    elif overall_risk >= 0.1:
-        category = "low"
-    else:
-        category = "very_low"
+    # Blend in the trained ensemble when one is deployed
+    ml_result = None
+    inference = get_inference_service()
+    if inference.is_ready:
+        ml_result = await inference.score(vector.feature_values)
     
-    # Cancer type risks
-    cancer_type_risks = {
-        "lung": overall_risk * (1.5 if patient.smoking_status and "current" in (patient.smoking_status or "") else 0.5),
-        "breast": overall_risk * (2.0 if patient.brca1_positive else 1.0),
-        "colorectal": overall_risk * 0.8,
-        "prostate": overall_risk * 0.7,
-        "skin": overall_risk * 0.6,
-        "liver": overall_risk * (1.3 if patient.has_liver_disease else 0.5),
-        "pancreatic": overall_risk * 0.4,
-    }
-    # Cap each at 0.99
-    cancer_type_risks = {k: min(0.99, v) for k, v in cancer_type_risks.items()}
+    scored = score_patient(patient, vector, ml_result)
+    assessed_at = datetime.now(timezone.utc)
     
     # Create risk assessment record
-    assessment = CancerRiskAssessment(
-        patient_id=patient_id,
-        health_id=patient.health_id,
-        assessment_number=generate_record_number("CRA"),
-        assessment_date=datetime.now(timezone.utc),
-        assessment_type="comprehensive_ai",
-        overall_risk_score=overall_risk,
-        overall_risk_category=category,
-        lung_cancer_risk=cancer_type_risks.get("lung"),
-        breast_cancer_risk=cancer_type_risks.get("breast"),
-        colorectal_cancer_risk=cancer_type_risks.get("colorectal"),
-        prostate_cancer_risk=cancer_type_risks.get("prostate"),
-        skin_cancer_risk=cancer_type_risks.get("skin"),
-        liver_cancer_risk=cancer_type_risks.get("liver"),
-        pancreatic_cancer_risk=cancer_type_risks.get("pancreatic"),
-        blood_data_used=blood_data_used,
-        smartwatch_data_used=smartwatch_data_used,
-        clinical_data_used=True,
-        family_history_used=True,
-        lifestyle_data_used=True,
-        top_risk_factors=json.dumps(list(risk_factors.keys())),
-        ai_model_name="CancerGuard Ensemble v1",
-        ai_model_version="1.0.0",
-        ai_confidence=0.87,
-    )
-    db.add(assessment)
+    db.add(CancerRiskAssessment(**assessment_values(patient, scored, assessed_at)))
     
     # Update patient risk
-    patient.cancer_risk_score = overall_risk
-    patient.overall_cancer_risk = category
-    patient.risk_assessment_date = datetime.now(timezone.utc)
-    
-    recommendations = []
-    if category in ["high", "very_high", "critical"]:
-        recommendations.append("Immediate consultation with oncologist recommended")
-        recommendations.append("Comprehensive cancer screening recommended within 2 weeks")
-    elif category == "moderate":
-        recommendations.append("Schedule cancer screening within 1 month")
-        recommendations.append("Regular blood tests every 3 months")
-    else:
-        recommendations.append("Continue regular health checkups")
-        recommendations.append("Annual cancer screening recommended")
+    patient.cancer_risk_score = scored.overall_risk
+    patient.overall_cancer_risk = scored.category
+    patient.risk_assessment_date = assessed_at
     
     return CancerRiskResponse(
         patient_id=patient_id,
         health_id=patient.health_id,
-        assessment_date=datetime.now(timezone.utc),
-        overall_risk_score=overall_risk,
-        overall_risk_category=category,
-        cancer_type_risks=cancer_type_risks,
-        top_risk_factors=[{"name": k, **v} for k, v in risk_factors.items()],
-        recommendations=recommendations,
+        assessment_date=assessed_at,
+        overall_risk_score=scored.overall_risk,
+        overall_risk_category=scored.category,
+        cancer_type_risks=scored.cancer_type_risks,
+        top_risk_factors=[{"name": k, **v} for k, v in scored.risk_factors.items()],
+        recommendations=recommendations_for(scored.category),
         data_sources_used={
-            "blood_samples": blood_data_used,
-            "smartwatch": smartwatch_data_used,
+            "blood_samples": scored.blood_data_used,
+            "smartwatch": scored.smartwatch_data_used,
             "clinical_data": True,
             "family_history": True,
             "lifestyle": True,
             "genetic": patient.genetic_testing_done,
         },
-        model_confidence=0.87,
-        model_version="1.0.0",
+        model_confidence=scored.model_confidence,
+        model_version=scored.model_version,
+    )
+
+
+@router.get("/inference/metrics")
+async def get_inference_metrics(token_data=Depends(get_current_user_token)):
+    """Get online inference metrics (queue depth, batch sizes, latency)."""
+    return get_inference_service().get_metrics()
+
+
+@router.get("/models")
+async def list_model_versions(token_data=Depends(get_current_user_token)):
+    """List registered model versions and the active/serving version."""
+    return get_inference_service().list_versions()
+
+
+@router.post("/models/{version}/activate")
+async def activate_model_version(version: str, token_data=Depends(require_system_admin)):
+    """Make a registered model version active and hot-swap it into serving."""
+    inference = get_inference_service()
+    if inference.registry is None:
+        raise HTTPException(status_code=503, detail="Model registry not available")
+    previous_version = inference.registry.active_version
+    try:
+        inference.registry.activate(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model version {version} not found")
+
+    try:
+        report = await inference.activate_version(version)
+    except Exception as e:
+        logger.error(f"Model activation failed for {version}: {e}")
+        # Point the other workers back at the version that still loads
+        if previous_version is not None:
+            inference.registry.activate(previous_version)
+        raise HTTPException(status_code=500, detail=f"Failed to load model version {version}")
+
+    return {"message": f"Model version {version} activated", "load_report": report}
+
+
+@router.post("/batch-scoring", response_model=BatchScoringJobResponse, status_code=202)
+async def create_batch_scoring_job(
+    request: BatchScoringRequest,
+    user_id: str = Depends(get_current_user_id),
+    token_data=Depends(require_system_admin),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """Re-score a cohort (patient list and/or filters) in a background job."""
+    job = await batch_scoring.create_job(
+        db,
+        request.model_dump(exclude={"page_size"}),
+        page_size=request.page_size,
+        requested_by=user_id,
+    )
+    # The job reads its own row, so it must be committed before starting
+    await db.commit()
+    batch_scoring.start_job(job.id)
+    return BatchScoringJobResponse.from_job(job)
+
+
+@router.get("/batch-scoring", response_model=list[BatchScoringJobResponse])
+async def list_batch_scoring_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    token_data=Depends(require_system_admin),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """List recent batch scoring jobs."""
+    result = await db.execute(
+        select(BatchScoringJob).order_by(BatchScoringJob.created_at.desc()).limit(limit)
+    )
+    return [BatchScoringJobResponse.from_job(job) for job in result.scalars()]
+
+
+@router.get("/batch-scoring/{job_id}", response_model=BatchScoringJobResponse)
+async def get_batch_scoring_job(
+    job_id: str,
+    token_data=Depends(require_system_admin),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """Get a batch scoring job's progress and throughput."""
+    job = await db.get(BatchScoringJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch scoring job not found")
+    return BatchScoringJobResponse.from_job(job)
+
+
+@router.post("/batch-scoring/{job_id}/cancel", response_model=BatchScoringJobResponse)
+async def cancel_batch_scoring_job(
+    job_id: str,
+    token_data=Depends(require_system_admin),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """Stop a batch scoring job after the page it is scoring."""
+    job = await db.get(BatchScoringJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch scoring job not found")
+    await batch_scoring.cancel_job(db, job)
+    return BatchScoringJobResponse.from_job(job)
+
+
+@router.get("/risk-engine/rules")
+async def get_risk_rules(token_data=Depends(get_current_user_token)):
+    """The rule table behind rule-based risk scoring."""
+    return DEFAULT_ENGINE.describe()
+
+
+@router.post("/risk-engine/what-if", response_model=RiskWhatIfResponse)
+async def risk_what_if(
+    request: RiskWhatIfRequest,
+    token_data=Depends(require_system_admin),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """Re-score the patient table with changed rule weights, without storing anything."""
+    try:
+        engine = DEFAULT_ENGINE.with_weights(
+            request.weights, request.cancer_type_multipliers, request.ml_weight
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    started = time.perf_counter()
+    patient_ids, columns = await load_patient_columns(db, hospital_id=request.hospital_id)
+    baseline = DEFAULT_ENGINE.score(columns)
+    what_if = engine.score(columns)
+    return RiskWhatIfResponse(
+        patients=len(patient_ids),
+        baseline_category_counts=baseline.category_counts(),
+        what_if_category_counts=what_if.category_counts(),
+        changed_category=int((baseline.category != what_if.category).sum()),
+        baseline_mean_risk=float(baseline.overall_risk.mean()) if patient_ids else 0.0,
+        what_if_mean_risk=float(what_if.overall_risk.mean()) if patient_ids else 0.0,
+        seconds=time.perf_counter() - started,
     )
 
 
@@ -1,15 +1,23 @@
 """Smartwatch API"""
 from __future__ import annotations
+import json
 import logging
-from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db_session
 from app.models.smartwatch_data import SmartwatchData, SmartwatchDevice
 from app.models.patient import Patient
-from app.schemas.smartwatch_data import SmartwatchDataCreate, SmartwatchDataResponse, SmartwatchDashboard
+from app.schemas.smartwatch_data import (
+    SmartwatchDataCreate, SmartwatchDataResponse, SmartwatchDashboard, SmartwatchFeatureVector,
+    SmartwatchIngestResult, SmartwatchSeries, SmartwatchSeriesPoint,
+)
 from app.security import get_current_user_id, get_current_user_token
+from app.services.smartwatch_features import FEATURE_WINDOWS, get_feature_state, get_features, record_reading
+from app.services.smartwatch_ingest import SmartwatchIngestor, insert_readings
+from app.services.smartwatch_rollups import get_series
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/smartwatch", tags=["Smartwatch"])
@@ -52,26 +60,98 @@ async def ingest_smartwatch_data(
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    smartwatch_entry = SmartwatchData(
-        patient_id=patient.id,
-        device_id=data.device_id,
-        timestamp=data.timestamp,
-        period_start=data.timestamp,
-        period_end=data.timestamp,
-        period_type="minute",
-        heart_rate_avg=data.heart_rate_avg,
-        heart_rate_min=data.heart_rate_min,
-        heart_rate_max=data.heart_rate_max,
-        spo2_avg=data.spo2_avg,
-        steps=data.steps,
-        calories_burned=data.calories_burned,
-        sleep_duration_minutes=data.sleep_duration_minutes,
-        stress_level=data.stress_level,
-        skin_temperature=data.skin_temperature,
+    # Unregistered devices are still accepted, but not another patient's device
+    owner_result = await db.execute(
+        select(SmartwatchDevice.patient_id).where(SmartwatchDevice.device_id == data.device_id)
     )
-    db.add(smartwatch_entry)
+    owner_id = owner_result.scalar_one_or_none()
+    if owner_id is not None and owner_id != patient.id:
+        raise HTTPException(status_code=403, detail="Device is registered to another patient")
+    
+    # A reading the device already sent is skipped, not stored twice
+    if not await insert_readings(db, patient.id, data.device_id, [data]):
+        return {"success": True, "message": "Duplicate reading ignored"}
+    await record_reading(db, patient.id, data)
     return {"success": True, "message": "Data ingested"}
 
+@router.post("/devices/{device_id}/data", response_model=SmartwatchIngestResult)
+async def ingest_smartwatch_batch(
+    device_id: str,
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """
+    Bulk-ingest one device's samples.
+    
+    The body is a JSON array of samples, or NDJSON (one sample per line,
+    Content-Type application/x-ndjson) that is processed as it streams in.
+    Invalid samples are rejected individually and reported, and samples
+    already stored are skipped. Send an Idempotency-Key header to make
+    retries of the same upload return the first result unchanged.
+    """
+    result = await db.execute(select(Patient).where(Patient.user_id == user_id))
+    patient = result.scalar_one_or_none()
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    device_result = await db.execute(
+        select(SmartwatchDevice).where(
+            SmartwatchDevice.device_id == device_id,
+            SmartwatchDevice.patient_id == patient.id,
+        )
+    )
+    device = device_result.scalar_one_or_none()
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not registered")
+    
+    idempotency_key = request.headers.get("idempotency-key")
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= 128:
+        raise HTTPException(status_code=422, detail="Idempotency-Key must be 1-128 characters")
+    ingestor = SmartwatchIngestor(db, patient.id, device, idempotency_key=idempotency_key)
+    previous = await ingestor.claim()
+    if previous is not None:
+        return previous
+    
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        await ingestor.add_ndjson(request.stream())
+    else:
+        try:
+            items = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Body must be a JSON array of samples")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=422, detail="Body must be a JSON array of samples")
+        await ingestor.add_items(items)
+    return await ingestor.finish()
+
+@router.get("/features", response_model=SmartwatchFeatureVector)
+async def get_smartwatch_features(
+    window_days: Optional[int] = Query(None, description=f"One of {FEATURE_WINDOWS}; all time if omitted"),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """Get the current smartwatch feature vector from the running statistics."""
+    if window_days is not None and window_days not in FEATURE_WINDOWS:
+        raise HTTPException(status_code=422, detail=f"window_days must be one of {list(FEATURE_WINDOWS)}")
+    result = await db.execute(select(Patient).where(Patient.user_id == user_id))
+    patient = result.scalar_one_or_none()
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    row = await get_feature_state(db, patient.id)
+    if row is None:
+        return SmartwatchFeatureVector(patient_id=patient.id, window_days=window_days)
+    
+    return SmartwatchFeatureVector(
+        patient_id=patient.id,
+        window_days=window_days,
+        reading_count=row.reading_count,
+        last_reading_at=row.last_reading_at,
+        features=await get_features(db, row, window_days, as_of=datetime.now(timezone.utc).date()),
+    )
+
 @router.get("/data", response_model=list[SmartwatchDataResponse])
 async def get_smartwatch_data(
     days: int = Query(7, ge=1, le=90),
@@ -85,13 +165,46 @@ async def get_smartwatch_data(
         raise HTTPException(status_code=404, detail="Patient not found")
     
     query = select(SmartwatchData).where(
-        SmartwatchData.patient_id == patient.id
+        SmartwatchData.patient_id == patient.id,
+        SmartwatchData.is_rollup == False,
     ).order_by(SmartwatchData.timestamp.desc()).limit(100)
     
     data_result = await db.execute(query)
     data = data_result.scalars().all()
     return [SmartwatchDataResponse.model_validate(d) for d in data]
 
+@router.get("/series", response_model=SmartwatchSeries)
+async def get_smartwatch_series(
+    start: Optional[datetime] = Query(None, description="Defaults to 7 days before end"),
+    end: Optional[datetime] = Query(None, description="Defaults to now"),
+    resolution_minutes: Optional[int] = Query(
+        None, ge=1, description="Desired spacing between points; the coarsest stored grain that meets it is served"
+    ),
+    user_id: str = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """Get smartwatch readings over a time range, from minute rows or hour/day rollups."""
+    result = await db.execute(select(Patient).where(Patient.user_id == user_id))
+    patient = result.scalar_one_or_none()
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=7)
+    resolution = timedelta(minutes=resolution_minutes) if resolution_minutes else None
+    try:
+        period_type, rows = await get_series(db, patient.id, start, end, resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    return SmartwatchSeries(
+        patient_id=patient.id,
+        period_type=period_type,
+        start=start,
+        end=end,
+        points=[SmartwatchSeriesPoint.model_validate(row) for row in rows],
+    )
+
 @router.post("/devices/register", status_code=201)
 async def register_device(
     device_id: str,
@@ -202,6 +202,41 @@ class AIModelSettings(BaseSettings):
     )
     ensemble_voting: str = Field(default="soft", description="Ensemble voting method")
     
+    # Online Inference
+    active_model_file: str = Field(
+        default="cancer_classifier.pkl",
+        description="Unversioned model file (inside models_dir) served when the registry has no active version"
+    )
+    inference_max_batch_size: int = Field(default=64, description="Max rows per micro-batch")
+    inference_max_wait_ms: float = Field(default=5.0, description="Max time to wait while filling a micro-batch")
+    inference_workers: int = Field(
+        default=2, description="Model worker processes (0 runs inference on the event loop)"
+    )
+    inference_max_pending: int = Field(default=256, description="Max outstanding calls to the worker pool")
+    prediction_cache_size: int = Field(
+        default=10000, description="Max rows of cached model outputs, keyed by feature vector and version (0 disables)"
+    )
+    model_watch_interval_seconds: float = Field(
+        default=30.0, description="How often workers check the registry for a new active version (0 disables)"
+    )
+    feature_store_refresh_interval_seconds: float = Field(
+        default=5.0, description="How often pending feature-store refreshes are drained (0 leaves them to the next read)"
+    )
+    smartwatch_rollup_interval_seconds: float = Field(
+        default=10.0, description="How often stale smartwatch hour/day rollups are rebuilt (0 leaves them to the next read)"
+    )
+    batch_scoring_heartbeat_seconds: float = Field(
+        default=30.0, gt=0, description="How often a worker refreshes the heartbeat of a batch scoring job it runs"
+    )
+    batch_scoring_stale_seconds: float = Field(
+        default=300.0, gt=0,
+        description="A running batch scoring job whose heartbeat is older than this lost its worker and is resumed at startup (keep well above the heartbeat interval)"
+    )
+    blood_analysis_ml_weight: float = Field(
+        default=0.5, ge=0.0, le=1.0,
+        description="Weight of the model's risk score where it is blended with rule scores (blood sample analysis, and the default of the cancer risk engine's ml_weight); 0 disables the model"
+    )
+    
     # Cancer Detection Thresholds
     cancer_risk_low_threshold: float = Field(default=0.3, description="Low risk threshold")
     cancer_risk_medium_threshold: float = Field(default=0.6, description="Medium risk threshold")
@@ -21,12 +21,15 @@ from sqlalchemy import (
     String,
     Boolean,
     Integer,
+    Table,
     Text,
     Float,
+    Index,
     event,
     inspect,
     text,
 )
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -253,10 +256,68 @@ async def get_db_context() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+def dialect_insert(db: AsyncSession, table: Table):
+    """INSERT for the session's database, with its ON CONFLICT clauses."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"ON CONFLICT inserts are not supported on {dialect}")
+
+
 # ============================================================================
 # Database Lifecycle Management
 # ============================================================================
 
+# Columns added to tables that already existed. create_all only creates
+# missing tables, so init_db adds these (and any missing indexes of the
+# listed tables) to databases created before them. Rows that would break a
+# new unique index are removed first.
+SCHEMA_UPGRADES = {
+    "smartwatch_data": {
+        "is_rollup": "BOOLEAN NOT NULL DEFAULT FALSE",
+        "sample_count": "INTEGER",
+        "anomaly_count": "INTEGER",
+    },
+}
+
+
+def _upgrade_schema(connection) -> None:
+    """Apply SCHEMA_UPGRADES to an existing database; a no-op when up to date."""
+    inspector = inspect(connection)
+    for table_name, columns in SCHEMA_UPGRADES.items():
+        if not inspector.has_table(table_name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        for name, ddl_type in columns.items():
+            if name not in existing:
+                connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {ddl_type}"))
+                logger.info(f"Added column {table_name}.{name}")
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table_name)}
+        for index in Base.metadata.tables[table_name].indexes:
+            if index.name in existing_indexes:
+                continue
+            if index.unique:
+                _drop_duplicates(connection, index)
+            index.create(connection)
+
+
+def _drop_duplicates(connection, index: Index) -> None:
+    """Delete rows repeating an earlier row's ``index`` columns, keeping the lowest id."""
+    table_name = index.table.name
+    columns = ", ".join(column.name for column in index.columns)
+    result = connection.execute(text(
+        f"DELETE FROM {table_name} WHERE id NOT IN "
+        f"(SELECT MIN(id) FROM {table_name} GROUP BY {columns})"
+    ))
+    if result.rowcount:
+        logger.warning(
+            f"Removed {result.rowcount} duplicate rows from {table_name} "
+            f"before creating unique index {index.name}"
+        )
+
+
 async def init_db() -> None:
     """Initialize the database by creating all tables."""
     engine = get_engine()
@@ -283,6 +344,7 @@ async def init_db() -> None:
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_schema)
     
     logger.info("Database tables created successfully")
 
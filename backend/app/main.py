@@ -8,6 +8,7 @@ middleware, and startup/shutdown lifecycle management.
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import time
 from contextlib import asynccontextmanager
@@ -22,6 +23,10 @@ from fastapi.responses import FileResponse, JSONResponse
 from app.config import get_settings, BASE_DIR, PROJECT_DIR
 from app.database import init_db, close_db, check_db_health, get_db_context
 from app.services.seed_service import SeedService
+from app.services.inference_service import get_inference_service
+from app.services.feature_store import run_outbox_worker
+from app.services.smartwatch_rollups import run_rollup_worker
+from app.services.batch_scoring import resume_jobs, stop_running_jobs
 
 logger = logging.getLogger(__name__)
 
@@ -55,11 +60,46 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.warning(f"Seed data error (non-critical): {e}")
     
+    # Start AI inference service
+    await get_inference_service().start()
+    
+    # Pick up batch scoring jobs interrupted by the last shutdown
+    try:
+        await resume_jobs()
+    except Exception as e:
+        logger.warning(f"Resuming batch scoring jobs failed: {e}")
+    
+    # Keep materialized patient feature vectors fresh
+    feature_store_worker = None
+    refresh_interval = settings.ai_model.feature_store_refresh_interval_seconds
+    if refresh_interval > 0:
+        feature_store_worker = asyncio.create_task(
+            run_outbox_worker(refresh_interval), name="feature-store-refresh"
+        )
+    
+    # Keep smartwatch hour/day rollups current
+    rollup_worker = None
+    rollup_interval = settings.ai_model.smartwatch_rollup_interval_seconds
+    if rollup_interval > 0:
+        rollup_worker = asyncio.create_task(
+            run_rollup_worker(rollup_interval), name="smartwatch-rollups"
+        )
+    
     logger.info(f"{settings.app_name} started successfully!")
     
     yield
     
     # Shutdown
+    for worker in (feature_store_worker, rollup_worker):
+        if worker is None:
+            continue
+        worker.cancel()
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+    await stop_running_jobs()
+    await get_inference_service().stop()
     await close_db()
     logger.info(f"{settings.app_name} shutdown complete")
 
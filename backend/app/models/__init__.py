@@ -11,15 +11,17 @@ from app.models.hospital import Hospital, HospitalDepartment, HospitalStaff, Doc
 from app.models.health_record import HealthRecord, HealthRecordType, HealthRecordCategory
 from app.models.blood_sample import BloodSample, BloodBiomarker, BloodTestType, BloodTestResult
 from app.models.smartwatch_data import (
-    SmartwatchData, SmartwatchDevice, HeartRateData, 
-    SpO2Data, SleepData, ActivityData, ECGData, StressData,
+    SmartwatchData, SmartwatchDevice, SmartwatchFeatureState, SmartwatchFeatureStats,
+    SmartwatchIngestBatch, SmartwatchRollupOutbox, HeartRateData, SpO2Data, SleepData, ActivityData, ECGData, StressData,
     TemperatureData, BloodPressureEstimate
 )
+from app.models.feature_store import PatientFeatureVector, FeatureStoreOutbox
 from app.models.medication import Medication, Prescription, MedicationSchedule, MedicationAdherence
 from app.models.appointment import Appointment, AppointmentStatus, AppointmentType
 from app.models.cancer_screening import (
     CancerScreening, CancerType, CancerRiskAssessment, 
-    CancerPrediction, ScreeningRecommendation, TumorMarker
+    CancerPrediction, ScreeningRecommendation, TumorMarker,
+    BatchScoringJob, BatchScoringStatus,
 )
 from app.models.notification import Notification, NotificationType, NotificationPriority
 from app.models.audit_log import AuditLog, AuditAction
@@ -142,13 +144,17 @@ __all__ = [
     "Hospital", "HospitalDepartment", "HospitalStaff", "Doctor",
     "HealthRecord", "HealthRecordType", "HealthRecordCategory",
     "BloodSample", "BloodBiomarker", "BloodTestType", "BloodTestResult",
-    "SmartwatchData", "SmartwatchDevice", "HeartRateData", "SpO2Data",
+    "SmartwatchData", "SmartwatchDevice", "SmartwatchFeatureState", "SmartwatchFeatureStats",
+    "SmartwatchIngestBatch", "SmartwatchRollupOutbox",
+    "HeartRateData", "SpO2Data",
     "SleepData", "ActivityData", "ECGData", "StressData",
     "TemperatureData", "BloodPressureEstimate",
+    "PatientFeatureVector", "FeatureStoreOutbox",
     "Medication", "Prescription", "MedicationSchedule", "MedicationAdherence",
     "Appointment", "AppointmentStatus", "AppointmentType",
     "CancerScreening", "CancerType", "CancerRiskAssessment",
     "CancerPrediction", "ScreeningRecommendation", "TumorMarker",
+    "BatchScoringJob", "BatchScoringStatus",
     "Notification", "NotificationType", "NotificationPriority",
     "AuditLog", "AuditAction",
     "VitalSigns", "VitalSignType", "VitalSignAlert",
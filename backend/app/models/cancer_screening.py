@@ -6,8 +6,9 @@ Cancer Screening Model - Cancer Detection & Risk Assessment
 from __future__ import annotations
 
 import enum
+import json
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from sqlalchemy import (
     String, Boolean, Integer, DateTime, Text, Float,
@@ -424,3 +425,47 @@ class TumorMarker(Base):
     __table_args__ = (
         Index("ix_tumor_marker_patient", "patient_id", "marker_name", "test_date"),
     )
+
+
+class BatchScoringStatus(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    CANCELLING = "cancelling"
+    CANCELLED = "cancelled"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class BatchScoringJob(Base):
+    """A cohort risk re-scoring run (see app.services.batch_scoring)."""
+    
+    __tablename__ = "batch_scoring_jobs"
+    
+    status: Mapped[str] = mapped_column(
+        String(20), default=BatchScoringStatus.PENDING.value, nullable=False, index=True
+    )
+    requested_by: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+    
+    # Cohort selection
+    filters: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON
+    page_size: Mapped[int] = mapped_column(Integer, default=1000)
+    
+    # Progress; cursor is the last patient id scored (keyset position)
+    total_patients: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    processed_patients: Mapped[int] = mapped_column(Integer, default=0)
+    model_scored_patients: Mapped[int] = mapped_column(Integer, default=0)
+    cursor: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+    model_version: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    
+    # Timing
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    rows_per_second: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    # Refreshed by the worker running the job; a stale heartbeat means it died
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    
+    @property
+    def filter_values(self) -> Dict[str, Any]:
+        return json.loads(self.filters) if self.filters else {}
@@ -0,0 +1,61 @@
+"""
+Feature Store Models - Materialized Patient Feature Vectors
+==========================================================
+
+Current scoring inputs per patient, kept up to date through an outbox that
+is written in the same transaction as the change that invalidates them.
+See app.services.feature_store.
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import String, Integer, DateTime, Text, Float, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class PatientFeatureVector(Base):
+    """Wide feature vector for one patient under one feature-schema version."""
+
+    __tablename__ = "patient_feature_vectors"
+
+    patient_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("patient.id", ondelete="CASCADE"),
+        nullable=False, index=True
+    )
+    schema_version: Mapped[str] = mapped_column(String(20), nullable=False)
+    computed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    # Model inputs (encoded profile + latest biomarker values)
+    features: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON
+
+    # Rule-based scoring inputs
+    latest_blood_sample_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+    latest_blood_risk_score: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    smartwatch_anomaly_count: Mapped[int] = mapped_column(Integer, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("patient_id", "schema_version", name="uq_feature_vector_patient_version"),
+    )
+
+    @property
+    def feature_values(self) -> Dict[str, float]:
+        return json.loads(self.features) if self.features else {}
+
+
+class FeatureStoreOutbox(Base):
+    """A committed change that invalidates a patient's feature vectors."""
+
+    __tablename__ = "feature_store_outbox"
+
+    patient_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    source: Mapped[str] = mapped_column(String(50), nullable=False)
+
+    __table_args__ = (
+        Index("ix_feature_outbox_patient", "patient_id"),
+    )
@@ -15,7 +15,7 @@ from typing import List, Optional
 
 from sqlalchemy import (
     String, Boolean, Integer, DateTime, Text, Float,
-    ForeignKey, Index, UniqueConstraint
+    ForeignKey, Index, UniqueConstraint, false
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -144,6 +144,14 @@ class SmartwatchDevice(Base, AuditMixin):
 # Smartwatch Data (Aggregated)
 # ============================================================================
 
+# Period types of the rollups derived from minute readings
+ROLLUP_PERIOD_TYPES = ("hour", "day")
+
+# Columns of the unique reading index, the conflict target of ingestion and
+# of rollup upserts. is_rollup keeps a computed rollup and a device-supplied
+# summary of the same bucket apart.
+READING_KEY = ("patient_id", "device_id", "period_type", "timestamp", "is_rollup")
+
 class SmartwatchData(Base):
     """
     Aggregated smartwatch data for a time period.
@@ -168,6 +176,14 @@ class SmartwatchData(Base):
     period_end: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     period_type: Mapped[str] = mapped_column(String(20), nullable=False)  # minute, hour, day
     
+    # Rollups (hour/day rows aggregated from minute rows; see app.services.smartwatch_rollups).
+    # Hour/day summaries uploaded by a device or seeded are not rollups.
+    is_rollup: Mapped[bool] = mapped_column(
+        Boolean, default=False, server_default=false(), nullable=False
+    )
+    sample_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    anomaly_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    
     # Heart Rate
     heart_rate_avg: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     heart_rate_min: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
@@ -242,6 +258,104 @@ class SmartwatchData(Base):
         Index("ix_smartwatch_device_time", "device_id", "timestamp"),
         Index("ix_smartwatch_anomaly", "ai_anomaly_detected", "timestamp"),
         Index("ix_smartwatch_alert", "alert_generated", "alert_level"),
+        # One reading per patient, device, granularity and instant; ingestion
+        # skips repeats. A unique index (not a constraint) so init_db can add
+        # it to existing tables.
+        Index("uq_smartwatch_patient_reading", *READING_KEY, unique=True),
+        Index("ix_smartwatch_patient_period", "patient_id", "period_type", "timestamp"),
+    )
+
+
+class SmartwatchRollupOutbox(Base):
+    """A UTC day of a device's readings whose hour and day rollups are stale."""
+    
+    __tablename__ = "smartwatch_rollup_outbox"
+    
+    patient_id: Mapped[str] = mapped_column(String(36), nullable=False, index=True)
+    device_id: Mapped[str] = mapped_column(String(100), nullable=False)
+    day: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    
+    __table_args__ = (
+        Index("ix_smartwatch_rollup_outbox_device_day", "device_id", "day"),
+    )
+
+
+# ============================================================================
+# Smartwatch Feature State (Streaming)
+# ============================================================================
+
+class SmartwatchFeatureState(Base):
+    """
+    Streaming smartwatch feature bookkeeping for one patient; the running
+    statistics are its SmartwatchFeatureStats rows. Updated on every
+    ingested reading; see app.services.smartwatch_features.
+    """
+    
+    __tablename__ = "smartwatch_feature_state"
+    
+    patient_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("patient.id", ondelete="CASCADE"),
+        nullable=False, unique=True, index=True
+    )
+    reading_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_reading_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_day: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # UTC date ordinal
+    recent_heart_rates: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON, variability window
+
+
+class SmartwatchFeatureStats(Base):
+    """
+    Running statistics of one smartwatch metric for one patient, over all
+    time (``day`` 0) or one UTC day (``day`` is the date ordinal).
+    """
+    
+    __tablename__ = "smartwatch_feature_stats"
+    
+    patient_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("patient.id", ondelete="CASCADE"), nullable=False
+    )
+    metric: Mapped[str] = mapped_column(String(50), nullable=False)
+    day: Mapped[int] = mapped_column(Integer, nullable=False)
+    
+    # Welford moments, extremes, threshold count and trend regression sums
+    n: Mapped[int] = mapped_column(Integer, default=0)
+    mean: Mapped[float] = mapped_column(Float, default=0.0)
+    m2: Mapped[float] = mapped_column(Float, default=0.0)
+    min: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    max: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    flagged: Mapped[int] = mapped_column(Integer, default=0)
+    sx: Mapped[float] = mapped_column(Float, default=0.0)
+    sxx: Mapped[float] = mapped_column(Float, default=0.0)
+    sxy: Mapped[float] = mapped_column(Float, default=0.0)
+    
+    __table_args__ = (
+        UniqueConstraint("patient_id", "metric", "day", name="uq_smartwatch_feature_stats"),
+    )
+
+
+# ============================================================================
+# Smartwatch Ingest Batch (Idempotency)
+# ============================================================================
+
+class SmartwatchIngestBatch(Base):
+    """
+    A bulk upload accepted under a client idempotency key.
+    A retry with the same key gets the stored result back instead of
+    being ingested again; see app.services.smartwatch_ingest.
+    """
+    
+    __tablename__ = "smartwatch_ingest_batches"
+    
+    device_id: Mapped[str] = mapped_column(String(100), nullable=False)
+    idempotency_key: Mapped[str] = mapped_column(String(128), nullable=False)
+    patient_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("patient.id", ondelete="CASCADE"),
+        nullable=False, index=True
+    )
+    result: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON SmartwatchIngestResult
+    
+    __table_args__ = (
+        UniqueConstraint("device_id", "idempotency_key", name="uq_smartwatch_ingest_key"),
     )
 
 
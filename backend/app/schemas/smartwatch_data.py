@@ -2,7 +2,7 @@
 from __future__ import annotations
 from datetime import datetime
 from typing import Any, Dict, List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class SmartwatchDataCreate(BaseModel):
     device_id: str
@@ -17,6 +17,30 @@ class SmartwatchDataCreate(BaseModel):
     stress_level: Optional[float] = None
     skin_temperature: Optional[float] = None
 
+# One reading of a bulk upload; the device comes from the URL
+class SmartwatchSample(BaseModel):
+    timestamp: datetime
+    heart_rate_avg: Optional[float] = Field(default=None, ge=20, le=250)
+    heart_rate_min: Optional[int] = Field(default=None, ge=20, le=250)
+    heart_rate_max: Optional[int] = Field(default=None, ge=20, le=250)
+    spo2_avg: Optional[float] = Field(default=None, ge=50, le=100)
+    steps: Optional[int] = Field(default=None, ge=0)
+    calories_burned: Optional[float] = Field(default=None, ge=0)
+    sleep_duration_minutes: Optional[int] = Field(default=None, ge=0, le=1440)
+    stress_level: Optional[float] = Field(default=None, ge=0, le=100)
+    skin_temperature: Optional[float] = Field(default=None, ge=25, le=45)
+
+class SmartwatchIngestResult(BaseModel):
+    device_id: str
+    accepted: int = 0
+    rejected: int = 0
+    duplicates: int = 0  # valid samples already stored
+    errors: List[Dict[str, Any]] = []
+    replayed: bool = False  # a retry answered from the idempotency key
+    last_synced: Optional[datetime] = None
+    seconds: float = 0.0
+    samples_per_second: float = 0.0
+
 class SmartwatchDataResponse(BaseModel):
     id: str
     patient_id: str
@@ -34,6 +58,34 @@ class SmartwatchDataResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class SmartwatchSeriesPoint(BaseModel):
+    device_id: str
+    timestamp: datetime
+    period_start: datetime
+    period_end: datetime
+    heart_rate_avg: Optional[float] = None
+    heart_rate_min: Optional[int] = None
+    heart_rate_max: Optional[int] = None
+    spo2_avg: Optional[float] = None
+    spo2_min: Optional[float] = None
+    skin_temperature: Optional[float] = None
+    steps: Optional[int] = None
+    calories_burned: Optional[float] = None
+    sleep_duration_minutes: Optional[int] = None
+    stress_level: Optional[float] = None
+    sample_count: Optional[int] = None  # minute readings in a rollup
+    anomaly_count: Optional[int] = None
+    
+    class Config:
+        from_attributes = True
+
+class SmartwatchSeries(BaseModel):
+    patient_id: str
+    period_type: str  # grain served: minute, hour or day
+    start: datetime
+    end: datetime
+    points: List[SmartwatchSeriesPoint] = []
+
 class SmartwatchDashboard(BaseModel):
     patient_id: str
     device_connected: bool = False
@@ -52,6 +104,13 @@ class SmartwatchDashboard(BaseModel):
     sleep_history: List[Dict] = []
     activity_history: List[Dict] = []
 
+class SmartwatchFeatureVector(BaseModel):
+    patient_id: str
+    window_days: Optional[int] = None
+    reading_count: int = 0
+    last_reading_at: Optional[datetime] = None
+    features: Dict[str, float] = {}
+
 class CancerRiskResponse(BaseModel):
     patient_id: str
     health_id: str
@@ -94,3 +153,64 @@ class CancerScreeningResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+class BatchScoringRequest(BaseModel):
+    patient_ids: Optional[List[str]] = None
+    hospital_id: Optional[str] = None
+    risk_categories: Optional[List[str]] = None
+    last_assessed_before: Optional[datetime] = None
+    page_size: int = Field(default=1000, ge=1, le=5000)
+
+class BatchScoringJobResponse(BaseModel):
+    id: str
+    status: str
+    requested_by: Optional[str] = None
+    filters: Dict[str, Any] = {}
+    page_size: int
+    total_patients: Optional[int] = None
+    processed_patients: int = 0
+    model_scored_patients: int = 0
+    progress: float = 0.0
+    rows_per_second: Optional[float] = None
+    model_version: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    
+    @classmethod
+    def from_job(cls, job) -> "BatchScoringJobResponse":
+        return cls(
+            id=job.id,
+            status=job.status,
+            requested_by=job.requested_by,
+            filters=job.filter_values,
+            page_size=job.page_size,
+            total_patients=job.total_patients,
+            processed_patients=job.processed_patients,
+            model_scored_patients=job.model_scored_patients,
+            progress=job.processed_patients / job.total_patients if job.total_patients else 0.0,
+            rows_per_second=job.rows_per_second,
+            model_version=job.model_version,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            heartbeat_at=job.heartbeat_at,
+            error=job.error,
+            created_at=job.created_at,
+        )
+
+class RiskWhatIfRequest(BaseModel):
+    weights: Dict[str, float] = {}
+    cancer_type_multipliers: Dict[str, float] = {}
+    ml_weight: Optional[float] = None
+    hospital_id: Optional[str] = None
+
+class RiskWhatIfResponse(BaseModel):
+    patients: int
+    baseline_category_counts: Dict[str, int] = {}
+    what_if_category_counts: Dict[str, int] = {}
+    changed_category: int = 0
+    baseline_mean_risk: float = 0.0
+    what_if_mean_risk: float = 0.0
+    seconds: float = 0.0
@@ -0,0 +1,364 @@
+"""
+Batch Scoring Service - Cohort Risk Re-Scoring
+==============================================
+Re-scores a cohort of patients (an explicit list, or a hospital / risk
+category / last-assessed filter) as a background job, e.g. after a new
+model version is activated. Patients are streamed in keyset pages ordered
+by id; each page is scored with one vectorized model call, its
+assessments are bulk-inserted and the patients' risk columns bulk-updated,
+and the page is committed together with the job's progress, cursor and
+throughput, so progress is visible from any worker while the job runs.
+
+A worker claims a job by moving it from pending to running, and keeps
+the job's ``heartbeat_at`` fresh while it runs, independent of how long a
+page takes. On shutdown its jobs go back to pending, and ``resume_jobs``
+restarts them from their cursor when the application next starts, along
+with running jobs whose heartbeat went stale because their worker died.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import get_db_context
+from app.models.cancer_screening import BatchScoringJob, BatchScoringStatus, CancerRiskAssessment
+from app.models.patient import Patient
+from app.services.feature_store import get_feature_vectors
+from app.services.inference_service import get_inference_service
+from app.services.risk_scoring import assessment_values, score_patients
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+
+# Jobs running in this process, by id
+_running_jobs: Dict[str, asyncio.Task] = {}
+
+
+def _utc_naive(value: datetime) -> datetime:
+    """Patient.risk_assessment_date is a naive UTC column."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# ============================================================================
+# Cohort Selection
+# ============================================================================
+
+def _cohort_query(filters: Dict[str, Any]):
+    """Patients matching a job's filters, ordered by id for keyset paging."""
+    query = select(Patient).where(Patient.is_deleted == False).order_by(Patient.id)
+    if filters.get("patient_ids"):
+        query = query.where(Patient.id.in_(filters["patient_ids"]))
+    if filters.get("hospital_id"):
+        query = query.where(Patient.primary_hospital_id == filters["hospital_id"])
+    if filters.get("risk_categories"):
+        query = query.where(Patient.overall_cancer_risk.in_(filters["risk_categories"]))
+    if filters.get("last_assessed_before"):
+        cutoff = _utc_naive(datetime.fromisoformat(filters["last_assessed_before"]))
+        query = query.where(or_(
+            Patient.risk_assessment_date == None,
+            Patient.risk_assessment_date < cutoff,
+        ))
+    return query
+
+
+async def _next_page(
+    db: AsyncSession, filters: Dict[str, Any], cursor: Optional[str], page_size: int
+) -> List[Patient]:
+    query = _cohort_query(filters)
+    if cursor is not None:
+        query = query.where(Patient.id > cursor)
+    result = await db.execute(query.limit(page_size))
+    return list(result.scalars())
+
+
+async def count_cohort(db: AsyncSession, filters: Dict[str, Any]) -> int:
+    """Number of patients a job with these filters will score."""
+    query = _cohort_query(filters).order_by(None).with_only_columns(func.count(Patient.id))
+    return (await db.execute(query)).scalar_one()
+
+
+# ============================================================================
+# Scoring
+# ============================================================================
+
+def _assessment_number(job_id: str, ordinal: int) -> str:
+    """Unique per job and row; record numbers from generate_record_number collide at this volume."""
+    return f"CRA-{job_id}-{ordinal:07d}"
+
+
+async def _score_page(db: AsyncSession, job_id: str, first_ordinal: int, patients: List[Patient]) -> int:
+    """Score and store one page; returns how many patients the model scored."""
+    vectors = await get_feature_vectors(db, [p.id for p in patients])
+
+    # One vectorized model call for every patient with model features
+    ml_results: Dict[str, Dict[str, Any]] = {}
+    inference = get_inference_service()
+    if inference.is_ready:
+        scorable = [p.id for p in patients if vectors.get(p.id) is not None and vectors[p.id].feature_values]
+        results = await inference.score_batch([vectors[pid].feature_values for pid in scorable])
+        ml_results = dict(zip(scorable, results or []))
+
+    assessed_at = datetime.now(timezone.utc)
+    assessments = []
+    risk_updates = []
+    scored_patients = zip(patients, score_patients(patients, vectors, ml_results))
+    for ordinal, (patient, scored) in enumerate(scored_patients, start=first_ordinal):
+        assessments.append(assessment_values(
+            patient, scored, assessed_at, assessment_number=_assessment_number(job_id, ordinal)
+        ))
+        risk_updates.append({
+            "id": patient.id,
+            "cancer_risk_score": scored.overall_risk,
+            "overall_cancer_risk": scored.category,
+            "risk_assessment_date": _utc_naive(assessed_at),
+        })
+
+    await db.execute(insert(CancerRiskAssessment), assessments)
+    await db.execute(update(Patient), risk_updates)
+    return len(ml_results)
+
+
+async def _run_page(
+    job_id: str,
+    filters: Dict[str, Any],
+    cursor: Optional[str],
+    page_size: int,
+    first_ordinal: int,
+    scored: int,
+    started: float,
+) -> Optional[Tuple[Optional[str], int]]:
+    """
+    Score and commit the page after ``cursor`` together with the job's progress.
+    
+    Returns the new cursor and the page's size (0 once the cohort is
+    exhausted), or None if the job was asked to cancel.
+    """
+    async with get_db_context() as db:
+        status = await db.scalar(select(BatchScoringJob.status).where(BatchScoringJob.id == job_id))
+        if status == BatchScoringStatus.CANCELLING.value:
+            await db.execute(update(BatchScoringJob).where(BatchScoringJob.id == job_id).values(
+                status=BatchScoringStatus.CANCELLED.value, finished_at=datetime.now(timezone.utc),
+            ))
+            return None
+
+        patients = await _next_page(db, filters, cursor, page_size)
+        if not patients:
+            return cursor, 0
+        model_scored = await _score_page(db, job_id, first_ordinal, patients)
+
+        # Progress is committed with the page it describes
+        cursor = patients[-1].id
+        scored += len(patients)
+        await db.execute(update(BatchScoringJob).where(BatchScoringJob.id == job_id).values(
+            processed_patients=BatchScoringJob.processed_patients + len(patients),
+            model_scored_patients=BatchScoringJob.model_scored_patients + model_scored,
+            cursor=cursor,
+            rows_per_second=scored / max(time.perf_counter() - started, 1e-9),
+            heartbeat_at=datetime.now(timezone.utc),
+        ))
+    return cursor, len(patients)
+
+
+async def _set_job(job_id: str, **values) -> None:
+    async with get_db_context() as db:
+        await db.execute(update(BatchScoringJob).where(BatchScoringJob.id == job_id).values(**values))
+
+
+async def _heartbeat(job_id: str, interval: float) -> None:
+    """Refresh a running job's heartbeat every ``interval`` seconds, also while a long page runs."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await _set_job(job_id, heartbeat_at=datetime.now(timezone.utc))
+        except Exception as e:
+            logger.warning(f"Batch scoring job {job_id} heartbeat failed: {e}")
+
+
+async def run_job(job_id: str) -> None:
+    """Score a job's cohort page by page, resuming from its cursor."""
+    async with get_db_context() as db:
+        claimed = await db.execute(
+            update(BatchScoringJob)
+            .where(BatchScoringJob.id == job_id, BatchScoringJob.status == BatchScoringStatus.PENDING.value)
+            .values(status=BatchScoringStatus.RUNNING.value, heartbeat_at=datetime.now(timezone.utc))
+        )
+        job = await db.get(BatchScoringJob, job_id, populate_existing=True)
+        if job is None:
+            logger.warning(f"Batch scoring job {job_id} not found")
+            return
+        # Another worker holds it, or it already finished; a cancel request is finished below
+        if claimed.rowcount != 1 and job.status != BatchScoringStatus.CANCELLING.value:
+            return
+        job.started_at = job.started_at or datetime.now(timezone.utc)
+        job.model_version = get_inference_service().model_version
+        filters, cursor, page_size = job.filter_values, job.cursor, job.page_size
+        # Rows already committed by an earlier run of this job
+        offset = job.processed_patients or 0
+
+    started = time.perf_counter()
+    scored = 0
+    heartbeat = asyncio.create_task(
+        _heartbeat(job_id, get_settings().ai_model.batch_scoring_heartbeat_seconds)
+    )
+    try:
+        while True:
+            # An interrupted job lets its current page commit (or roll back)
+            # first, so no transaction is abandoned mid-write
+            page = asyncio.ensure_future(
+                _run_page(job_id, filters, cursor, page_size, offset + scored + 1, scored, started)
+            )
+            try:
+                outcome = await asyncio.shield(page)
+            except asyncio.CancelledError:
+                await asyncio.gather(page, return_exceptions=True)
+                raise
+            if outcome is None:
+                logger.info(f"Batch scoring job {job_id} cancelled after {scored} patients")
+                return
+            cursor, count = outcome
+            if not count:
+                break
+            scored += count
+            logger.debug(f"Batch scoring job {job_id}: {scored} patients scored")
+    except asyncio.CancelledError:
+        await _release_job(job_id)
+        logger.info(f"Batch scoring job {job_id} interrupted after {scored} patients")
+        raise
+    except Exception as e:
+        logger.error(f"Batch scoring job {job_id} failed: {e}")
+        await _set_job(
+            job_id, status=BatchScoringStatus.FAILED.value, error=str(e),
+            finished_at=datetime.now(timezone.utc),
+        )
+        return
+    finally:
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+
+    elapsed = time.perf_counter() - started
+    await _set_job(
+        job_id, status=BatchScoringStatus.COMPLETED.value, finished_at=datetime.now(timezone.utc),
+        rows_per_second=scored / elapsed if elapsed > 0 else None,
+    )
+    logger.info(f"Batch scoring job {job_id} scored {scored} patients in {elapsed:.1f}s")
+
+
+# ============================================================================
+# Job Management
+# ============================================================================
+
+async def create_job(
+    db: AsyncSession,
+    filters: Dict[str, Any],
+    page_size: int = DEFAULT_PAGE_SIZE,
+    requested_by: Optional[str] = None,
+) -> BatchScoringJob:
+    """Record a pending job; start it with ``start_job`` after committing."""
+    filters = {k: v for k, v in filters.items() if v}
+    if isinstance(filters.get("last_assessed_before"), datetime):
+        filters["last_assessed_before"] = filters["last_assessed_before"].isoformat()
+    job = BatchScoringJob(
+        status=BatchScoringStatus.PENDING.value,
+        requested_by=requested_by,
+        filters=json.dumps(filters),
+        page_size=min(page_size, MAX_PAGE_SIZE),
+        total_patients=await count_cohort(db, filters),
+        processed_patients=0,
+        model_scored_patients=0,
+    )
+    db.add(job)
+    await db.flush()
+    return job
+
+
+def start_job(job_id: str) -> asyncio.Task:
+    """Run a committed job in the background of this process."""
+    task = asyncio.create_task(run_job(job_id), name=f"batch-scoring-{job_id}")
+    _running_jobs[job_id] = task
+    task.add_done_callback(lambda _: _running_jobs.pop(job_id, None))
+    return task
+
+
+async def cancel_job(db: AsyncSession, job: BatchScoringJob) -> None:
+    """Ask a job to stop; the worker running it stops before its next page."""
+    if job.status == BatchScoringStatus.PENDING.value and job.id not in _running_jobs:
+        job.status = BatchScoringStatus.CANCELLED.value
+        job.finished_at = datetime.now(timezone.utc)
+    elif job.status in (BatchScoringStatus.PENDING.value, BatchScoringStatus.RUNNING.value):
+        job.status = BatchScoringStatus.CANCELLING.value
+    await db.flush()
+
+
+async def _release_job(job_id: str) -> None:
+    """Hand an interrupted job back: pending to be resumed, or cancelled if that was requested."""
+    async with get_db_context() as db:
+        await db.execute(
+            update(BatchScoringJob)
+            .where(BatchScoringJob.id == job_id, BatchScoringJob.status == BatchScoringStatus.RUNNING.value)
+            .values(status=BatchScoringStatus.PENDING.value)
+        )
+        await db.execute(
+            update(BatchScoringJob)
+            .where(BatchScoringJob.id == job_id, BatchScoringJob.status == BatchScoringStatus.CANCELLING.value)
+            .values(status=BatchScoringStatus.CANCELLED.value, finished_at=datetime.now(timezone.utc))
+        )
+
+
+async def stop_running_jobs() -> None:
+    """Cancel this process's jobs on shutdown; they return to pending at their committed cursor."""
+    tasks = list(_running_jobs.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def resume_jobs() -> List[str]:
+    """
+    Restart unfinished jobs at startup; returns the ids started.
+    
+    Pending jobs (including ones handed back at shutdown) are resumed from
+    their cursor. Running jobs whose heartbeat is older than the
+    ``batch_scoring_stale_seconds`` setting lost their worker and are
+    resumed too, and jobs left cancelling are marked cancelled.
+    """
+    now = datetime.now(timezone.utc)
+    stale_before = now - timedelta(seconds=get_settings().ai_model.batch_scoring_stale_seconds)
+    async with get_db_context() as db:
+        await db.execute(
+            update(BatchScoringJob)
+            .where(BatchScoringJob.status == BatchScoringStatus.CANCELLING.value)
+            .where(BatchScoringJob.id.not_in(list(_running_jobs)))
+            .values(status=BatchScoringStatus.CANCELLED.value, finished_at=now)
+        )
+        await db.execute(
+            update(BatchScoringJob)
+            .where(
+                BatchScoringJob.status == BatchScoringStatus.RUNNING.value,
+                BatchScoringJob.id.not_in(list(_running_jobs)),
+                or_(BatchScoringJob.heartbeat_at == None, BatchScoringJob.heartbeat_at < stale_before),
+            )
+            .values(status=BatchScoringStatus.PENDING.value)
+        )
+        result = await db.execute(
+            select(BatchScoringJob.id)
+            .where(BatchScoringJob.status == BatchScoringStatus.PENDING.value)
+            .order_by(BatchScoringJob.created_at)
+        )
+        job_ids = [job_id for job_id in result.scalars() if job_id not in _running_jobs]
+
+    for job_id in job_ids:
+        start_job(job_id)
+    if job_ids:
+        logger.info(f"Resuming {len(job_ids)} batch scoring jobs")
+    return job_ids
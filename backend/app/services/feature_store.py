@@ -0,0 +1,286 @@
+"""
+Feature Store Service - Materialized Patient Feature Vectors
+============================================================
+Scoring a patient used to join the Patient row, the latest BloodSample and
+its BloodBiomarker rows and the SmartwatchData anomalies, and re-run the
+lifestyle/genetic/medical encoders, on every request. PatientFeatureVector
+keeps the result per patient and feature-schema version instead.
+
+Invalidation is change-driven: a ``before_flush`` listener adds a
+FeatureStoreOutbox row for every patient whose profile fields, date of birth
+or gender, blood samples, biomarkers or smartwatch anomalies change, so the
+entry commits (or rolls back) together with the change itself. A vector
+computed before the patient's latest birthday is also treated as stale. A vector is served as-is while its
+patient has no pending outbox entries; otherwise it is recomputed on read,
+or earlier by the background drain (``process_outbox``). Recomputation is
+batched: one query per source table for any number of patients.
+
+Bumping FEATURE_SCHEMA_VERSION (e.g. when build_patient_features changes)
+makes every stored vector a miss, so they are rebuilt on next use.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from itertools import chain
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, event, exists, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database import get_db_context
+from app.models.blood_sample import BloodSample, BloodBiomarker
+from app.models.feature_store import FeatureStoreOutbox, PatientFeatureVector
+from app.models.patient import Patient
+from app.models.smartwatch_data import SmartwatchData
+from app.models.user import User
+from app.services.inference_service import (
+    AI_MODELS_AVAILABLE, PATIENT_FEATURE_FIELDS, USER_FEATURE_FIELDS, build_patient_features
+)
+
+logger = logging.getLogger(__name__)
+
+FEATURE_SCHEMA_VERSION = "2"
+
+# Patients per query when reading or refreshing vectors
+QUERY_CHUNK_SIZE = 500
+
+
+# ============================================================================
+# Change Capture
+# ============================================================================
+
+def _has_changes(obj, fields: Iterable[str]) -> bool:
+    attrs = inspect(obj).attrs
+    return any(attrs[name].history.has_changes() for name in fields)
+
+
+def _sample_patient_id(session: Session, biomarker: BloodBiomarker) -> Optional[str]:
+    if biomarker.blood_sample_id is None:
+        return None
+    with session.no_autoflush:
+        sample = session.get(BloodSample, biomarker.blood_sample_id)
+    return sample.patient_id if sample is not None else None
+
+
+def _user_patient_id(session: Session, user: User) -> Optional[str]:
+    with session.no_autoflush:
+        result = session.execute(select(Patient.id).where(Patient.user_id == user.id))
+    return result.scalar_one_or_none()
+
+
+def _age_on(date_of_birth: datetime, day: date) -> int:
+    born = date_of_birth.date() if isinstance(date_of_birth, datetime) else date_of_birth
+    return day.year - born.year - ((day.month, day.day) < (born.month, born.day))
+
+
+def _invalidated_patients(session: Session) -> Dict[str, str]:
+    """Patient id -> source model for pending changes that affect feature vectors."""
+    patients: Dict[str, str] = {}
+    for obj in chain(session.new, session.dirty, session.deleted):
+        is_update = obj in session.dirty
+        if is_update and not session.is_modified(obj):
+            continue
+
+        patient_id = None
+        if isinstance(obj, Patient):
+            # New patients have no vector yet; it is built on first read
+            if is_update and _has_changes(obj, PATIENT_FEATURE_FIELDS):
+                patient_id = obj.id
+        elif isinstance(obj, User):
+            if is_update and _has_changes(obj, USER_FEATURE_FIELDS):
+                patient_id = _user_patient_id(session, obj)
+        elif isinstance(obj, BloodSample):
+            patient_id = obj.patient_id
+        elif isinstance(obj, BloodBiomarker):
+            patient_id = _sample_patient_id(session, obj)
+        elif isinstance(obj, SmartwatchData):
+            # Only anomalies feed the vector; plain readings do not invalidate it
+            if obj.ai_anomaly_detected or (is_update and _has_changes(obj, ("ai_anomaly_detected",))):
+                patient_id = obj.patient_id
+
+        if patient_id is not None:
+            patients.setdefault(patient_id, type(obj).__name__)
+    return patients
+
+
+@event.listens_for(Session, "before_flush")
+def _enqueue_feature_refresh(session: Session, flush_context, instances) -> None:
+    for patient_id, source in _invalidated_patients(session).items():
+        session.add(FeatureStoreOutbox(patient_id=patient_id, source=source))
+
+
+# ============================================================================
+# Reading and Refreshing Vectors
+# ============================================================================
+
+def _chunks(ids: List[str]) -> Iterable[List[str]]:
+    for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+        yield ids[start:start + QUERY_CHUNK_SIZE]
+
+
+async def get_feature_vectors(db: AsyncSession, patient_ids: Iterable[str]) -> Dict[str, PatientFeatureVector]:
+    """Current vectors for the given patients; unknown patients are left out."""
+    patient_ids = list(dict.fromkeys(patient_ids))
+    pending = exists().where(FeatureStoreOutbox.patient_id == PatientFeatureVector.patient_id)
+
+    today = datetime.now(timezone.utc).date()
+    vectors: Dict[str, PatientFeatureVector] = {}
+    for chunk in _chunks(patient_ids):
+        result = await db.execute(
+            select(PatientFeatureVector, pending, User.date_of_birth)
+            .join(Patient, Patient.id == PatientFeatureVector.patient_id)
+            .outerjoin(User, User.id == Patient.user_id)
+            .where(
+                PatientFeatureVector.patient_id.in_(chunk),
+                PatientFeatureVector.schema_version == FEATURE_SCHEMA_VERSION,
+            )
+        )
+        for vector, stale, date_of_birth in result:
+            # The stored age is out of date once the patient has had a birthday
+            if date_of_birth is not None and not stale:
+                stale = _age_on(date_of_birth, vector.computed_at.date()) != _age_on(date_of_birth, today)
+            if not stale:
+                vectors[vector.patient_id] = vector
+
+    missing = [patient_id for patient_id in patient_ids if patient_id not in vectors]
+    if missing:
+        vectors.update(await refresh_feature_vectors(db, missing))
+    return vectors
+
+
+async def get_feature_vector(db: AsyncSession, patient_id: str) -> Optional[PatientFeatureVector]:
+    """Current vector for one patient (None if the patient does not exist)."""
+    return (await get_feature_vectors(db, [patient_id])).get(patient_id)
+
+
+async def refresh_feature_vectors(db: AsyncSession, patient_ids: Iterable[str]) -> Dict[str, PatientFeatureVector]:
+    """Recompute and store the vectors of the given patients."""
+    patient_ids = list(dict.fromkeys(patient_ids))
+    vectors: Dict[str, PatientFeatureVector] = {}
+    for chunk in _chunks(patient_ids):
+        vectors.update(await _refresh_chunk(db, chunk))
+    return vectors
+
+
+async def _refresh_chunk(db: AsyncSession, patient_ids: List[str]) -> Dict[str, PatientFeatureVector]:
+    # Entries seen now are covered by this refresh; ones committed while it
+    # runs stay pending and trigger the next one
+    pending_result = await db.execute(
+        select(FeatureStoreOutbox.id).where(FeatureStoreOutbox.patient_id.in_(patient_ids))
+    )
+    pending_ids = pending_result.scalars().all()
+
+    patient_result = await db.execute(
+        select(Patient, User)
+        .outerjoin(User, User.id == Patient.user_id)
+        .where(Patient.id.in_(patient_ids))
+    )
+    rows = patient_result.all()
+    patients = {patient.id: patient for patient, _ in rows}
+    users = {patient.id: user for patient, user in rows}
+
+    ranked = select(
+        BloodSample.id,
+        BloodSample.patient_id,
+        BloodSample.ai_cancer_risk_score,
+        func.row_number().over(
+            partition_by=BloodSample.patient_id,
+            order_by=BloodSample.collection_date.desc(),
+        ).label("recency"),
+    ).where(BloodSample.patient_id.in_(patient_ids)).subquery()
+    latest_result = await db.execute(select(ranked).where(ranked.c.recency == 1))
+    latest_blood = {row.patient_id: row for row in latest_result}
+
+    biomarkers = defaultdict(list)
+    if latest_blood and AI_MODELS_AVAILABLE:
+        biomarker_result = await db.execute(
+            select(BloodBiomarker).where(
+                BloodBiomarker.blood_sample_id.in_([row.id for row in latest_blood.values()])
+            )
+        )
+        for biomarker in biomarker_result.scalars():
+            biomarkers[biomarker.blood_sample_id].append(biomarker)
+
+    anomaly_result = await db.execute(
+        select(SmartwatchData.patient_id, func.count()).where(
+            SmartwatchData.patient_id.in_(patient_ids),
+            SmartwatchData.ai_anomaly_detected == True,
+        ).group_by(SmartwatchData.patient_id)
+    )
+    anomaly_counts = dict(anomaly_result.all())
+
+    existing_result = await db.execute(
+        select(PatientFeatureVector).where(
+            PatientFeatureVector.patient_id.in_(patient_ids),
+            PatientFeatureVector.schema_version == FEATURE_SCHEMA_VERSION,
+        )
+    )
+    existing = {vector.patient_id: vector for vector in existing_result.scalars()}
+
+    computed_at = datetime.now(timezone.utc)
+    vectors: Dict[str, PatientFeatureVector] = {}
+    created: List[PatientFeatureVector] = []
+    for patient_id, patient in patients.items():
+        blood = latest_blood.get(patient_id)
+        features = {}
+        if AI_MODELS_AVAILABLE:
+            features = build_patient_features(
+                patient, biomarkers.get(blood.id) if blood else None, users.get(patient_id)
+            )
+
+        vector = existing.get(patient_id)
+        if vector is None:
+            vector = PatientFeatureVector(patient_id=patient_id, schema_version=FEATURE_SCHEMA_VERSION)
+            created.append(vector)
+        vector.computed_at = computed_at
+        vector.features = json.dumps(features)
+        vector.latest_blood_sample_id = blood.id if blood else None
+        vector.latest_blood_risk_score = blood.ai_cancer_risk_score if blood else None
+        vector.smartwatch_anomaly_count = anomaly_counts.get(patient_id, 0)
+        vectors[patient_id] = vector
+
+    if pending_ids:
+        await db.execute(delete(FeatureStoreOutbox).where(FeatureStoreOutbox.id.in_(pending_ids)))
+    await db.flush()
+    if created:
+        try:
+            async with db.begin_nested():
+                db.add_all(created)
+        except IntegrityError:
+            # A concurrent refresh stored these first; serve the values computed here
+            logger.debug(f"Feature vectors for {len(created)} patients were stored concurrently")
+    return vectors
+
+
+# ============================================================================
+# Outbox Drain
+# ============================================================================
+
+async def process_outbox(db: AsyncSession, batch_size: int = QUERY_CHUNK_SIZE) -> int:
+    """Refresh the vectors of up to ``batch_size`` patients with pending changes."""
+    result = await db.execute(select(FeatureStoreOutbox.patient_id).distinct().limit(batch_size))
+    patient_ids = result.scalars().all()
+    if not patient_ids:
+        return 0
+    await refresh_feature_vectors(db, patient_ids)
+    return len(patient_ids)
+
+
+async def run_outbox_worker(interval: float, batch_size: int = QUERY_CHUNK_SIZE) -> None:
+    """Drain the outbox in the background so reads rarely recompute."""
+    while True:
+        processed = 0
+        try:
+            async with get_db_context() as db:
+                processed = await process_outbox(db, batch_size)
+            if processed:
+                logger.debug(f"Refreshed feature vectors for {processed} patients")
+        except Exception as e:
+            logger.warning(f"Feature store refresh failed: {e}")
+        if processed < batch_size:
+            await asyncio.sleep(interval)
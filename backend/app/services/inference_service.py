@@ -0,0 +1,384 @@
+"""
+Inference Service - Online Cancer Risk Scoring
+===============================================
+Loads the trained CancerRiskClassifier and serves it to the API through a
+micro-batching broker, so concurrent scoring requests share one vectorized
+predict_proba call instead of each running its own. The batched calls run
+in a process pool so sklearn work never blocks the event loop, and the
+served version is managed through the model registry. Outputs are cached
+per preprocessed feature vector and model version, so re-scoring an
+unchanged patient skips the ensemble.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.config import get_settings
+
+try:
+    from ai_models.data_preprocessing.preprocessor import (
+        LifestyleFeatureEncoder, GeneticFeatureEncoder, MedicalHistoryEncoder,
+    )
+    from ai_models.inference.batching import MicroBatchBroker
+    from ai_models.inference.cache import PredictionCache
+    from ai_models.inference.executor import InferenceExecutor
+    from ai_models.models.cancer_classifier import CancerRiskClassifier
+    from ai_models.models.registry import ModelRegistry
+    AI_MODELS_AVAILABLE = True
+except ImportError:  # ai_models package or its ML dependencies not installed
+    AI_MODELS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_NAME = "CancerGuard Ensemble v1"
+DEFAULT_MODEL_VERSION = "1.0.0"
+
+# Patient columns read by build_patient_features; changes to them invalidate
+# the patient's stored feature vector (see app.services.feature_store)
+PATIENT_FEATURE_FIELDS = (
+    "bmi", "smoking_status", "packs_per_day", "smoking_years",
+    "alcohol_units_per_week", "exercise_minutes_per_week", "sleep_hours_avg",
+    "sun_exposure_hours", "brca1_positive", "brca2_positive", "lynch_syndrome",
+    "tp53_mutation", "has_diabetes", "has_hypertension", "has_heart_disease",
+    "has_autoimmune_disease", "has_chronic_kidney_disease", "has_liver_disease",
+    "has_lung_disease", "has_hiv_aids", "has_hepatitis", "has_hpv",
+    "has_obesity", "has_previous_cancer",
+)
+
+# User columns read by build_patient_features (demographics live on User)
+USER_FEATURE_FIELDS = ("date_of_birth", "gender")
+
+
+def build_patient_features(patient, biomarkers: Optional[Iterable] = None, user=None) -> Dict[str, float]:
+    """
+    Build a model feature record from a Patient row and optional biomarker rows.
+    
+    ``user`` is the patient's User row, which holds age and gender; without
+    it they take the encoders' defaults.
+    """
+    patient_info = {
+        "age": user.age if user is not None else None,
+        "gender": user.gender if user is not None else None,
+        "bmi": patient.bmi,
+        "smoking_status": patient.smoking_status,
+        "pack_years": patient.get_pack_years(),
+        "alcohol_units_per_week": patient.alcohol_units_per_week,
+        "exercise_minutes_per_week": patient.exercise_minutes_per_week,
+        "sleep_hours_avg": patient.sleep_hours_avg,
+        "sun_exposure_hours": patient.sun_exposure_hours,
+        "brca1_positive": patient.brca1_positive,
+        "brca2_positive": patient.brca2_positive,
+        "lynch_syndrome": patient.lynch_syndrome,
+        "tp53_mutation": patient.tp53_mutation,
+        "has_diabetes": patient.has_diabetes,
+        "has_hypertension": patient.has_hypertension,
+        "has_heart_disease": patient.has_heart_disease,
+        "has_autoimmune_disease": patient.has_autoimmune_disease,
+        "has_chronic_kidney_disease": patient.has_chronic_kidney_disease,
+        "has_liver_disease": patient.has_liver_disease,
+        "has_lung_disease": patient.has_lung_disease,
+        "has_hiv": patient.has_hiv_aids,
+        "has_hepatitis": patient.has_hepatitis,
+        "has_hpv": patient.has_hpv,
+        "has_obesity": patient.has_obesity,
+        "has_previous_cancer": patient.has_previous_cancer,
+    }
+    # Unknown values fall back to the encoders' defaults
+    patient_info = {k: v for k, v in patient_info.items() if v is not None}
+
+    features: Dict[str, float] = {}
+    features.update(LifestyleFeatureEncoder().encode(patient_info))
+    features.update(GeneticFeatureEncoder().encode(patient_info))
+    features.update(MedicalHistoryEncoder().encode(patient_info))
+
+    for biomarker in biomarkers or []:
+        features[biomarker.biomarker_name.lower()] = float(biomarker.value)
+
+    return features
+
+
+class _ServingModel:
+    """A loaded model version together with the machinery serving it."""
+
+    def __init__(self, model, version: str, model_path: Path, load_report: Dict[str, Any]):
+        self.model = model
+        self.version = version
+        self.model_path = model_path
+        self.load_report = load_report
+        self.executor = None
+        self.broker = None
+        self.cache = None
+        self.bulk_predict_fn = None
+
+    async def start(self, settings, cache: Optional["PredictionCache"] = None) -> None:
+        self.cache = cache
+        predict_fn = self.model.predict_proba
+        if settings.inference_workers > 0:
+            started = time.perf_counter()
+            self.executor = InferenceExecutor(
+                str(self.model_path),
+                max_workers=settings.inference_workers,
+                max_pending=settings.inference_max_pending,
+            )
+            await self.executor.start()
+            self.load_report["worker_start_seconds"] = time.perf_counter() - started
+            predict_fn = self.executor.predict_proba
+        # Bulk scoring goes around the cache: a cohort sweep would only
+        # evict the rows online requests keep hitting
+        self.bulk_predict_fn = predict_fn
+        if cache is not None:
+            predict_fn = self._cached_predict_proba
+
+        self.broker = MicroBatchBroker(
+            predict_fn,
+            feature_names=self.model.feature_names_,
+            max_batch_size=settings.inference_max_batch_size,
+            max_wait_ms=settings.inference_max_wait_ms,
+            # In-process scoring blocks the event loop, so only the worker
+            # pool benefits from overlapping batches
+            max_in_flight=self.executor.max_workers if self.executor is not None else 1,
+        )
+        await self.broker.start()
+
+    async def _cached_predict_proba(self, frame):
+        """predict_proba that only runs the model for rows missing from the cache."""
+        if self.executor is not None:
+            X_processed = await self.executor.preprocess(frame)
+            compute = lambda rows: self.executor.predict_proba_processed(X_processed[rows])
+        else:
+            X_processed = self.model._preprocess(frame)
+            compute = lambda rows: self.model._predict_proba_processed(X_processed[rows])
+        rows = await self.cache.aget_or_compute(X_processed, compute, version=self.version)
+        return np.vstack(rows)
+
+    async def predict_bulk(self, records: List[Dict[str, float]]) -> np.ndarray:
+        """predict_proba for many feature records in one call, bypassing the broker."""
+        frame = pd.DataFrame.from_records(records, columns=self.model.feature_names_)
+        if self.executor is None:
+            return await asyncio.to_thread(self.bulk_predict_fn, frame)
+        # One slice per worker, so a large batch uses every core
+        n_slices = min(self.executor.max_workers, len(frame))
+        slices = [frame.iloc[rows] for rows in np.array_split(np.arange(len(frame)), n_slices)]
+        return np.vstack(await asyncio.gather(*[self.bulk_predict_fn(part) for part in slices]))
+
+    async def stop(self, drain: bool = True) -> None:
+        """Stop serving; with drain=True requests already queued still complete."""
+        if self.broker is not None:
+            await self.broker.stop(drain=drain)
+        if self.executor is not None:
+            await self.executor.stop()
+
+
+class InferenceService:
+    """
+    Serves the active cancer risk model to the API.
+
+    The active version comes from the model registry in
+    ``AIModelSettings.models_dir``. Activating another version loads it
+    next to the current one and swaps it in atomically; requests already
+    queued on the old version finish before it is torn down. Each worker
+    also watches the registry's active pointer, so one activation rolls
+    out to every worker without a restart. The prediction cache is rebound
+    to each newly served version, which drops the previous version's rows.
+    """
+
+    def __init__(self):
+        self.registry = None
+        self.prediction_cache = None
+        self._serving: Optional[_ServingModel] = None
+        self._swap_lock: Optional[asyncio.Lock] = None
+        self._watcher: Optional[asyncio.Task] = None
+        self.swap_count = 0
+
+    @property
+    def model(self):
+        return self._serving.model if self._serving is not None else None
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self._serving.version if self._serving is not None else None
+
+    @property
+    def is_ready(self) -> bool:
+        serving = self._serving
+        return serving is not None and serving.broker is not None and serving.broker.is_running
+
+    async def start(self) -> None:
+        """Load the active model version and start serving it."""
+        settings = get_settings().ai_model
+        if not AI_MODELS_AVAILABLE:
+            logger.warning("ai_models package not available, AI scoring disabled")
+            return
+
+        self.registry = ModelRegistry(settings.models_dir)
+        self._swap_lock = asyncio.Lock()
+        if settings.prediction_cache_size > 0:
+            self.prediction_cache = PredictionCache(settings.prediction_cache_size)
+
+        active_version = self.registry.active_version
+        if active_version is not None:
+            try:
+                await self.activate_version(active_version)
+            except Exception as e:
+                logger.error(f"Failed to load active model version {active_version}: {e}")
+        else:
+            # Fall back to a plain model file dropped into models_dir
+            legacy_path = Path(settings.models_dir) / settings.active_model_file
+            if legacy_path.exists():
+                try:
+                    await self._swap_in(legacy_path, DEFAULT_MODEL_VERSION)
+                except Exception as e:
+                    logger.error(f"Failed to load model from {legacy_path}: {e}")
+            else:
+                logger.info("No active model version, using rule-based scoring only")
+
+        if settings.model_watch_interval_seconds > 0:
+            self._watcher = asyncio.create_task(
+                self._watch_registry(settings.model_watch_interval_seconds),
+                name="model-registry-watcher",
+            )
+
+    async def stop(self) -> None:
+        """Stop the registry watcher and the serving model."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+        if self._serving is not None:
+            await self._serving.stop(drain=True)
+            self._serving = None
+
+    async def activate_version(self, version: str) -> Dict[str, Any]:
+        """Hot-swap to a registry version without dropping in-flight requests."""
+        if self.registry is None:
+            raise RuntimeError("Inference service is not started")
+        async with self._swap_lock:
+            if self.model_version == version and self.is_ready:
+                return self._serving.load_report
+            return await self._swap_in(None, version)
+
+    async def _swap_in(self, model_path: Optional[Path], version: str) -> Dict[str, Any]:
+        """Load a model next to the current one, then switch over atomically."""
+        settings = get_settings().ai_model
+        if model_path is None:
+            model, report = await asyncio.to_thread(self.registry.load, version)
+            model_path = Path(report["artifact_path"])
+        else:
+            started = time.perf_counter()
+            model = await asyncio.to_thread(CancerRiskClassifier.load_model, str(model_path))
+            report = {
+                "version": version,
+                "artifact_path": str(model_path),
+                "load_seconds": time.perf_counter() - started,
+            }
+
+        serving = _ServingModel(model, version, model_path, report)
+        await serving.start(settings, self.prediction_cache)
+        if self.prediction_cache is not None:
+            self.prediction_cache.bind_version(version)
+
+        previous, self._serving = self._serving, serving
+        if previous is not None:
+            self.swap_count += 1
+            await previous.stop(drain=True)
+        logger.info(
+            f"Serving model version {version} "
+            f"(load {report['load_seconds']:.3f}s, "
+            f"workers {report.get('worker_start_seconds', 0.0):.3f}s)"
+        )
+        return report
+
+    async def _watch_registry(self, interval: float) -> None:
+        """Pick up activations made by other workers or processes."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                active_version = self.registry.active_version
+                if active_version is not None and active_version != self.model_version:
+                    await self.activate_version(active_version)
+            except Exception as e:
+                logger.warning(f"Model registry watch failed: {e}")
+
+    async def score(self, features: Dict[str, float]) -> Optional[Dict[str, Any]]:
+        """Score one feature record. Returns None when no model is deployed."""
+        serving = self._serving
+        if serving is None or not self.is_ready:
+            return None
+
+        proba = await serving.broker.submit(features)
+        risk_score = serving.model.risk_scores_from_proba(proba[np.newaxis, :])[0]
+        return self._result(serving, proba, risk_score)
+
+    async def score_batch(self, records: List[Dict[str, float]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Score many feature records in one vectorized model call.
+
+        For cohort-scale jobs: the call goes straight to the model (or its
+        worker pool) instead of through the micro-batching broker and the
+        prediction cache. Returns None when no model is deployed.
+        """
+        serving = self._serving
+        if serving is None or not self.is_ready:
+            return None
+        if not records:
+            return []
+
+        proba = await serving.predict_bulk(records)
+        risk_scores = serving.model.risk_scores_from_proba(proba)
+        return [self._result(serving, row, risk) for row, risk in zip(proba, risk_scores)]
+
+    @staticmethod
+    def _result(serving: _ServingModel, proba: np.ndarray, risk_score: float) -> Dict[str, Any]:
+        return {
+            "risk_score": float(risk_score),
+            "class_probabilities": {
+                str(cls): float(p) for cls, p in zip(serving.model.classes_, proba)
+            },
+            "confidence": float(np.max(proba)),
+            "model_name": DEFAULT_MODEL_NAME,
+            "model_version": serving.version,
+        }
+
+    def list_versions(self) -> Dict[str, Any]:
+        """Registry versions and which one is active/serving."""
+        if self.registry is None:
+            return {"active_version": None, "serving_version": None, "versions": []}
+        return {
+            "active_version": self.registry.active_version,
+            "serving_version": self.model_version,
+            "versions": self.registry.list_versions(),
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get inference metrics."""
+        serving = self._serving
+        return {
+            "model_loaded": serving is not None,
+            "model_version": serving.version if serving is not None else None,
+            "model_path": str(serving.model_path) if serving is not None else None,
+            "cold_start": serving.load_report if serving is not None else None,
+            "swap_count": self.swap_count,
+            "broker": serving.broker.get_metrics() if serving and serving.broker else None,
+            "executor": serving.executor.get_metrics() if serving and serving.executor else None,
+            "prediction_cache": self.prediction_cache.get_metrics() if self.prediction_cache else None,
+        }
+
+
+_inference_service: Optional[InferenceService] = None
+
+
+def get_inference_service() -> InferenceService:
+    """Get or create the global inference service."""
+    global _inference_service
+    if _inference_service is None:
+        _inference_service = InferenceService()
+    return _inference_service
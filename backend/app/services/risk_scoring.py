@@ -0,0 +1,501 @@
+"""
+Risk Scoring Service - Rule-Based Cancer Risk
+==============================================
+The cancer risk score shared by the single-patient predict endpoint and
+batch scoring jobs: profile rules, blood and smartwatch evidence from the
+patient's materialized feature vector, an optional blend with the trained
+ensemble, the risk category and per-cancer-type risks. Also builds the
+CancerRiskAssessment column values and recommendations for a result, so
+every caller stores assessments the same way.
+
+The clinical rules are a declarative table (``PROFILE_RULES`` and
+``CANCER_TYPE_MULTIPLIERS``) that ``RiskEngine`` compiles into NumPy
+expressions over columnar patient arrays. One patient is a batch of one,
+so the endpoint, batch jobs and whole-table what-if runs
+(``load_patient_columns``) all go through the same compiled rules.
+"""
+from __future__ import annotations
+import json
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models.feature_store import PatientFeatureVector
+from app.models.patient import Patient
+from app.security import generate_record_number
+from app.services.feature_store import FEATURE_SCHEMA_VERSION
+from app.services.inference_service import DEFAULT_MODEL_NAME, DEFAULT_MODEL_VERSION
+
+BASELINE_RISK = 0.05  # 5% baseline
+
+# Checked in order, first match wins
+RISK_CATEGORY_THRESHOLDS = [
+    (0.8, "critical"),
+    (0.6, "very_high"),
+    (0.4, "high"),
+    (0.2, "moderate"),
+    (0.1, "low"),
+]
+DEFAULT_RISK_CATEGORY = "very_low"
+
+# Confidence reported when no model contributed to the score
+RULE_BASED_CONFIDENCE = 0.87
+
+# At most this many smartwatch anomalies are counted
+MAX_COUNTED_ANOMALIES = 10
+ANOMALY_WEIGHT = 0.02
+
+CURRENT_SMOKING_STATUSES = ("current_light", "current_moderate", "current_heavy")
+
+
+# ============================================================================
+# Rule Table
+# ============================================================================
+
+@dataclass(frozen=True)
+class RiskRule:
+    """
+    One additive profile rule.
+
+    The rule fires where ``column`` satisfies ``op`` against ``value`` and
+    adds ``weight``, or ``per_unit`` times ``amount_column`` capped at
+    ``weight`` when an amount column is set. Rules with an ``impact`` are
+    reported as risk factors.
+    """
+    name: str
+    column: str
+    op: str
+    value: Any = None
+    weight: float = 0.0
+    amount_column: Optional[str] = None
+    per_unit: float = 0.0
+    impact: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class CancerTypeMultiplier:
+    """Per-cancer-type risk: ``multiplier`` where the condition holds (or always), else ``otherwise``."""
+    cancer_type: str
+    multiplier: float
+    column: Optional[str] = None
+    op: str = "is_true"
+    value: Any = None
+    otherwise: float = 1.0
+
+
+PROFILE_RULES: Tuple[RiskRule, ...] = (
+    RiskRule("bmi", "bmi", "gt", 30, weight=0.05),
+    RiskRule(
+        "smoking", "smoking_status", "in", CURRENT_SMOKING_STATUSES,
+        weight=0.15, amount_column="pack_years", per_unit=0.005, impact="high",
+    ),
+    RiskRule("alcohol", "alcohol_consumption", "eq", "heavy", weight=0.08, impact="moderate"),
+    RiskRule("previous_cancer", "has_previous_cancer", "is_true", weight=0.15, impact="very_high"),
+    RiskRule("brca1", "brca1_positive", "is_true", weight=0.20, impact="very_high"),
+    RiskRule("brca2", "brca2_positive", "is_true", weight=0.15, impact="high"),
+    RiskRule("diabetes", "has_diabetes", "is_true", weight=0.03),
+    RiskRule("obesity", "has_obesity", "is_true", weight=0.05),
+)
+
+CANCER_TYPE_MULTIPLIERS: Tuple[CancerTypeMultiplier, ...] = (
+    CancerTypeMultiplier("lung", 1.5, "smoking_status", "contains", "current", otherwise=0.5),
+    CancerTypeMultiplier("breast", 2.0, "brca1_positive", otherwise=1.0),
+    CancerTypeMultiplier("colorectal", 0.8),
+    CancerTypeMultiplier("prostate", 0.7),
+    CancerTypeMultiplier("skin", 0.6),
+    CancerTypeMultiplier("liver", 1.3, "has_liver_disease", otherwise=0.5),
+    CancerTypeMultiplier("pancreatic", 0.4),
+)
+
+# Patient columns the rule table reads, by kind; None becomes NaN, "" or False
+PATIENT_RULE_COLUMNS = {
+    "bmi": "float",
+    "smoking_status": "str",
+    "alcohol_consumption": "str",
+    "has_previous_cancer": "bool",
+    "brca1_positive": "bool",
+    "brca2_positive": "bool",
+    "has_diabetes": "bool",
+    "has_obesity": "bool",
+    "has_liver_disease": "bool",
+}
+
+_CONDITIONS: Dict[str, Callable[[np.ndarray, Any], np.ndarray]] = {
+    "gt": lambda column, value: column > value,
+    "eq": lambda column, value: column == value,
+    "in": lambda column, value: np.isin(column, list(value)),
+    "contains": lambda column, value: np.char.find(column, value) >= 0,
+    "is_true": lambda column, value: column.astype(bool),
+}
+
+
+def _compile_condition(column: str, op: str, value: Any) -> Callable[[Dict[str, np.ndarray]], np.ndarray]:
+    if op not in _CONDITIONS:
+        raise ValueError(f"Unknown rule operator '{op}', expected one of {sorted(_CONDITIONS)}")
+    condition = _CONDITIONS[op]
+    return lambda columns: condition(columns[column], value)
+
+
+# ============================================================================
+# Engine
+# ============================================================================
+
+@dataclass
+class RiskResult:
+    """One patient's scored cancer risk."""
+    overall_risk: float
+    category: str
+    cancer_type_risks: Dict[str, float]
+    risk_factors: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    blood_data_used: bool = False
+    smartwatch_data_used: bool = False
+    model_name: str = DEFAULT_MODEL_NAME
+    model_version: str = DEFAULT_MODEL_VERSION
+    model_confidence: float = RULE_BASED_CONFIDENCE
+
+
+@dataclass
+class RiskScores:
+    """Scores of a batch of patients, one array element per patient."""
+    overall_risk: np.ndarray
+    category: np.ndarray
+    cancer_type_risks: Dict[str, np.ndarray]
+    fired: Dict[str, np.ndarray]
+    amounts: Dict[str, np.ndarray]
+    blood_data_used: np.ndarray
+    smartwatch_data_used: np.ndarray
+    rules: Tuple[RiskRule, ...]
+
+    def __len__(self) -> int:
+        return len(self.overall_risk)
+
+    def result(self, i: int, ml_result: Optional[Dict[str, Any]] = None) -> RiskResult:
+        """One patient's RiskResult."""
+        risk_factors: Dict[str, Dict[str, Any]] = {}
+        for rule in self.rules:
+            if rule.impact is None or not self.fired[rule.name][i]:
+                continue
+            details: Dict[str, Any] = {"impact": rule.impact}
+            if rule.amount_column is not None:
+                # 0 rather than 0.0, like get_pack_years() or 0
+                details[rule.amount_column] = float(self.amounts[rule.name][i]) or 0
+            risk_factors[rule.name] = details
+
+        return RiskResult(
+            overall_risk=float(self.overall_risk[i]),
+            category=str(self.category[i]),
+            cancer_type_risks={k: float(v[i]) for k, v in self.cancer_type_risks.items()},
+            risk_factors=risk_factors,
+            blood_data_used=bool(self.blood_data_used[i]),
+            smartwatch_data_used=bool(self.smartwatch_data_used[i]),
+            model_name=ml_result["model_name"] if ml_result else DEFAULT_MODEL_NAME,
+            model_version=ml_result["model_version"] if ml_result else DEFAULT_MODEL_VERSION,
+            model_confidence=ml_result["confidence"] if ml_result else RULE_BASED_CONFIDENCE,
+        )
+
+    def category_counts(self) -> Dict[str, int]:
+        names, counts = np.unique(self.category, return_counts=True)
+        return {str(name): int(count) for name, count in zip(names, counts)}
+
+
+class RiskEngine:
+    """
+    The rule table compiled into NumPy expressions.
+
+    ``score`` takes columnar arrays: the ``PATIENT_RULE_COLUMNS``,
+    ``pack_years``, the feature-vector columns ``has_blood_sample``,
+    ``blood_risk_score`` and ``anomaly_count``, and optionally ``ml_risk``
+    (NaN where no model scored the patient). Where the model scored, the
+    rule risk is blended with ``ml_risk`` at ``ml_weight`` (by default
+    the ``blood_analysis_ml_weight`` setting).
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[RiskRule] = PROFILE_RULES,
+        multipliers: Sequence[CancerTypeMultiplier] = CANCER_TYPE_MULTIPLIERS,
+        baseline: float = BASELINE_RISK,
+        ml_weight: Optional[float] = None,
+    ):
+        if ml_weight is None:
+            ml_weight = get_settings().ai_model.blood_analysis_ml_weight
+        if not 0.0 <= ml_weight <= 1.0:
+            raise ValueError(f"ml_weight must be between 0 and 1, got {ml_weight}")
+        self.rules = tuple(rules)
+        self.multipliers = tuple(multipliers)
+        self.baseline = baseline
+        self.ml_weight = ml_weight
+        self._conditions = [_compile_condition(r.column, r.op, r.value) for r in self.rules]
+        self._multiplier_conditions = [
+            _compile_condition(m.column, m.op, m.value) if m.column else None for m in self.multipliers
+        ]
+
+    def with_weights(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        multipliers: Optional[Dict[str, float]] = None,
+        ml_weight: Optional[float] = None,
+    ) -> "RiskEngine":
+        """A copy with some rule weights / cancer-type multipliers / the model weight changed (what-if analysis)."""
+        weights = dict(weights or {})
+        multipliers = dict(multipliers or {})
+        unknown = (set(weights) - {r.name for r in self.rules}) | (
+            set(multipliers) - {m.cancer_type for m in self.multipliers}
+        )
+        if unknown:
+            raise ValueError(f"Unknown rules: {sorted(unknown)}")
+        return RiskEngine(
+            [replace(r, weight=weights[r.name]) if r.name in weights else r for r in self.rules],
+            [replace(m, multiplier=multipliers[m.cancer_type]) if m.cancer_type in multipliers else m
+             for m in self.multipliers],
+            self.baseline,
+            self.ml_weight if ml_weight is None else ml_weight,
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        """The rule table as plain data."""
+        return {
+            "baseline": self.baseline,
+            "ml_weight": self.ml_weight,
+            "rules": [asdict(r) for r in self.rules],
+            "cancer_type_multipliers": [asdict(m) for m in self.multipliers],
+            "category_thresholds": RISK_CATEGORY_THRESHOLDS,
+        }
+
+    def score(self, columns: Dict[str, np.ndarray]) -> RiskScores:
+        n = len(columns["pack_years"])
+        risk = np.full(n, self.baseline)
+
+        # Additive profile rules, applied in table order
+        fired: Dict[str, np.ndarray] = {}
+        amounts: Dict[str, np.ndarray] = {}
+        for rule, condition in zip(self.rules, self._conditions):
+            mask = condition(columns)
+            if rule.amount_column is not None:
+                amount = columns[rule.amount_column]
+                amounts[rule.name] = amount
+                contribution = np.minimum(rule.weight, amount * rule.per_unit)
+            else:
+                contribution = rule.weight
+            risk = risk + np.where(mask, contribution, 0.0)
+            fired[rule.name] = mask
+
+        # Latest blood results
+        blood_used = columns["has_blood_sample"].astype(bool)
+        blood_score = columns["blood_risk_score"]
+        blend_blood = blood_used & (np.nan_to_num(blood_score) != 0)
+        risk = np.where(blend_blood, (risk + blood_score) / 2, risk)
+
+        # Smartwatch anomalies
+        anomalies = np.minimum(columns["anomaly_count"], MAX_COUNTED_ANOMALIES)
+        risk = risk + ANOMALY_WEIGHT * anomalies
+
+        # Blend in the trained ensemble where it scored the patient
+        ml_risk = columns.get("ml_risk")
+        if ml_risk is not None:
+            blended = (1 - self.ml_weight) * risk + self.ml_weight * ml_risk
+            risk = np.where(np.isnan(ml_risk), risk, blended)
+
+        overall = np.clip(risk, 0.01, 0.99)
+        category = np.select(
+            [overall >= threshold for threshold, _ in RISK_CATEGORY_THRESHOLDS],
+            [name for _, name in RISK_CATEGORY_THRESHOLDS],
+            default=DEFAULT_RISK_CATEGORY,
+        )
+
+        type_risks: Dict[str, np.ndarray] = {}
+        for multiplier, condition in zip(self.multipliers, self._multiplier_conditions):
+            factor = multiplier.multiplier
+            if condition is not None:
+                factor = np.where(condition(columns), multiplier.multiplier, multiplier.otherwise)
+            type_risks[multiplier.cancer_type] = np.minimum(0.99, overall * factor)
+
+        return RiskScores(
+            overall_risk=overall,
+            category=category,
+            cancer_type_risks=type_risks,
+            fired=fired,
+            amounts=amounts,
+            blood_data_used=blood_used,
+            smartwatch_data_used=anomalies > 0,
+            rules=self.rules,
+        )
+
+
+DEFAULT_ENGINE = RiskEngine()
+
+
+# ============================================================================
+# Columnar Inputs
+# ============================================================================
+
+def _column(values: Sequence[Any], kind: str) -> np.ndarray:
+    if kind == "float":
+        return np.array([np.nan if v is None else v for v in values], dtype=float)
+    if kind == "str":
+        return np.array([v or "" for v in values], dtype=str)
+    return np.array([bool(v) for v in values], dtype=bool)
+
+
+def patient_columns(
+    patients: Sequence[Patient],
+    vectors: Optional[Dict[str, PatientFeatureVector]] = None,
+    ml_results: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, np.ndarray]:
+    """Engine inputs for loaded patients, their feature vectors and model results (by patient id)."""
+    vectors = vectors or {}
+    ml_results = ml_results or {}
+    columns = {
+        name: _column([getattr(p, name) for p in patients], kind)
+        for name, kind in PATIENT_RULE_COLUMNS.items()
+    }
+    columns["pack_years"] = _column([p.get_pack_years() or 0 for p in patients], "float")
+
+    patient_vectors = [vectors.get(p.id) for p in patients]
+    columns["has_blood_sample"] = _column([v and v.latest_blood_sample_id for v in patient_vectors], "bool")
+    columns["blood_risk_score"] = _column([v.latest_blood_risk_score if v else None for v in patient_vectors], "float")
+    columns["anomaly_count"] = _column([(v.smartwatch_anomaly_count or 0) if v else 0 for v in patient_vectors], "float")
+    if ml_results:
+        columns["ml_risk"] = _column(
+            [ml_results[p.id]["risk_score"] if ml_results.get(p.id) else None for p in patients], "float"
+        )
+    return columns
+
+
+async def load_patient_columns(
+    db: AsyncSession, hospital_id: Optional[str] = None
+) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """
+    Patient ids and engine inputs for the whole patient table, in one query.
+
+    Blood and smartwatch inputs come from the stored feature vectors as they
+    are; patients without one score on their profile alone.
+    """
+    query = (
+        select(
+            Patient.id, Patient.packs_per_day, Patient.smoking_years,
+            *[getattr(Patient, name) for name in PATIENT_RULE_COLUMNS],
+            PatientFeatureVector.latest_blood_sample_id,
+            PatientFeatureVector.latest_blood_risk_score,
+            PatientFeatureVector.smartwatch_anomaly_count,
+        )
+        .outerjoin(PatientFeatureVector, and_(
+            PatientFeatureVector.patient_id == Patient.id,
+            PatientFeatureVector.schema_version == FEATURE_SCHEMA_VERSION,
+        ))
+        .where(Patient.is_deleted == False)
+        .order_by(Patient.id)
+    )
+    if hospital_id:
+        query = query.where(Patient.primary_hospital_id == hospital_id)
+    rows = (await db.execute(query)).all()
+
+    values = list(zip(*rows)) or [()] * len(query.selected_columns)
+    patient_ids = list(values[0])
+    columns = {
+        name: _column(values[3 + i], kind)
+        for i, (name, kind) in enumerate(PATIENT_RULE_COLUMNS.items())
+    }
+    # get_pack_years: packs/day x years when both are set
+    packs, years = _column(values[1], "float"), _column(values[2], "float")
+    both = (np.nan_to_num(packs) != 0) & (np.nan_to_num(years) != 0)
+    columns["pack_years"] = np.where(both, packs * years, 0.0)
+
+    blood_ids, blood_scores, anomalies = values[-3:]
+    columns["has_blood_sample"] = _column(blood_ids, "bool")
+    columns["blood_risk_score"] = _column(blood_scores, "float")
+    columns["anomaly_count"] = _column([a or 0 for a in anomalies], "float")
+    return patient_ids, columns
+
+
+# ============================================================================
+# Scoring
+# ============================================================================
+
+def risk_category(risk_score: float) -> str:
+    """Risk category of a score."""
+    for threshold, category in RISK_CATEGORY_THRESHOLDS:
+        if risk_score >= threshold:
+            return category
+    return DEFAULT_RISK_CATEGORY
+
+
+def score_patients(
+    patients: Sequence[Patient],
+    vectors: Optional[Dict[str, PatientFeatureVector]] = None,
+    ml_results: Optional[Dict[str, Dict[str, Any]]] = None,
+    engine: Optional[RiskEngine] = None,
+) -> List[RiskResult]:
+    """
+    Score loaded patients in one vectorized pass.
+
+    ``vectors`` are the patients' PatientFeatureVectors (latest blood
+    results and smartwatch anomalies) and ``ml_results`` the inference
+    service's outputs for their features, both by patient id.
+    """
+    ml_results = ml_results or {}
+    scores = (engine or DEFAULT_ENGINE).score(patient_columns(patients, vectors, ml_results))
+    return [scores.result(i, ml_results.get(p.id)) for i, p in enumerate(patients)]
+
+
+def score_patient(patient, vector=None, ml_result: Optional[Dict[str, Any]] = None) -> RiskResult:
+    """Score one patient (see ``score_patients``)."""
+    return score_patients(
+        [patient],
+        {patient.id: vector} if vector is not None else None,
+        {patient.id: ml_result} if ml_result else None,
+    )[0]
+
+
+def assessment_values(
+    patient, result: RiskResult, assessed_at: datetime, assessment_number: Optional[str] = None
+) -> Dict[str, Any]:
+    """CancerRiskAssessment column values for a scored patient."""
+    return {
+        "patient_id": patient.id,
+        "health_id": patient.health_id,
+        "assessment_number": assessment_number or generate_record_number("CRA"),
+        "assessment_date": assessed_at,
+        "assessment_type": "comprehensive_ai",
+        "overall_risk_score": result.overall_risk,
+        "overall_risk_category": result.category,
+        "lung_cancer_risk": result.cancer_type_risks.get("lung"),
+        "breast_cancer_risk": result.cancer_type_risks.get("breast"),
+        "colorectal_cancer_risk": result.cancer_type_risks.get("colorectal"),
+        "prostate_cancer_risk": result.cancer_type_risks.get("prostate"),
+        "skin_cancer_risk": result.cancer_type_risks.get("skin"),
+        "liver_cancer_risk": result.cancer_type_risks.get("liver"),
+        "pancreatic_cancer_risk": result.cancer_type_risks.get("pancreatic"),
+        "blood_data_used": result.blood_data_used,
+        "smartwatch_data_used": result.smartwatch_data_used,
+        "clinical_data_used": True,
+        "family_history_used": True,
+        "lifestyle_data_used": True,
+        "top_risk_factors": json.dumps(list(result.risk_factors.keys())),
+        "ai_model_name": result.model_name,
+        "ai_model_version": result.model_version,
+        "ai_confidence": result.model_confidence,
+    }
+
+
+def recommendations_for(category: str) -> List[str]:
+    """Follow-up recommendations for a risk category."""
+    if category in ["high", "very_high", "critical"]:
+        return [
+            "Immediate consultation with oncologist recommended",
+            "Comprehensive cancer screening recommended within 2 weeks",
+        ]
+    if category == "moderate":
+        return [
+            "Schedule cancer screening within 1 month",
+            "Regular blood tests every 3 months",
+        ]
+    return [
+        "Continue regular health checkups",
+        "Annual cancer screening recommended",
+    ]
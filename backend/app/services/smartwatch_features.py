@@ -0,0 +1,440 @@
+"""
+Smartwatch Feature State - Incremental Wearable Features
+=========================================================
+Per-patient running statistics updated in O(1) as each smartwatch reading
+is ingested, so a patient's current feature vector is read with a few key
+lookups instead of re-scanning their reading history.
+
+Every metric keeps a RunningStats accumulator:
+
+- Welford count / mean / M2 for the mean and sample variance
+- running min and max
+- a counter for readings past the metric's alert threshold
+  (``spo2 < 95``, ``stress > 70``)
+- regression sums (sum x, sum x^2, sum xy) for the least-squares trend,
+  where x is the reading's position in the metric's series
+
+Heart rate variability is a derived metric: the sample standard deviation
+of the last ``VARIABILITY_WINDOW`` heart rates, added once that many have
+been seen.
+
+Accumulators are kept for the whole history and per UTC day for the last
+90 days; the 7/30/90-day variants merge the daily buckets (Chan et al.'s
+parallel update), so the window cost is bounded by the number of days,
+not readings. Each accumulator is one SmartwatchFeatureStats row, so a
+reading only rewrites the rows of its own metrics and day.
+
+Feature names are those of SMARTWATCH_FEATURES in the cancer classifier,
+and the all-time values match SmartwatchPreprocessor's ``extract_features``
+on the same readings. Resting heart rate and the heart rate anomaly count
+depend on quantiles of the whole history, so they are left to the batch
+preprocessor.
+
+This module is pure Python so ingestion does not depend on the ML stack.
+"""
+from __future__ import annotations
+import json
+import logging
+import math
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import dialect_insert
+from app.models.smartwatch_data import (
+    SmartwatchData, SmartwatchFeatureState, SmartwatchFeatureStats,
+)
+
+logger = logging.getLogger(__name__)
+
+FEATURE_WINDOWS = (7, 30, 90)
+
+# SmartwatchFeatureStats.day of the all-time accumulators
+TOTAL_DAY = 0
+
+# Heart rates per variability window (SmartwatchPreprocessor's rolling(10).std())
+VARIABILITY_WINDOW = 10
+
+# metric -> (reading attribute, alert threshold predicate)
+METRICS = {
+    "heart_rate": ("heart_rate_avg", None),
+    "spo2": ("spo2_avg", lambda value: value < 95),
+    "steps": ("steps", None),
+    "calories": ("calories_burned", None),
+    "sleep_duration": ("sleep_duration_minutes", None),
+    "stress_level": ("stress_level", lambda value: value > 70),
+    "skin_temperature": ("skin_temperature", None),
+}
+
+
+class RunningStats:
+    """Mergeable running moments, extremes, threshold count and trend sums."""
+
+    __slots__ = ("n", "mean", "m2", "min", "max", "flagged", "sx", "sxx", "sxy")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.flagged = 0
+        self.sx = 0.0
+        self.sxx = 0.0
+        self.sxy = 0.0
+
+    def update(self, value: float, x: float, flagged: bool = False) -> None:
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if flagged:
+            self.flagged += 1
+        self.sx += x
+        self.sxx += x * x
+        self.sxy += x * value
+
+    def merge(self, other: "RunningStats") -> None:
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.flagged += other.flagged
+        self.sx += other.sx
+        self.sxx += other.sxx
+        self.sxy += other.sxy
+
+    @property
+    def std(self) -> Optional[float]:
+        """Sample standard deviation (ddof=1, as in pandas)."""
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else None
+
+    @property
+    def flagged_fraction(self) -> Optional[float]:
+        return self.flagged / self.n if self.n else None
+
+    @property
+    def slope(self) -> Optional[float]:
+        """Least-squares slope of value against position in the series."""
+        if self.n < 2:
+            return None
+        sxx = self.sxx - self.sx * self.sx / self.n
+        if sxx <= 0:
+            return 0.0
+        return (self.sxy - self.sx * self.mean) / sxx
+
+    @classmethod
+    def from_row(cls, row: SmartwatchFeatureStats) -> "RunningStats":
+        stats = cls()
+        for name in cls.__slots__:
+            setattr(stats, name, getattr(row, name))
+        return stats
+
+    def to_row(self, row: SmartwatchFeatureStats) -> None:
+        for name in self.__slots__:
+            setattr(row, name, getattr(self, name))
+
+
+def _as_utc(timestamp: datetime) -> datetime:
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def _day(timestamp: datetime) -> int:
+    return _as_utc(timestamp).date().toordinal()
+
+
+def _sample_std(values: List[float]) -> float:
+    mean = sum(values) / len(values)
+    return math.sqrt(sum((value - mean) ** 2 for value in values) / (len(values) - 1))
+
+
+class StreamingFeatureState:
+    """All-time and daily RunningStats for one patient's smartwatch readings."""
+
+    def __init__(self):
+        self.total: Dict[str, RunningStats] = {}
+        self.days: Dict[int, Dict[str, RunningStats]] = {}
+        self.last_day: Optional[int] = None
+        # Heart rates of the variability window still open
+        self.recent_heart_rates: List[float] = []
+
+    def update(self, reading: Any, timestamp: datetime) -> None:
+        """Add one reading (any object with SmartwatchData's attributes)."""
+        day = _day(timestamp)
+        if self.last_day is None or day > self.last_day:
+            self.last_day = day
+            # Buckets only go stale when the newest day advances
+            self._drop_stale_days()
+        bucket = self.days.setdefault(day, {}) if day >= self.oldest_day else None
+
+        for metric, (attribute, threshold) in METRICS.items():
+            value = getattr(reading, attribute, None)
+            if value is None:
+                continue
+            value = float(value)
+            if math.isnan(value):
+                continue
+            self._add(metric, value, bucket, bool(threshold and threshold(value)))
+            if metric == "heart_rate":
+                window = [*self.recent_heart_rates, value]
+                if len(window) == VARIABILITY_WINDOW:
+                    self._add("heart_rate_variability", _sample_std(window), bucket)
+                self.recent_heart_rates = window[-(VARIABILITY_WINDOW - 1):]
+
+    def _add(self, metric: str, value: float, bucket: Optional[Dict[str, RunningStats]],
+             flagged: bool = False) -> None:
+        total = self.total.get(metric)
+        if total is None:
+            total = self.total[metric] = RunningStats()
+        x = float(total.n)
+        total.update(value, x, flagged)
+        if bucket is not None:
+            daily = bucket.get(metric)
+            if daily is None:
+                daily = bucket[metric] = RunningStats()
+            daily.update(value, x, flagged)
+
+    def _drop_stale_days(self) -> None:
+        for stale in [d for d in self.days if d < self.oldest_day]:
+            del self.days[stale]
+
+    @property
+    def oldest_day(self) -> Optional[int]:
+        """Oldest UTC day ordinal still kept per day."""
+        return self.last_day - max(FEATURE_WINDOWS) + 1 if self.last_day is not None else None
+
+    def window(self, window_days: Optional[int] = None, as_of: Optional[date] = None) -> Dict[str, RunningStats]:
+        """Per-metric stats over the last ``window_days`` days (all time if None)."""
+        if window_days is None:
+            return self.total
+        start, end = self.window_range(window_days, as_of)
+        if end is None:
+            return {}
+        merged: Dict[str, RunningStats] = {}
+        for day, bucket in self.days.items():
+            if start <= day <= end:
+                for metric, stats in bucket.items():
+                    merged.setdefault(metric, RunningStats()).merge(stats)
+        return merged
+
+    def window_range(self, window_days: int, as_of: Optional[date] = None) -> Tuple[Optional[int], Optional[int]]:
+        """First and last UTC day ordinal of a window."""
+        if window_days not in FEATURE_WINDOWS:
+            raise ValueError(f"window_days must be one of {FEATURE_WINDOWS}, got {window_days}")
+        end = as_of.toordinal() if as_of is not None else self.last_day
+        if end is None:
+            return None, None
+        return end - window_days + 1, end
+
+    def features(self, window_days: Optional[int] = None, as_of: Optional[date] = None) -> Dict[str, float]:
+        """Feature vector named as in SMARTWATCH_FEATURES; metrics without data are omitted."""
+        stats = self.window(window_days, as_of)
+        features: Dict[str, Optional[float]] = {}
+
+        if "heart_rate" in stats:
+            features["heart_rate_max_daily_avg"] = stats["heart_rate"].max
+        if "heart_rate_variability" in stats:
+            variability = stats["heart_rate_variability"]
+            features.update({
+                "heart_rate_variability_avg": variability.mean,
+                "heart_rate_variability_trend": variability.slope,
+            })
+        if "spo2" in stats:
+            spo2 = stats["spo2"]
+            features.update({
+                "spo2_avg": spo2.mean,
+                "spo2_min": spo2.min,
+                "spo2_below_95_pct": spo2.flagged_fraction,
+                "spo2_variability": spo2.std,
+            })
+        if "steps" in stats:
+            features.update({
+                "steps_daily_avg": stats["steps"].mean,
+                "steps_daily_trend": stats["steps"].slope,
+            })
+        if "calories" in stats:
+            features["calories_burned_avg"] = stats["calories"].mean
+        if "sleep_duration" in stats:
+            features["sleep_duration_avg"] = stats["sleep_duration"].mean
+        if "stress_level" in stats:
+            stress = stats["stress_level"]
+            features.update({
+                "stress_level_avg": stress.mean,
+                "stress_level_max": stress.max,
+                "stress_high_pct": stress.flagged_fraction,
+            })
+        if "skin_temperature" in stats:
+            temp = stats["skin_temperature"]
+            features.update({
+                "skin_temperature_avg": temp.mean,
+                "skin_temperature_deviation": temp.std,
+            })
+        return {name: float(value) for name, value in features.items() if value is not None}
+
+
+# ============================================================================
+# Persistence
+# ============================================================================
+
+async def _lock_state_row(db: AsyncSession, patient_id: str) -> SmartwatchFeatureState:
+    """The patient's state row, created if missing and locked for this transaction."""
+    # Concurrent first readings both insert; the loser's insert is a no-op
+    await db.execute(
+        dialect_insert(db, SmartwatchFeatureState.__table__)
+        .values(patient_id=patient_id, reading_count=0)
+        .on_conflict_do_nothing(index_elements=["patient_id"])
+    )
+    result = await db.execute(
+        select(SmartwatchFeatureState)
+        .where(SmartwatchFeatureState.patient_id == patient_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+
+async def _load_stats(
+    db: AsyncSession, patient_id: str, days: Optional[Iterable[int]] = None
+) -> Dict[Tuple[str, int], SmartwatchFeatureStats]:
+    query = select(SmartwatchFeatureStats).where(SmartwatchFeatureStats.patient_id == patient_id)
+    if days is not None:
+        query = query.where(SmartwatchFeatureStats.day.in_(list(days)))
+    result = await db.execute(query)
+    return {(row.metric, row.day): row for row in result.scalars()}
+
+
+def _load_state(row: SmartwatchFeatureState, stats: Iterable[SmartwatchFeatureStats]) -> StreamingFeatureState:
+    state = StreamingFeatureState()
+    state.last_day = row.last_day
+    state.recent_heart_rates = json.loads(row.recent_heart_rates) if row.recent_heart_rates else []
+    for stats_row in stats:
+        bucket = state.total if stats_row.day == TOTAL_DAY else state.days.setdefault(stats_row.day, {})
+        bucket[stats_row.metric] = RunningStats.from_row(stats_row)
+    return state
+
+
+async def _store_state(
+    db: AsyncSession,
+    row: SmartwatchFeatureState,
+    state: StreamingFeatureState,
+    stored: Dict[Tuple[str, int], SmartwatchFeatureStats],
+    reading_count: int,
+    last_reading_at: Optional[datetime],
+) -> None:
+    """Write the accumulators held by ``state`` back over their rows."""
+    buckets = [(TOTAL_DAY, state.total), *state.days.items()]
+    for day, bucket in buckets:
+        for metric, stats in bucket.items():
+            stats_row = stored.get((metric, day))
+            if stats_row is None:
+                stats_row = SmartwatchFeatureStats(patient_id=row.patient_id, metric=metric, day=day)
+                db.add(stats_row)
+            stats.to_row(stats_row)
+
+    if state.last_day is not None and state.last_day != row.last_day:
+        await db.execute(
+            delete(SmartwatchFeatureStats).where(
+                SmartwatchFeatureStats.patient_id == row.patient_id,
+                SmartwatchFeatureStats.day != TOTAL_DAY,
+                SmartwatchFeatureStats.day < state.oldest_day,
+            )
+        )
+    row.last_day = state.last_day
+    row.recent_heart_rates = json.dumps(state.recent_heart_rates)
+    row.reading_count = reading_count
+    row.last_reading_at = last_reading_at
+    # Later reads in this session (the next ingest chunk) must see the new rows
+    await db.flush()
+
+
+async def record_reading(db: AsyncSession, patient_id: str, reading: Any) -> SmartwatchFeatureState:
+    """Fold one reading into the patient's stored state, in the caller's transaction."""
+    return await record_readings(db, patient_id, [reading])
+
+
+async def record_readings(db: AsyncSession, patient_id: str, readings: Iterable[Any]) -> SmartwatchFeatureState:
+    """Fold readings, in order, into the patient's stored state, touching only their days' rows."""
+    readings = list(readings)
+    row = await _lock_state_row(db, patient_id)
+    stored = await _load_stats(
+        db, patient_id, {TOTAL_DAY, *(_day(reading.timestamp) for reading in readings)}
+    )
+    state = _load_state(row, stored.values())
+
+    count = row.reading_count or 0
+    last_reading_at = row.last_reading_at
+    for reading in readings:
+        state.update(reading, reading.timestamp)
+        count += 1
+        if last_reading_at is None or _as_utc(reading.timestamp) > _as_utc(last_reading_at):
+            last_reading_at = reading.timestamp
+
+    await _store_state(db, row, state, stored, count, last_reading_at)
+    return row
+
+
+async def get_feature_state(db: AsyncSession, patient_id: str) -> Optional[SmartwatchFeatureState]:
+    result = await db.execute(
+        select(SmartwatchFeatureState).where(SmartwatchFeatureState.patient_id == patient_id)
+    )
+    return result.scalar_one_or_none()
+
+
+async def get_features(
+    db: AsyncSession,
+    row: SmartwatchFeatureState,
+    window_days: Optional[int] = None,
+    as_of: Optional[date] = None,
+) -> Dict[str, float]:
+    """A patient's feature vector, reading only the rows of the requested window."""
+    state = StreamingFeatureState()
+    state.last_day = row.last_day
+    if window_days is None:
+        days = [TOTAL_DAY]
+    else:
+        start, end = state.window_range(window_days, as_of)
+        if end is None:
+            return {}
+        days = range(start, end + 1)
+    stored = await _load_stats(db, row.patient_id, days)
+    return _load_state(row, stored.values()).features(window_days, as_of)
+
+
+async def rebuild_feature_state(db: AsyncSession, patient_id: str) -> SmartwatchFeatureState:
+    """Recompute a patient's state from their stored readings (backfills, seeded data)."""
+    row = await _lock_state_row(db, patient_id)
+    await db.execute(delete(SmartwatchFeatureStats).where(SmartwatchFeatureStats.patient_id == patient_id))
+    row.last_day = None
+
+    state = StreamingFeatureState()
+    count = 0
+    last_reading_at = None
+    result = await db.stream_scalars(
+        select(SmartwatchData)
+        .where(
+            SmartwatchData.patient_id == patient_id,
+            SmartwatchData.is_rollup == False,
+        )
+        .order_by(SmartwatchData.timestamp)
+    )
+    async for reading in result:
+        state.update(reading, reading.timestamp)
+        count += 1
+        last_reading_at = reading.timestamp
+
+    await _store_state(db, row, state, {}, count, last_reading_at)
+    logger.info(f"Rebuilt smartwatch feature state for patient {patient_id} from {count} readings")
+    return row
@@ -0,0 +1,291 @@
+"""
+Smartwatch Ingestion Service - Bulk Device Uploads
+===================================================
+Ingests a device sync (hundreds to thousands of samples) per request
+instead of one reading per call. Samples arrive as a JSON array or as
+NDJSON streamed one sample per line, and are processed in chunks:
+
+- a chunk is validated with one pydantic call; when it fails, only the
+  offending samples are rejected (with their position and reason) and the
+  rest of the chunk is kept
+- accepted samples are written with one multi-row INSERT per chunk that
+  skips readings already stored (unique device / period type / timestamp,
+  ON CONFLICT DO NOTHING), so a re-sent sync never duplicates data
+- only the newly stored samples are folded into the patient's streaming
+  feature state, with a single read and write of the state row, and their
+  days are queued for hour/day rollup (app.services.smartwatch_rollups)
+  and the patient's feature vector for refresh (app.services.feature_store)
+
+An upload may carry a client idempotency key. The first request with a
+key claims it and stores its result; a retry with the same key gets that
+result back without its body being read or ingested again.
+
+The patient and device are resolved once per request, and the device's
+``last_synced`` is set once at the end.
+"""
+from __future__ import annotations
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import Table, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import dialect_insert
+from app.models.feature_store import FeatureStoreOutbox
+from app.models.smartwatch_data import (
+    READING_KEY, SmartwatchData, SmartwatchDevice, SmartwatchIngestBatch,
+)
+from app.schemas.smartwatch_data import SmartwatchIngestResult, SmartwatchSample
+from app.services.smartwatch_features import record_readings
+from app.services.smartwatch_rollups import enqueue_rollups
+
+logger = logging.getLogger(__name__)
+
+INGEST_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+
+SAMPLE_FIELDS = tuple(name for name in SmartwatchSample.model_fields if name != "timestamp")
+
+_sample_list = TypeAdapter(List[SmartwatchSample])
+
+
+def validate_samples(items: List[Any]) -> Tuple[List[SmartwatchSample], Dict[int, str]]:
+    """Valid samples, and the reason each invalid item (by position) was rejected."""
+    try:
+        return _sample_list.validate_python(items), {}
+    except ValidationError as e:
+        rejected: Dict[int, str] = {}
+        for error in e.errors():
+            position = error["loc"][0]
+            field = ".".join(str(part) for part in error["loc"][1:])
+            rejected.setdefault(position, f"{field}: {error['msg']}" if field else error["msg"])
+    # Items are validated independently, so the rest now validates cleanly
+    valid = _sample_list.validate_python([item for i, item in enumerate(items) if i not in rejected])
+    return valid, rejected
+
+
+# ============================================================================
+# Deduplicated Writes
+# ============================================================================
+
+def _utc(timestamp: datetime) -> datetime:
+    """One representation per instant, so equal readings hit the unique key."""
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def _insert_ignoring_conflicts(db: AsyncSession, table: Table, conflict_columns: Sequence[str]):
+    """INSERT ... ON CONFLICT DO NOTHING for the session's database."""
+    return dialect_insert(db, table).on_conflict_do_nothing(index_elements=list(conflict_columns))
+
+
+async def insert_readings(
+    db: AsyncSession,
+    patient_id: str,
+    device_id: str,
+    samples: Sequence[Any],
+    period_type: str = "minute",
+) -> List[Any]:
+    """
+    Store readings not already stored for this patient's device, with one statement.
+    
+    Returns the samples that were new, in order; repeats of a stored
+    reading, or of one earlier in ``samples``, are skipped. The days of the
+    new readings are queued for hour/day rollup, and the patient's feature
+    vector for refresh.
+    """
+    rows: Dict[datetime, Dict[str, Any]] = {}
+    by_id: Dict[str, Any] = {}
+    for sample in samples:
+        timestamp = _utc(sample.timestamp)
+        if timestamp in rows:
+            continue
+        row_id = str(uuid4())
+        by_id[row_id] = sample
+        rows[timestamp] = {
+            "id": row_id,
+            "patient_id": patient_id,
+            "device_id": device_id,
+            "timestamp": timestamp,
+            "period_start": timestamp,
+            "period_end": timestamp,
+            "period_type": period_type,
+            **{name: getattr(sample, name, None) for name in SAMPLE_FIELDS},
+        }
+    if not rows:
+        return []
+
+    table = SmartwatchData.__table__
+    statement = _insert_ignoring_conflicts(
+        db, table, READING_KEY
+    ).returning(table.c.id)
+    result = await db.execute(statement, list(rows.values()))
+    stored = set(result.scalars())
+    if not stored:
+        return []
+    # The Core insert bypasses the feature store's before_flush listener
+    await db.execute(insert(FeatureStoreOutbox), [
+        {"patient_id": patient_id, "source": SmartwatchData.__name__}
+    ])
+    await enqueue_rollups(
+        db, patient_id, device_id, (row["timestamp"] for row in rows.values() if row["id"] in stored)
+    )
+    return [sample for row_id, sample in by_id.items() if row_id in stored]
+
+
+class SmartwatchIngestor:
+    """Validates, stores and folds one device's samples, chunk by chunk."""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        patient_id: str,
+        device: SmartwatchDevice,
+        chunk_size: int = INGEST_CHUNK_SIZE,
+        idempotency_key: Optional[str] = None,
+    ):
+        self.db = db
+        self.patient_id = patient_id
+        self.device = device
+        self.chunk_size = chunk_size
+        self.idempotency_key = idempotency_key
+        self.accepted = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._pending: List[Any] = []
+        self._positions: List[int] = []  # of the pending items in the upload
+        self._seen = 0
+        self._started = time.perf_counter()
+        self._batch_id: Optional[str] = None
+
+    async def claim(self) -> Optional[SmartwatchIngestResult]:
+        """
+        Claim this upload's idempotency key before ingesting anything.
+        
+        Returns None when the upload should be ingested, or the stored
+        result of the earlier upload when this one is a retry.
+        """
+        if self.idempotency_key is None:
+            return None
+        batch_id = str(uuid4())
+        table = SmartwatchIngestBatch.__table__
+        statement = _insert_ignoring_conflicts(
+            self.db, table, ("device_id", "idempotency_key")
+        ).values(
+            id=batch_id,
+            device_id=self.device.device_id,
+            idempotency_key=self.idempotency_key,
+            patient_id=self.patient_id,
+        ).returning(table.c.id)
+        if (await self.db.execute(statement)).scalar_one_or_none() is not None:
+            self._batch_id = batch_id
+            return None
+
+        # A concurrent first attempt holds the key until it commits, so its result is set here
+        stored = await self.db.scalar(
+            select(SmartwatchIngestBatch.result).where(
+                SmartwatchIngestBatch.device_id == self.device.device_id,
+                SmartwatchIngestBatch.idempotency_key == self.idempotency_key,
+            )
+        )
+        result = SmartwatchIngestResult.model_validate_json(stored) if stored else SmartwatchIngestResult(
+            device_id=self.device.device_id
+        )
+        result.replayed = True
+        return result
+
+    def _reject(self, position: int, reason: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"index": position, "error": reason})
+
+    async def add(self, item: Any) -> None:
+        """Queue one decoded sample; full chunks are written immediately."""
+        self._pending.append(item)
+        self._positions.append(self._seen)
+        self._seen += 1
+        if len(self._pending) >= self.chunk_size:
+            await self.flush()
+
+    async def add_items(self, items: List[Any]) -> None:
+        for item in items:
+            await self.add(item)
+
+    async def add_ndjson(self, stream: AsyncIterator[bytes]) -> None:
+        """Queue samples from an NDJSON byte stream, one JSON object per line."""
+        buffer = b""
+        async for data in stream:
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                await self._add_line(line)
+        await self._add_line(buffer)
+
+    async def _add_line(self, line: bytes) -> None:
+        if not line.strip():
+            return
+        try:
+            item = json.loads(line)
+        except ValueError as e:
+            self._reject(self._seen, f"invalid JSON: {e}")
+            self._seen += 1
+            return
+        await self.add(item)
+
+    async def flush(self) -> None:
+        """Validate and write the pending chunk."""
+        if not self._pending:
+            return
+        items, positions = self._pending, self._positions
+        self._pending, self._positions = [], []
+
+        samples, rejected = validate_samples(items)
+        for i, reason in sorted(rejected.items()):
+            self._reject(positions[i], reason)
+        if not samples:
+            return
+
+        stored = await insert_readings(self.db, self.patient_id, self.device.device_id, samples)
+        self.accepted += len(stored)
+        self.duplicates += len(samples) - len(stored)
+        if not stored:
+            return
+        await record_readings(self.db, self.patient_id, stored)
+        # Sessions do not autoflush; the next chunk must see a newly created state row
+        await self.db.flush()
+
+    async def finish(self) -> SmartwatchIngestResult:
+        """Write the last chunk, mark the device synced and report the counts."""
+        await self.flush()
+        if self.accepted:
+            self.device.last_synced = datetime.now(timezone.utc)
+        elapsed = time.perf_counter() - self._started
+        logger.debug(
+            f"Ingested {self.accepted} samples ({self.rejected} rejected, "
+            f"{self.duplicates} duplicates) "
+            f"from device {self.device.device_id} in {elapsed:.3f}s"
+        )
+        result = SmartwatchIngestResult(
+            device_id=self.device.device_id,
+            accepted=self.accepted,
+            rejected=self.rejected,
+            duplicates=self.duplicates,
+            errors=self.errors,
+            last_synced=self.device.last_synced,
+            seconds=elapsed,
+            samples_per_second=self.accepted / elapsed if elapsed > 0 else 0.0,
+        )
+        if self._batch_id is not None:
+            await self.db.execute(
+                update(SmartwatchIngestBatch)
+                .where(SmartwatchIngestBatch.id == self._batch_id)
+                .values(result=result.model_dump_json())
+            )
+        return result
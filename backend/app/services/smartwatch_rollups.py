@@ -0,0 +1,356 @@
+"""
+Smartwatch Rollups - Hour and Day Aggregates
+============================================
+Devices upload minute readings, but charts and range queries rarely need
+that grain. Hour rows are aggregated from a device's minute rows, and day
+rows from that day's hour aggregates. Both are stored in SmartwatchData
+itself (``period_type`` hour/day, ``is_rollup`` set), keyed like any other
+row by device, period type and bucket start. Hour and day summaries a
+device uploads (or seeded data) are not rollups: they are never read as
+one, nor overwritten by one, and rollups are built from minute rows only.
+
+Per bucket a rollup keeps:
+
+- the mean of each vital (heart rate, SpO2, skin temperature, stress, ...)
+- the minimum and maximum heart rate and SpO2, using a minute row's
+  average where it carries no min/max of its own, and the skin
+  temperature range as ``temperature_variation``
+- the sum of activity and sleep columns (steps, calories, sleep stages, ...)
+- the number of minute readings, and of AI-flagged anomalies among them
+
+Maintenance is change-driven, as in the feature store: ingestion adds a
+SmartwatchRollupOutbox row for every UTC day it stored readings for, and
+only those device-days are re-aggregated, by the background drain or by a
+range read that needs them. Range reads serve the coarsest grain that
+still meets the requested resolution.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Integer, delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import dialect_insert, get_db_context
+from app.models.smartwatch_data import (
+    READING_KEY, ROLLUP_PERIOD_TYPES, SmartwatchData, SmartwatchRollupOutbox,
+)
+from app.services.smartwatch_features import _as_utc
+
+logger = logging.getLogger(__name__)
+
+GRAINS = ("minute", *ROLLUP_PERIOD_TYPES)
+GRAIN_SIZES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+# Most buckets a range read may span
+MAX_SERIES_POINTS = 2000
+
+# Outbox entries handled per drain
+ROLLUP_BATCH_SIZE = 500
+
+MEAN_COLUMNS = (
+    "heart_rate_avg", "heart_rate_variability", "spo2_avg", "skin_temperature",
+    "stress_level", "respiratory_rate",
+)
+SUM_COLUMNS = (
+    "steps", "distance_meters", "calories_burned", "active_minutes", "sedentary_minutes",
+    "floors_climbed", "sleep_duration_minutes", "deep_sleep_minutes", "light_sleep_minutes",
+    "rem_sleep_minutes", "awake_minutes",
+)
+# extreme -> minute columns tried in order
+MIN_COLUMNS = {
+    "heart_rate_min": ("heart_rate_min", "heart_rate_avg"),
+    "spo2_min": ("spo2_min", "spo2_avg"),
+    "skin_temperature_min": ("skin_temperature",),
+}
+MAX_COLUMNS = {
+    "heart_rate_max": ("heart_rate_max", "heart_rate_avg"),
+    "spo2_max": ("spo2_max", "spo2_avg"),
+    "skin_temperature_max": ("skin_temperature",),
+}
+
+SOURCE_COLUMNS = tuple(sorted(
+    set(MEAN_COLUMNS) | set(SUM_COLUMNS)
+    | {column for sources in (*MIN_COLUMNS.values(), *MAX_COLUMNS.values()) for column in sources}
+))
+ROLLUP_COLUMNS = (
+    *MEAN_COLUMNS, *SUM_COLUMNS, "heart_rate_min", "heart_rate_max", "spo2_min", "spo2_max",
+    "temperature_variation", "sample_count", "anomaly_count",
+)
+_INTEGER_COLUMNS = {
+    column.name for column in SmartwatchData.__table__.columns if isinstance(column.type, Integer)
+}
+
+
+def _floor(timestamp: datetime, grain: str) -> datetime:
+    """Start of the UTC bucket containing ``timestamp``."""
+    timestamp = _as_utc(timestamp)
+    if grain == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if grain == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _first(row: Any, columns: Tuple[str, ...]) -> Optional[float]:
+    for column in columns:
+        value = getattr(row, column)
+        if value is not None:
+            return value
+    return None
+
+
+# ============================================================================
+# Aggregation
+# ============================================================================
+
+class RollupPartial:
+    """Mergeable aggregates of one bucket of minute readings."""
+
+    __slots__ = ("samples", "anomalies", "sums", "counts", "mins", "maxs")
+
+    def __init__(self):
+        self.samples = 0
+        self.anomalies = 0
+        self.sums: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.mins: Dict[str, float] = {}
+        self.maxs: Dict[str, float] = {}
+
+    def add(self, row: Any) -> None:
+        """Add one minute reading (any object with SmartwatchData's attributes)."""
+        self.samples += 1
+        if row.ai_anomaly_detected:
+            self.anomalies += 1
+        for column in (*MEAN_COLUMNS, *SUM_COLUMNS):
+            value = getattr(row, column)
+            if value is not None:
+                self.sums[column] = self.sums.get(column, 0) + value
+                self.counts[column] = self.counts.get(column, 0) + 1
+        for extreme, sources in MIN_COLUMNS.items():
+            value = _first(row, sources)
+            if value is not None and (extreme not in self.mins or value < self.mins[extreme]):
+                self.mins[extreme] = value
+        for extreme, sources in MAX_COLUMNS.items():
+            value = _first(row, sources)
+            if value is not None and (extreme not in self.maxs or value > self.maxs[extreme]):
+                self.maxs[extreme] = value
+
+    def merge(self, other: "RollupPartial") -> None:
+        self.samples += other.samples
+        self.anomalies += other.anomalies
+        for column, value in other.sums.items():
+            self.sums[column] = self.sums.get(column, 0) + value
+            self.counts[column] = self.counts.get(column, 0) + other.counts[column]
+        for extreme, value in other.mins.items():
+            if extreme not in self.mins or value < self.mins[extreme]:
+                self.mins[extreme] = value
+        for extreme, value in other.maxs.items():
+            if extreme not in self.maxs or value > self.maxs[extreme]:
+                self.maxs[extreme] = value
+
+    def values(self) -> Dict[str, Any]:
+        """Column values of the rollup row; metrics without readings are None."""
+        values: Dict[str, Any] = {column: None for column in ROLLUP_COLUMNS}
+        for column in MEAN_COLUMNS:
+            if self.counts.get(column):
+                values[column] = self.sums[column] / self.counts[column]
+        for column in SUM_COLUMNS:
+            values[column] = self.sums.get(column)
+        for extreme in ("heart_rate_min", "spo2_min"):
+            values[extreme] = self.mins.get(extreme)
+        for extreme in ("heart_rate_max", "spo2_max"):
+            values[extreme] = self.maxs.get(extreme)
+        if "skin_temperature_min" in self.mins:
+            values["temperature_variation"] = self.maxs["skin_temperature_max"] - self.mins["skin_temperature_min"]
+        values["sample_count"] = self.samples
+        values["anomaly_count"] = self.anomalies
+        for column in _INTEGER_COLUMNS.intersection(values):
+            if values[column] is not None:
+                values[column] = int(round(values[column]))
+        return values
+
+
+def aggregate(readings: Iterable[Any]) -> Dict[str, Dict[datetime, RollupPartial]]:
+    """Hour partials of minute readings, and day partials merged from those hours."""
+    hours: Dict[datetime, RollupPartial] = defaultdict(RollupPartial)
+    for reading in readings:
+        hours[_floor(reading.timestamp, "hour")].add(reading)
+    days: Dict[datetime, RollupPartial] = defaultdict(RollupPartial)
+    for hour, partial in hours.items():
+        days[_floor(hour, "day")].merge(partial)
+    return {"hour": dict(hours), "day": dict(days)}
+
+
+# ============================================================================
+# Maintenance
+# ============================================================================
+
+async def enqueue_rollups(
+    db: AsyncSession, patient_id: str, device_id: str, timestamps: Iterable[datetime]
+) -> None:
+    """Mark the UTC days of newly stored minute readings as needing re-aggregation."""
+    days = sorted({_floor(timestamp, "day") for timestamp in timestamps})
+    if days:
+        await db.execute(insert(SmartwatchRollupOutbox), [
+            {"patient_id": patient_id, "device_id": device_id, "day": day} for day in days
+        ])
+
+
+async def rebuild_rollups(db: AsyncSession, patient_id: str, device_id: str, days: Iterable[datetime]) -> int:
+    """Re-aggregate the hour and day rollups of a device's UTC days; returns rows written."""
+    days = {_floor(day, "day") for day in days}
+    if not days:
+        return 0
+    columns = [getattr(SmartwatchData, name) for name in ("timestamp", "ai_anomaly_detected", *SOURCE_COLUMNS)]
+    result = await db.execute(
+        select(*columns).where(
+            SmartwatchData.patient_id == patient_id,
+            SmartwatchData.device_id == device_id,
+            SmartwatchData.period_type == "minute",
+            SmartwatchData.is_rollup == False,
+            SmartwatchData.timestamp >= min(days),
+            SmartwatchData.timestamp < max(days) + GRAIN_SIZES["day"],
+        )
+    )
+    # One range query covers every requested day; days in between are skipped
+    partials = aggregate(row for row in result if _floor(row.timestamp, "day") in days)
+
+    updated_at = datetime.now(timezone.utc)
+    rows = [
+        {
+            "patient_id": patient_id,
+            "device_id": device_id,
+            "timestamp": start,
+            "period_start": start,
+            "period_end": start + GRAIN_SIZES[grain] - timedelta(seconds=1),
+            "period_type": grain,
+            "is_rollup": True,
+            "updated_at": updated_at,
+            **partial.values(),
+        }
+        for grain, buckets in partials.items()
+        for start, partial in sorted(buckets.items())
+    ]
+    if not rows:
+        return 0
+
+    statement = dialect_insert(db, SmartwatchData.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(READING_KEY),
+        set_={
+            name: statement.excluded[name]
+            for name in (*ROLLUP_COLUMNS, "period_start", "period_end", "updated_at")
+        },
+    )
+    await db.execute(statement, rows)
+    return len(rows)
+
+
+async def process_rollup_outbox(
+    db: AsyncSession, batch_size: int = ROLLUP_BATCH_SIZE, patient_id: Optional[str] = None
+) -> int:
+    """Rebuild the rollups of up to ``batch_size`` stale device-days; returns how many were handled."""
+    query = select(
+        SmartwatchRollupOutbox.id,
+        SmartwatchRollupOutbox.patient_id,
+        SmartwatchRollupOutbox.device_id,
+        SmartwatchRollupOutbox.day,
+    ).limit(batch_size)
+    if patient_id is not None:
+        query = query.where(SmartwatchRollupOutbox.patient_id == patient_id)
+    entries = (await db.execute(query)).all()
+    if not entries:
+        return 0
+
+    # Entries seen now are covered by this rebuild; ones added while it runs stay pending
+    stale: Dict[Tuple[str, str], Set[datetime]] = defaultdict(set)
+    for entry in entries:
+        stale[(entry.patient_id, entry.device_id)].add(_floor(entry.day, "day"))
+    for (owner_id, device_id), days in stale.items():
+        await rebuild_rollups(db, owner_id, device_id, days)
+    await db.execute(
+        delete(SmartwatchRollupOutbox).where(SmartwatchRollupOutbox.id.in_([entry.id for entry in entries]))
+    )
+    return len(entries)
+
+
+async def refresh_patient_rollups(db: AsyncSession, patient_id: str) -> None:
+    """Bring a patient's rollups up to date before they are read."""
+    while await process_rollup_outbox(db, patient_id=patient_id) == ROLLUP_BATCH_SIZE:
+        pass
+
+
+async def run_rollup_worker(interval: float, batch_size: int = ROLLUP_BATCH_SIZE) -> None:
+    """Drain the rollup outbox in the background so range reads rarely aggregate."""
+    while True:
+        processed = 0
+        try:
+            async with get_db_context() as db:
+                processed = await process_rollup_outbox(db, batch_size)
+            if processed:
+                logger.debug(f"Rebuilt smartwatch rollups for {processed} stale device-days")
+        except Exception as e:
+            logger.warning(f"Smartwatch rollup refresh failed: {e}")
+        if processed < batch_size:
+            await asyncio.sleep(interval)
+
+
+# ============================================================================
+# Range Reads
+# ============================================================================
+
+def choose_grain(start: datetime, end: datetime, resolution: Optional[timedelta] = None) -> str:
+    """
+    Grain to serve ``[start, end)`` at.
+
+    With a resolution, the coarsest grain no coarser than it; without one,
+    the finest grain that spans the range in at most MAX_SERIES_POINTS buckets.
+    """
+    if resolution is not None:
+        fitting = [grain for grain in GRAINS if GRAIN_SIZES[grain] <= resolution]
+        return fitting[-1] if fitting else GRAINS[0]
+    for grain in GRAINS:
+        if (end - start) / GRAIN_SIZES[grain] <= MAX_SERIES_POINTS:
+            return grain
+    return GRAINS[-1]
+
+
+async def get_series(
+    db: AsyncSession,
+    patient_id: str,
+    start: datetime,
+    end: datetime,
+    resolution: Optional[timedelta] = None,
+) -> Tuple[str, List[SmartwatchData]]:
+    """A patient's readings over ``[start, end)`` at the chosen grain, oldest first."""
+    start, end = _as_utc(start), _as_utc(end)
+    if start >= end:
+        raise ValueError("start must be before end")
+    grain = choose_grain(start, end, resolution)
+    if (end - start) / GRAIN_SIZES[grain] > MAX_SERIES_POINTS:
+        raise ValueError(
+            f"{grain} resolution over this range exceeds {MAX_SERIES_POINTS} points; "
+            f"narrow the range or coarsen the resolution"
+        )
+    if grain != "minute":
+        await refresh_patient_rollups(db, patient_id)
+
+    result = await db.execute(
+        select(SmartwatchData).where(
+            SmartwatchData.patient_id == patient_id,
+            SmartwatchData.period_type == grain,
+            # Minute readings at minute grain, otherwise only computed rollups
+            SmartwatchData.is_rollup == (grain != "minute"),
+            SmartwatchData.timestamp >= _floor(start, grain),
+            SmartwatchData.timestamp < end,
+        ).order_by(SmartwatchData.timestamp, SmartwatchData.device_id)
+    )
+    return grain, list(result.scalars())